@@ -0,0 +1,113 @@
+"""
+Function to render many figures to files without a display, for example
+one report figure per patient. The figures are rendered with the Agg
+backend in a pool of worker processes. Every worker imports the figure
+functions once and reuses one matplotlib figure per figure function.
+Failures are collected per job instead of stopping the batch.
+
+INPUT
+Render_batch(specs, paths, processes, dpi)
+specs:     list of plot specifications, each a dict with
+           'function' 'jitter_distribution_figure',
+                      'scatter_distribution_figure', or
+                      'render_jitter_distribution' and
+                      'render_scatter_distribution' to render a
+                      precomputed plot layout (see plot_layout.py)
+           'args'     list of positional arguments, e.g. [data, cats]
+                      or [layout]
+           'kwargs'   dict of optional plot settings, e.g.
+                      {'YLabel': 'Y label', 'DistType': 'Gaussian'}.
+                      Defaults to no settings.
+paths:     list of output paths, one per specification. The file format
+           (png, svg, pdf, ...) follows from the extension.
+processes: number of worker processes. 0 renders in the calling process
+           (with its current backend). Defaults to the number of CPUs.
+dpi:       resolution of raster formats. Defaults to the matplotlib default.
+
+OUTPUT
+results:   list with per job a dict with
+           'path'   output path
+           'error'  None, or the traceback of a failed job
+           'time'   render time in seconds
+
+EXAMPLE
+specs = [{'function': 'jitter_distribution_figure', 'args': [data, cats]}]*100
+results = Render_batch(specs, ['figure' + str(n) + '.png' for n in range(0, 100)])
+failed = [result for result in results if result['error'] is not None]
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+# Figures reused by the jobs of one worker process
+figures = dict()
+
+
+def Init_worker():
+
+    # Import dependencies once per worker
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    import jitter_distribution_figure
+    import scatter_distribution_figure
+
+
+def Render_job(job):
+
+    # Import dependencies
+    import time
+    import traceback
+    import matplotlib.pyplot as plt
+    from jitter_distribution_figure import jitter_distribution_figure, render_jitter_distribution
+    from scatter_distribution_figure import scatter_distribution_figure, render_scatter_distribution
+
+    spec, path, dpi = job
+    functions = {'jitter_distribution_figure': jitter_distribution_figure,
+                 'scatter_distribution_figure': scatter_distribution_figure,
+                 'render_jitter_distribution': render_jitter_distribution,
+                 'render_scatter_distribution': render_scatter_distribution}
+
+    start = time.perf_counter()
+    try:
+        name = spec['function']
+        if name not in figures:
+            figures[name] = plt.figure()
+        kwargs = dict(spec.get('kwargs', dict()))
+        kwargs['Figure'] = figures[name]
+        kwargs['Show'] = False
+        fig = functions[name](*spec.get('args', []), **kwargs)
+        if dpi is None:
+            fig.savefig(path)
+        else:
+            fig.savefig(path, dpi=dpi)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+
+    return {'path': path, 'error': error, 'time': time.perf_counter()-start}
+
+
+def Render_batch(specs, paths, processes=None, dpi=None):
+
+    # Import dependencies
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    if len(specs) != len(paths):
+        raise Exception('Specification and path lists should be the same length')
+
+    jobs = [(spec, path, dpi) for spec, path in zip(specs, paths)]
+    if processes is None:
+        processes = os.cpu_count()
+
+    if processes == 0:
+        return [Render_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=Init_worker) as pool:
+        results = list(pool.map(Render_job, jobs, chunksize=max(1, len(jobs)//(4*processes))))
+
+    return results
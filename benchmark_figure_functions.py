@@ -0,0 +1,232 @@
+"""
+Benchmark of the figure functions and their helpers over the number of data
+points (N) and categories (K). Per case the wall time of computing and
+drawing the figure (Agg backend), the peak memory (tracemalloc) and the
+number of artists and vertices are recorded. Results can be saved as a
+baseline and later runs compared against it.
+
+Cases
+ - jitter_distribution_figure: External/Internal x Kernel/Gaussian
+ - scatter_distribution_figure: without, linear and LOWESS Trendline
+ - both figures drawn with separate artists per category (Collections=False)
+ - helpers (one category of N data points): Jitter, Distribution and
+   Jitter_distribution (jitter_distribution_figure), Scatter_trendline and
+   Distribution (scatter_distribution_figure)
+
+Run from the command line:
+    python benchmark_figure_functions.py --save baseline.json
+    python benchmark_figure_functions.py --compare baseline.json
+    python benchmark_figure_functions.py --sizes 100 10000 --cats 1 10 --cases jitter
+
+Options
+ --sizes      numbers of data points. Defaults to 10^2 ... 10^7.
+ --cats       numbers of categories. Defaults to 1, 10, 50 and 200.
+ --cases      only run cases whose name contains one of these strings.
+ --repeat     number of timed runs per case (the minimum is kept).
+ --no-memory  skip the (slower) peak memory run.
+ --save       save the results as JSON.
+ --compare    compare with a saved JSON baseline; the script exits with 1
+              when time or memory grows by more than --tolerance times.
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Benchmark_data(size, ncats, seed=0):
+
+    # Import dependencies
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, ncats, size)
+    names = np.array(['Group ' + str(k) for k in range(0, ncats)])
+    datax = rng.normal(size=size) + 0.5*codes
+    datay = 0.5*datax + rng.normal(size=size)
+
+    return datax, datay, names[codes]
+
+
+def Benchmark_cases():
+
+    # Import dependencies
+    import jitter_distribution_figure as jdf
+    import scatter_distribution_figure as sdf
+
+    # Figure cases: function(datax, datay, cats) returning a figure
+    cases = dict()
+    for plot_type in ['External', 'Internal']:
+        for dist_type in ['Kernel', 'Gaussian']:
+            cases['jitter_' + plot_type + '_' + dist_type] = (True, lambda x, y, c, p=plot_type, d=dist_type:
+                jdf.jitter_distribution_figure(x, c, PlotType=p, DistType=d, Show=False))
+    for trendline in [False, True, 'Lowess']:
+        cases['scatter_Trendline_' + str(trendline)] = (True, lambda x, y, c, t=trendline:
+            sdf.scatter_distribution_figure(x, y, c, Trendline=t, Show=False))
+
+    # Separate artists per category, to compare with the collections
+    cases['jitter_External_Kernel_PerCategory'] = (True, lambda x, y, c:
+        jdf.jitter_distribution_figure(x, c, Collections=False, Show=False))
+    cases['scatter_Trendline_True_PerCategory'] = (True, lambda x, y, c:
+        sdf.scatter_distribution_figure(x, y, c, Trendline=True, Collections=False, Show=False))
+
+    # Helper cases, on all data points as one category
+    cases['helper_Jitter'] = (False, lambda x, y, c: jdf.Jitter(x, 0))
+    cases['helper_Distribution_Kernel'] = (False, lambda x, y, c: jdf.Distribution(x, 'Kernel'))
+    cases['helper_Distribution_Gaussian'] = (False, lambda x, y, c: jdf.Distribution(x, 'Gaussian'))
+    cases['helper_Jitter_distribution'] = (False, lambda x, y, c: jdf.Jitter_distribution(x, 0, 'Kernel', 1.0))
+    cases['helper_Scatter_trendline'] = (False, lambda x, y, c: sdf.Scatter_trendline(x, y, True))
+    cases['helper_Scatter_distribution'] = (False, lambda x, y, c: sdf.Distribution(x, 'y', 'Kernel'))
+
+    return cases
+
+
+def Count_artists(fig):
+
+    # Import dependencies
+    from matplotlib.collections import PathCollection
+
+    artists = 0
+    vertices = 0
+    for ax in fig.axes:
+        for line in ax.lines:
+            artists += 1
+            vertices += len(line.get_xydata())
+        for collection in ax.collections:
+            artists += 1
+            if isinstance(collection, PathCollection):
+                vertices += len(collection.get_offsets())
+            else:
+                vertices += sum([len(path.vertices) for path in collection.get_paths()])
+        for image in ax.images:
+            artists += 1
+            vertices += image.get_array().shape[0]*image.get_array().shape[1]
+        artists += len(ax.patches)
+
+    return artists, vertices
+
+
+def Run_case(function, is_figure, datax, datay, cats, repeat=1, memory=True):
+
+    # Import dependencies
+    import time
+    import tracemalloc
+    import matplotlib.pyplot as plt
+
+    result = dict()
+
+    # Wall time of computing and drawing
+    compute = list()
+    draw = list()
+    for n in range(0, repeat):
+        start = time.perf_counter()
+        output = function(datax, datay, cats)
+        computed = time.perf_counter()
+        if is_figure:
+            output.canvas.draw()
+        draw.append(time.perf_counter() - computed)
+        compute.append(computed - start)
+        if is_figure:
+            result['artists'], result['vertices'] = Count_artists(output)
+            plt.close(output)
+    result['compute'] = min(compute)
+    result['draw'] = min(draw)
+    result['time'] = result['compute'] + result['draw']
+
+    # Peak memory of computing and drawing
+    if memory:
+        tracemalloc.start()
+        output = function(datax, datay, cats)
+        if is_figure:
+            output.canvas.draw()
+        result['memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if is_figure:
+            plt.close(output)
+
+    return result
+
+
+def Benchmark_figure_functions(sizes, ncats, names=None, repeat=1, memory=True):
+
+    # Import dependencies
+    import matplotlib
+    matplotlib.use('Agg')
+
+    cases = Benchmark_cases()
+    results = dict()
+    for size in sizes:
+        for k in ncats:
+            if k > size:
+                continue
+            datax, datay, cats = Benchmark_data(size, k)
+            for name, (is_figure, function) in cases.items():
+                if names and not any([part in name for part in names]):
+                    continue
+                if not is_figure and k != ncats[0]:
+                    # Helpers do not depend on the number of categories
+                    continue
+                key = name + '|N=' + str(size) + '|K=' + str(k)
+                results[key] = Run_case(function, is_figure, datax, datay, cats, repeat, memory)
+                print(Format_result(key, results[key]), flush=True)
+
+    return results
+
+
+def Format_result(key, result):
+
+    text = '%-50s %9.3f s' % (key, result['time'])
+    if 'memory' in result:
+        text += ' %10.1f MB' % (result['memory']/1e6)
+    if 'artists' in result:
+        text += ' %6d artists %10d vertices' % (result['artists'], result['vertices'])
+    return text
+
+
+def Compare_results(results, baseline, tolerance=1.5):
+
+    regressions = list()
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for measure in ['time', 'memory', 'vertices']:
+            if measure in result and measure in baseline[key] and baseline[key][measure] > 0:
+                ratio = result[measure]/baseline[key][measure]
+                if ratio > tolerance:
+                    regressions.append('%s %s: %.2f x baseline' % (key, measure, ratio))
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    import sys
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark of the figure functions')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**2, 10**3, 10**4, 10**5, 10**6, 10**7])
+    parser.add_argument('--cats', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--cases', nargs='+', default=None)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--save', default=None)
+    parser.add_argument('--compare', default=None)
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args()
+
+    results = Benchmark_figure_functions(args.sizes, args.cats, args.cases, args.repeat, not args.no_memory)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=1)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        regressions = Compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
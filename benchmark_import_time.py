@@ -0,0 +1,78 @@
+"""
+Benchmark of the cold start of the figure functions: the time to import
+them and make a first figure in a fresh Python interpreter (Agg backend).
+The default path only needs numpy and matplotlib; the benchmark fails when
+an optional dependency (scipy, statsmodels, scikit-learn) is imported or
+when the cold start exceeds the time budget.
+
+Run from the command line:
+    python benchmark_import_time.py [--repeat 5] [--budget 3.0]
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+# Script run in a fresh interpreter, prints import and first call times
+COLD_START = """
+import time
+start = time.perf_counter()
+import matplotlib
+matplotlib.use('Agg')
+from jitter_distribution_figure import jitter_distribution_figure
+from scatter_distribution_figure import scatter_distribution_figure
+imported = time.perf_counter()
+import numpy as np
+data = np.random.rand(150)
+cats = ['Group A']*50 + ['Group B']*50 + ['Group C']*50
+jitter_distribution_figure(data, cats, Show=False)
+jitter_distribution_figure(data, cats, PlotType='Internal', DistType='Gaussian', Show=False)
+scatter_distribution_figure(data, data, cats, Trendline=True, Show=False)
+called = time.perf_counter()
+import sys
+heavy = [name for name in ['scipy', 'statsmodels', 'sklearn'] if name in sys.modules]
+print(imported-start, called-imported, ','.join(heavy))
+"""
+
+
+def Benchmark_import_time(repeat=5):
+
+    # Import dependencies
+    import os
+    import sys
+    import subprocess
+    import numpy as np
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    importTimes = list()
+    callTimes = list()
+    heavy = set()
+    for n in range(0, repeat):
+        output = subprocess.run([sys.executable, '-c', COLD_START], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout.split()
+        importTimes.append(float(output[0]))
+        callTimes.append(float(output[1]))
+        if len(output) > 2:
+            heavy.update(output[2].split(','))
+
+    return np.median(importTimes), np.median(callTimes), sorted(heavy)
+
+
+if __name__ == '__main__':
+
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Cold start benchmark of the figure functions')
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters')
+    parser.add_argument('--budget', type=float, default=3.0, help='maximum import plus first call time (s)')
+    args = parser.parse_args()
+
+    importTime, callTime, heavy = Benchmark_import_time(args.repeat)
+    print('Import:     %.3f s' % importTime)
+    print('First call: %.3f s' % callTime)
+    print('Optional dependencies imported: %s' % (', '.join(heavy) if heavy else 'none'))
+
+    if heavy or importTime + callTime > args.budget:
+        sys.exit(1)
@@ -0,0 +1,129 @@
+"""
+Benchmark of the peak memory of computing the plot layouts (statistics,
+distributions and jitter, without drawing) relative to the size of the
+input data. The data points of every category are handled as slices of one
+category-sorted copy of the input. float32 input stays float32.
+
+The peak is the result plus the working memory on top of it. The result is
+the sorted copy and, for the jitter layout, the jitter positions (2 times the
+input) or the two sorted copies of the scatter layout (2 times the x input).
+The working memory is mostly the sort order, which is int32 for fewer than
+2^31 data points: about 0.1 to 1 times a float32 input (the scatter layout
+needs the order for x and y at once) and at most 0.5 times a float64 input
+for 10^7 data points. On top of that comes a fixed overhead of up to about
+8 MB (the chunk buffers of 2^16 data points, kernel density grids and
+per-category arrays), which dominates for 10^5 data points and gives up to
+about 1.5 times the input at 10^6 data points. Measured peaks at 10^7 data
+points:
+ - group:   0.7 to 1.6 times the input
+ - jitter:  2.0 to 2.3 times the input
+ - scatter: 2.5 to 3.0 times the x input
+
+Cases
+ - group:   Group_categories (codes, sort order and offsets)
+ - jitter:  jitter_distribution_layout with all data points as jitter points
+ - scatter: scatter_distribution_layout with all data points as scatter points
+
+Run from the command line:
+    python benchmark_memory.py
+    python benchmark_memory.py --sizes 1000000 --cats 10 --dtypes float32
+
+Options
+ --sizes      numbers of data points. Defaults to 10^5, 10^6 and 10^7.
+ --cats       numbers of categories. Defaults to 10 and 200.
+ --dtypes     data types of the data points. Defaults to float32 and float64.
+ --limit      the script exits with 1 when the working memory (the peak
+              minus the result) is larger than this number of times the
+              input plus the fixed overhead. Defaults to 1.5.
+ --overhead   fixed overhead in MB allowed on top of the limit. Defaults
+              to 10.
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Peak_memory(function):
+
+    # Import dependencies
+    import tracemalloc
+
+    tracemalloc.start()
+    output = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak, output
+
+
+def Result_size(output):
+
+    # Import dependencies
+    import numpy as np
+
+    # Bytes of the arrays returned (layout dict or tuple of arrays)
+    values = output.values() if isinstance(output, dict) else output
+    return sum(value.nbytes for value in values if isinstance(value, np.ndarray))
+
+
+def Benchmark_memory(sizes, ncats, dtypes):
+
+    # Import dependencies
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    from group_categories import Group_categories
+    from jitter_distribution_figure import jitter_distribution_layout
+    from scatter_distribution_figure import scatter_distribution_layout
+
+    results = dict()
+    for size in sizes:
+        for k in ncats:
+            for dtype in dtypes:
+                rng = np.random.default_rng(0)
+                cats = rng.integers(0, k, size)
+                datax = (rng.normal(size=size) + 0.5*cats).astype(dtype)
+                datay = (0.5*datax + rng.normal(size=size)).astype(dtype)
+                cases = dict()
+                cases['group'] = lambda: Group_categories(cats)
+                cases['jitter'] = lambda: jitter_distribution_layout(datax, cats, LargeN=False)
+                cases['scatter'] = lambda: scatter_distribution_layout(datax, datay, cats, LargeN=False)
+                for name, function in cases.items():
+                    peak, output = Peak_memory(function)
+                    key = name + '|N=' + str(size) + '|K=' + str(k) + '|' + dtype
+                    working = peak - Result_size(output)
+                    results[key] = dict(memory=peak, input=datax.nbytes, ratio=peak/datax.nbytes,
+                                        working=working/datax.nbytes)
+                    if isinstance(output, dict) and 'yJitter' in output:
+                        results[key]['dtype'] = str(output['yJitter'].dtype)
+                    print('%-40s %10.1f MB %6.2f x input, %6.2f x input above the result' %
+                          (key, peak/1e6, peak/datax.nbytes, working/datax.nbytes), flush=True)
+                    del output
+
+    return results
+
+
+if __name__ == '__main__':
+
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Peak memory of the plot layouts')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5, 10**6, 10**7])
+    parser.add_argument('--cats', type=int, nargs='+', default=[10, 200])
+    parser.add_argument('--dtypes', nargs='+', default=['float32', 'float64'])
+    parser.add_argument('--limit', type=float, default=1.5)
+    parser.add_argument('--overhead', type=float, default=10)
+    args = parser.parse_args()
+
+    results = Benchmark_memory(args.sizes, args.cats, args.dtypes)
+
+    if args.limit:
+        exceeded = [key for key, result in results.items()
+                    if result['working']*result['input'] > args.limit*result['input'] + args.overhead*1e6]
+        for key in exceeded:
+            print('EXCEEDED ' + key)
+        if exceeded:
+            sys.exit(1)
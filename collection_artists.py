@@ -0,0 +1,192 @@
+"""
+Functions to draw all categories of a figure with a fixed number of
+matplotlib artists, instead of a few artists per category: all data points
+as one PathCollection with a color per point, all distribution curves as
+one LineCollection and all distribution fills as one PolyCollection, and
+the means and standard deviations as one LineCollection (error bars), one
+line of cap markers and one scatter (means). Drawing time and the size of
+vector files (svg, pdf) then hardly grow with the number of categories.
+Given a dict of artists, the functions store the artists they draw in it,
+and replace the data of the stored artists in place when they are called
+again with the same dict, so a figure can be reused for other data without
+building its axes and artists again.
+
+INPUT
+Add_points(ax, x, y, offsets, cols, marker_size, alpha, artists)
+ax:          matplotlib axes
+x, y:        N x 1 numpy arrays with the data points sorted by category
+offsets:     (K+1) x 1 numpy array, category n is x[offsets[n]:offsets[n+1]]
+cols:        K x 3 (or K x 4) numpy array with the color of every category
+marker_size: marker size (points^2) of the data points
+alpha:       opacity of the data points
+artists:     dict with the artists of an earlier call, updated in place,
+             or None to draw new artists only. Defaults to None.
+
+Add_curves(ax, x, y, offsets, cols, line_width, fill_alpha, artists, key)
+x, y:        concatenated curves of all categories, see Pack_arrays
+line_width:  line width of the curves
+fill_alpha:  opacity of the area between every curve and y = 0, as drawn
+             by fill_between(x, y1=y, y2=0). None draws no fills.
+key:         name of the curves in artists, for several sets of curves in
+             one figure. Defaults to 'curves'.
+
+Add_errorbars(ax, x, mean, lower, upper, line_width, cap_size, marker_size, artists)
+x, mean:     K x 1 numpy arrays with the position and mean (or median) of
+             every category
+lower, upper: K x 1 numpy arrays with the ends of the error bars
+
+Update_limits(ax)
+Recomputes the data limits of the axes after the data of its artists were
+replaced, and autoscales the axes where autoscaling is on.
+
+Legend_handles(catnames, cols, marker_size, alpha)
+OUTPUT
+handles:     list of marker handles, one per category, for ax.legend
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Add_points(ax, x, y, offsets, cols, marker_size, alpha=0.6, artists=None):
+
+    # Import dependencies
+    import numpy as np
+    from matplotlib.colors import to_rgba_array
+
+    # One color per data point, repeated from the category colors
+    colors = np.repeat(to_rgba_array(cols), np.diff(offsets), axis=0)
+
+    if artists is not None and 'points' in artists:
+        points = artists['points']
+        points.set_offsets(np.column_stack((x[offsets[0]:offsets[-1]], y[offsets[0]:offsets[-1]])))
+        # No color mapping, scatter maps the colors of zero points as values
+        points.set_array(None)
+        points.set_facecolors(colors)
+        points.set_sizes([marker_size])
+        points.set_alpha(alpha)
+        Update_limits(ax)
+        return points
+
+    points = ax.scatter(x[offsets[0]:offsets[-1]], y[offsets[0]:offsets[-1]], s=marker_size, c=colors,
+                        edgecolors='none', alpha=alpha)
+    if artists is not None:
+        artists['points'] = points
+
+    return points
+
+
+def Add_curves(ax, x, y, offsets, cols, line_width, fill_alpha=0.4, artists=None, key='curves'):
+
+    # Import dependencies
+    import numpy as np
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.collections import LineCollection, PolyCollection
+
+    colors = to_rgba_array(cols)
+    curves = [np.column_stack((x[offsets[n]:offsets[n+1]], y[offsets[n]:offsets[n+1]]))
+              for n in range(0, len(offsets)-1)]
+
+    # Fills between the curves and y = 0, below the curves as with fill_between
+    if fill_alpha is not None:
+        polygons = [np.concatenate((curve, np.column_stack((curve[::-1, 0], np.zeros(len(curve))))))
+                    for curve in curves]
+
+    if artists is not None and key in artists:
+        if fill_alpha is not None:
+            artists[key + 'Fills'].set_verts(polygons)
+            artists[key + 'Fills'].set_facecolor(colors)
+            artists[key + 'Fills'].set_alpha(fill_alpha)
+        lines = artists[key]
+        lines.set_segments(curves)
+        lines.set_color(colors)
+        lines.set_linewidth(line_width)
+        Update_limits(ax)
+        return lines
+
+    if fill_alpha is not None:
+        fills = PolyCollection(polygons, facecolors=colors, edgecolors='none', alpha=fill_alpha)
+        ax.add_collection(fills)
+    lines = LineCollection(curves, colors=colors, linewidths=line_width, zorder=2)
+    ax.add_collection(lines)
+    ax.autoscale()
+    if artists is not None:
+        artists[key] = lines
+        if fill_alpha is not None:
+            artists[key + 'Fills'] = fills
+
+    return lines
+
+
+def Add_errorbars(ax, x, mean, lower, upper, line_width, cap_size, marker_size, artists=None):
+
+    # Import dependencies
+    import numpy as np
+    from matplotlib.collections import LineCollection
+
+    x = np.asarray(x, dtype=float)
+    mean = np.asarray(mean, dtype=float)
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+
+    # Bars, caps and means of all categories
+    bars = np.stack((np.column_stack((x, lower)), np.column_stack((x, upper))), axis=1)
+
+    if artists is not None and 'bars' in artists:
+        artists['bars'].set_segments(bars)
+        artists['bars'].set_linewidth(line_width)
+        if 'caps' in artists:
+            artists['caps'].set_data(np.concatenate((x, x)), np.concatenate((lower, upper)))
+            artists['caps'].set_markersize(2*cap_size)
+            artists['caps'].set_visible(cap_size > 0)
+        elif cap_size > 0:
+            artists['caps'], = ax.plot(np.concatenate((x, x)), np.concatenate((lower, upper)), linestyle='none',
+                                       marker='_', markersize=2*cap_size, markeredgecolor='k')
+        means = artists['means']
+        means.set_offsets(np.column_stack((x, mean)))
+        means.set_sizes([marker_size])
+        Update_limits(ax)
+        return means
+
+    barLines = ax.add_collection(LineCollection(bars, colors='k', linewidths=line_width, zorder=2))
+    if cap_size > 0:
+        caps, = ax.plot(np.concatenate((x, x)), np.concatenate((lower, upper)), linestyle='none',
+                        marker='_', markersize=2*cap_size, markeredgecolor='k')
+        if artists is not None:
+            artists['caps'] = caps
+    ax.autoscale()
+    means = ax.scatter(x, mean, s=marker_size, color='k', edgecolors='none')
+    if artists is not None:
+        artists['bars'] = barLines
+        artists['means'] = means
+
+    return means
+
+
+def Update_limits(ax):
+
+    # Import dependencies
+    import numpy as np
+
+    # Data limits of all artists, relim skips collections in older matplotlib
+    ax.relim()
+    for collection in ax.collections:
+        points = collection.get_datalim(ax.transData).get_points()
+        if np.all(np.isfinite(points)):
+            ax.update_datalim(points)
+    ax.autoscale_view()
+
+
+def Legend_handles(catnames, cols, marker_size, alpha=0.6):
+
+    # Import dependencies
+    import numpy as np
+    from matplotlib.lines import Line2D
+    from matplotlib.colors import to_rgba_array
+
+    colors = to_rgba_array(cols)
+    return [Line2D([], [], linestyle='none', marker='o', markersize=np.sqrt(marker_size),
+                   markerfacecolor=colors[n], markeredgecolor='none', alpha=alpha, label=catnames[n])
+            for n in range(0, len(catnames))]
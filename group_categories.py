@@ -0,0 +1,170 @@
+"""
+Function to group the data points of multiple categories in a single pass.
+The categories are factorized once into integer codes, after which the data
+points of every category are a contiguous slice of the category-sorted data.
+
+INPUT
+Group_categories(cats)
+cats:     N x 1 list of character vectors, N x 1 numpy array of integer
+          codes or a pandas Categorical representing the corresponding
+          groups of the data points
+
+OUTPUT
+catnames: list of the K category names. Character vectors are ordered by
+          first appearance, integer codes are sorted, and a pandas
+          Categorical keeps the order of its (used) categories.
+codes:    N x 1 numpy array with the category index (0...K-1) of every
+          data point, in the smallest integer type that fits. Missing
+          values of a pandas Categorical get code -1.
+order:    N x 1 numpy array of indices that sort the data by category
+          (stable), int32 for fewer than 2^31 data points
+offsets:  (K+1) x 1 numpy array. The data points of category n are
+          data[order][offsets[n]:offsets[n+1]]
+
+Sort_segments(sortedData, offsets, sortedWeights)
+Sorts the data points of every category in place (the contiguous slices
+of sortedData), so order statistics need no further sorting or copies.
+The weights of the data points (optional, see Weights of the figure
+functions) are reordered with them.
+
+Chunk_codes(offsets, start, stop)
+Returns the category of the positions start...stop-1 of the category-sorted
+data, to process large arrays in chunks with bounded temporary memory.
+
+EXAMPLE
+catnames, codes, order, offsets = Group_categories(cats)
+sortedData = data[order]
+for n in range(0, len(catnames)):
+    thisData = sortedData[offsets[n]:offsets[n+1]]
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Group_categories(cats):
+
+    # Import dependencies
+    import numpy as np
+
+    chunk = 2**16
+
+    # Factorize categories into integer codes
+    if hasattr(cats, 'cat'):
+        # pandas Series with a categorical dtype
+        cats = cats.cat
+    if hasattr(cats, 'categories') and hasattr(cats, 'codes'):
+        # pandas Categorical, already factorized
+        catnames = list(cats.categories)
+        codes = np.asarray(cats.codes)
+    else:
+        values = np.asarray(cats).ravel()
+        if np.issubdtype(values.dtype, np.integer) and len(values) > 0 \
+                and int(np.max(values)) - int(np.min(values)) < max(len(values), 2**16):
+            # Integer codes keep their sorted order, factorized by counting
+            # chunk by chunk, so no full size temporary array is made
+            low = int(np.min(values))
+            present = np.zeros(int(np.max(values)) - low + 1, dtype=bool)
+            for start in range(0, len(values), chunk):
+                present[values[start:start+chunk].astype(np.intp) - low] = True
+            catnames = (np.flatnonzero(present) + low).tolist()
+            lookup = (np.cumsum(present) - 1).astype(Code_type(len(catnames)))
+            codes = np.empty(len(values), dtype=lookup.dtype)
+            for start in range(0, len(values), chunk):
+                codes[start:start+chunk] = lookup[values[start:start+chunk].astype(np.intp) - low]
+        else:
+            uniq, first, codes = np.unique(values, return_index=True, return_inverse=True)
+            codes = codes.ravel()
+            if np.issubdtype(values.dtype, np.integer):
+                # Integer codes keep their sorted order
+                catnames = uniq.tolist()
+            else:
+                # Character vectors are ordered by first appearance
+                rank = np.argsort(first)
+                remap = np.empty(len(uniq), dtype=Code_type(len(uniq)))
+                remap[rank] = np.arange(len(uniq))
+                codes = remap[codes]
+                catnames = uniq[rank].tolist()
+
+    # Sort once by category, missing values (code -1) end up in front. The
+    # sort order is a stable counting sort, filled chunk by chunk in the
+    # smallest index type, so it takes 4 bytes per data point below 2^31
+    codes = codes.astype(Code_type(len(catnames)), copy=False)
+    counts = np.zeros(len(catnames)+1, dtype=np.intp)
+    for start in range(0, len(codes), chunk):
+        counts += np.bincount(codes[start:start+chunk].astype(np.intp) + 1, minlength=len(catnames)+1)
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    order = np.empty(len(codes), dtype=Index_type(len(codes)))
+    position = bounds[:-1].copy()
+    for start in range(0, len(codes), chunk):
+        part = codes[start:start+chunk].astype(np.intp) + 1
+        local = np.argsort(part, kind='stable')
+        partCounts = np.bincount(part, minlength=len(catnames)+1)
+        first = np.concatenate(([0], np.cumsum(partCounts)[:-1]))
+        rank = np.arange(len(part)) - first[part[local]]
+        order[position[part[local]] + rank] = start + local
+        position += partCounts
+    offsets = bounds[1:]
+
+    # Remove categories without data points
+    counts = np.diff(offsets)
+    if np.any(counts == 0):
+        keep = counts > 0
+        remap = np.append(np.cumsum(keep) - 1, -1).astype(codes.dtype)
+        codes = remap[codes]
+        catnames = [name for name, k in zip(catnames, keep) if k]
+        offsets = np.concatenate((offsets[:1], offsets[1:][keep]))
+
+    return catnames, codes, order, offsets
+
+
+def Code_type(ncats):
+
+    # Import dependencies
+    import numpy as np
+
+    # Smallest signed integer type for codes -1...ncats-1
+    for dtype in [np.int8, np.int16, np.int32]:
+        if ncats < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def Index_type(size):
+
+    # Import dependencies
+    import numpy as np
+
+    # Smallest integer type for the positions 0...size-1
+    if size < np.iinfo(np.int32).max:
+        return np.int32
+    return np.intp
+
+
+def Sort_segments(sortedData, offsets, sortedWeights=None):
+
+    # Import dependencies
+    import numpy as np
+
+    # Sort the data points of every category in place, without a copy
+    for n in range(0, len(offsets)-1):
+        if sortedWeights is None:
+            sortedData[offsets[n]:offsets[n+1]].sort()
+        else:
+            order = np.argsort(sortedData[offsets[n]:offsets[n+1]], kind='stable')
+            sortedData[offsets[n]:offsets[n+1]] = sortedData[offsets[n]:offsets[n+1]][order]
+            sortedWeights[offsets[n]:offsets[n+1]] = sortedWeights[offsets[n]:offsets[n+1]][order]
+
+    return sortedData
+
+
+def Chunk_codes(offsets, start, stop):
+
+    # Import dependencies
+    import numpy as np
+
+    # Category of the positions start...stop-1 of sortedData[offsets[0]:]
+    return np.searchsorted(offsets[1:] - offsets[0], np.arange(start, stop), side='right')
+
@@ -0,0 +1,312 @@
+"""
+Functions to compute the summary statistics of all categories at once from
+the category-sorted data (see Group_categories): mean, standard deviation,
+standard error of the mean, median, interquartile range and a percentile
+interval, reading the data in chunks without copying it, and bootstrap
+confidence intervals of the mean or median from batched resampling
+matrices. NaN values are ignored.
+
+INPUT
+Group_statistics(sortedData, offsets, percentiles, presorted)
+sortedData:  N x 1 numpy array containing the data points sorted by category
+offsets:     (K+1) x 1 numpy array with the start of every category in
+             sortedData, see Group_categories
+percentiles: lower and upper percentile of the percentile interval.
+             Defaults to (2.5, 97.5).
+presorted:   True when the data points of every category are also sorted
+             by value (see Sort_segments). Defaults to False.
+weights:     N x 1 numpy array with the weight of every data point, sorted
+             as sortedData, for weighted statistics. Defaults to None
+             (every data point counts once).
+
+OUTPUT
+statistics:  dict with K x 1 numpy arrays
+             'count'   number (sum of the weights) of non-NaN data points
+             'effective' effective number of data points, (sum w)^2/sum w^2
+             'mean'    mean
+             'std'     standard deviation
+             'sem'     standard error of the mean (std/sqrt(effective))
+             'median'  median
+             'q1'      25th percentile
+             'q3'      75th percentile
+             'low'     lower percentile of the percentile interval
+             'high'    upper percentile of the percentile interval
+
+Weighted_percentile(sortedData, weights, offsets, q)
+Percentile q of the data points of every category (sorted by value within
+every category, see Sort_segments) with frequency weights: for integer
+weights it equals np.percentile of the data points repeated by their
+weights. Data points with weight 0 are ignored.
+
+Bootstrap_interval(sortedData, offsets, statistic, resamples, level, seed, workers, max_indices, max_count)
+statistic:   'mean' or 'median'. Defaults to 'mean'.
+resamples:   number of bootstrap resamples per category. Defaults to 1000.
+level:       confidence level in percent. Defaults to 95.
+seed:        seed of the resampling. Every category (and every batch of
+             resamples) gets its own random stream spawned from the seed,
+             so the result does not depend on the number of workers.
+             Defaults to None.
+workers:     number of threads. Defaults to the number of CPUs.
+max_indices: number of resample indices held at once by all threads
+             together. Resamples are drawn in batches of at most 2^20
+             indices (independent of workers) and fewer threads run when
+             their batches would hold more. Defaults to 1e7.
+max_count:   categories with more data points are not resampled and get
+             a NaN interval. Defaults to None (all categories).
+
+OUTPUT
+low, high:   K x 1 numpy arrays with the percentile bootstrap interval
+
+Binned_statistics(centers, binned, count, mean, std, percentiles)
+The same statistics of streamed data, from the binned distributions (see
+Stream_groups); the order statistics have the resolution of the bins.
+
+Error_bars(statistics, error_type, sortedData, offsets, seed)
+Center and ends of the error bar of every category for the error types
+'SD' (mean +- SD), 'SEM' (mean +- SEM), 'CI' (mean with the bootstrap
+confidence interval of sortedData, or mean +- 1.96 SEM when sortedData is
+None and for categories of more than 100000 data points, where the
+bootstrap interval of the mean equals the normal approximation),
+'IQR' (median with 25th-75th percentile) and
+'Percentile' (median with the percentile interval).
+
+OUTPUT
+center, lower, upper: K x 1 numpy arrays
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Group_statistics(sortedData, offsets, percentiles=(2.5, 97.5), presorted=False, weights=None):
+
+    # Import dependencies
+    import numpy as np
+    from group_categories import Chunk_codes
+
+    data = np.asarray(sortedData)[offsets[0]:offsets[-1]]
+    if weights is not None:
+        weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+    counts = np.diff(offsets)
+    starts = offsets[:-1] - offsets[0]
+    ncats = len(counts)
+    chunk = 2**16
+    statistics = dict()
+
+    # Sums per category, read in chunks so temporary arrays stay small
+    count = np.zeros(ncats, dtype=np.intp if weights is None else float)
+    squaredWeights = np.zeros(ncats)
+    total = np.zeros(ncats)
+    for start in range(0, len(data), chunk):
+        part = data[start:start+chunk]
+        valid = ~np.isnan(part)
+        codes = Chunk_codes(offsets, start, start+len(part))[valid]
+        if weights is None:
+            count += np.bincount(codes, minlength=ncats)
+            total += np.bincount(codes, weights=part[valid], minlength=ncats)
+        else:
+            partWeights = weights[start:start+chunk][valid]
+            count += np.bincount(codes, weights=partWeights, minlength=ncats)
+            squaredWeights += np.bincount(codes, weights=partWeights**2, minlength=ncats)
+            total += np.bincount(codes, weights=partWeights*part[valid], minlength=ncats)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total/count
+        squares = np.zeros(ncats)
+        for start in range(0, len(data), chunk):
+            part = data[start:start+chunk]
+            valid = ~np.isnan(part)
+            codes = Chunk_codes(offsets, start, start+len(part))[valid]
+            deviation = (part[valid] - mean[codes])**2
+            if weights is not None:
+                deviation *= weights[start:start+chunk][valid]
+            squares += np.bincount(codes, weights=deviation, minlength=ncats)
+        std = np.sqrt(squares/count)
+        effective = count if weights is None else count**2/squaredWeights
+        statistics['count'] = count
+        statistics['effective'] = effective
+        statistics['mean'] = mean
+        statistics['std'] = std
+        statistics['sem'] = std/np.sqrt(effective)
+
+    # Order statistics; NaN values sort to the end of their category
+    levels = [('median', 50), ('q1', 25), ('q3', 75), ('low', percentiles[0]), ('high', percentiles[1])]
+    if presorted:
+        for name, q in levels:
+            if weights is None:
+                statistics[name] = Segment_percentile(data, starts, count, q)
+            else:
+                statistics[name] = Weighted_percentile(data, np.where(np.isnan(data), 0, weights), offsets-offsets[0], q)
+    else:
+        # Selection per category, a copy of at most one category at a time
+        values = np.full((ncats, len(levels)), np.nan)
+        for n in range(0, ncats):
+            segment = data[starts[n]:starts[n]+counts[n]]
+            valid = ~np.isnan(segment)
+            if not np.any(valid):
+                continue
+            if weights is None:
+                values[n] = np.percentile(segment[valid], [q for name, q in levels])
+            else:
+                order = np.argsort(segment[valid])
+                bounds = np.array([0, len(order)])
+                segmentWeights = weights[starts[n]:starts[n]+counts[n]][valid][order]
+                values[n] = [Weighted_percentile(segment[valid][order], segmentWeights, bounds, q)[0] for name, q in levels]
+        for k, (name, q) in enumerate(levels):
+            statistics[name] = values[:, k]
+
+    return statistics
+
+
+def Segment_percentile(sortedValues, starts, count, q):
+
+    # Import dependencies
+    import numpy as np
+
+    # Linear interpolation between the closest ranks, as np.percentile
+    position = (np.maximum(count, 1)-1)*q/100
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below+1, np.maximum(count, 1)-1)
+    fraction = position - below
+    if len(sortedValues) == 0:
+        return np.full(len(starts), np.nan)
+    lower = sortedValues[np.minimum(starts+below, len(sortedValues)-1)]
+    upper = sortedValues[np.minimum(starts+above, len(sortedValues)-1)]
+
+    return np.where(count > 0, lower + fraction*(upper-lower), np.nan)
+
+
+def Weighted_percentile(sortedData, weights, offsets, q):
+
+    # Import dependencies
+    import numpy as np
+
+    data = np.asarray(sortedData)[offsets[0]:offsets[-1]]
+    weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+    counts = np.diff(offsets)
+    starts = offsets[:-1] - offsets[0]
+    if len(data) == 0:
+        return np.full(len(starts), np.nan)
+
+    # Position q*(W-1) among the data points repeated by their weights, as
+    # np.percentile; the data point holding that position and the next one
+    cumulative = np.cumsum(weights, dtype=np.float64)
+    before = np.where(counts > 0, cumulative[np.minimum(starts, len(data)-1)] - weights[np.minimum(starts, len(data)-1)], 0)
+    total = np.add.reduceat(weights, np.minimum(starts, len(data)-1), dtype=np.float64)*(counts > 0)
+    position = before + q/100*np.maximum(total-1, 0)
+    last = np.maximum(starts+counts-1, starts)
+    index = np.clip(np.searchsorted(cumulative, position, side='right'), starts, last)
+    following = np.minimum(index+1, last)
+    fraction = np.clip(position - (cumulative[np.minimum(index, len(data)-1)]-1), 0, 1)
+    lower = data[np.minimum(index, len(data)-1)]
+    upper = data[np.minimum(following, len(data)-1)]
+    value = np.where(fraction > 0, lower + fraction*(upper-lower), lower)
+
+    return np.where((counts > 0) & (total > 0), value, np.nan)
+
+
+def Bootstrap_interval(sortedData, offsets, statistic='mean', resamples=1000, level=95, seed=None, workers=None,
+                       max_indices=1e7, max_count=None):
+
+    # Import dependencies
+    import os
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+
+    data = np.asarray(sortedData)
+    ncats = len(offsets) - 1
+    if workers is None:
+        workers = os.cpu_count()
+
+    # Resamples are drawn in batches of at most 2^20 indices, the same for
+    # any number of workers so the streams (and result) do not change
+    segments = [data[offsets[n]:offsets[n+1]] for n in range(0, ncats)]
+    if max_count is not None:
+        segments = [segment if len(segment) <= max_count else segment[:0] for segment in segments]
+    segments = [segment[~np.isnan(segment)] for segment in segments]
+    batches = [max(1, min(resamples, 2**20//max(len(segment), 1))) for segment in segments]
+    seeds = np.random.SeedSequence(seed).spawn(ncats)
+    jobs = list()
+    for n in range(0, ncats):
+        starts = range(0, resamples, batches[n])
+        for start, batchSeed in zip(starts, seeds[n].spawn(len(starts))):
+            jobs.append((n, min(batches[n], resamples-start), batchSeed))
+
+    def Resample(job):
+        n, size, batchSeed = job
+        segment = segments[n]
+        if len(segment) == 0:
+            return np.full(size, np.nan)
+        rng = np.random.default_rng(batchSeed)
+        indexType = np.int32 if len(segment) < 2**31 else np.int64
+        resampled = segment[rng.integers(0, len(segment), (size, len(segment)), dtype=indexType)]
+        if statistic == 'median':
+            return np.median(resampled, axis=1)
+        return np.mean(resampled, axis=1)
+
+    # Fewer threads when their batches together hold more than max_indices
+    largest = max([job[1]*len(segments[job[0]]) for job in jobs], default=1)
+    workers = max(1, min(workers, int(max_indices//max(largest, 1))))
+    if workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(Resample, jobs))
+    else:
+        results = [Resample(job) for job in jobs]
+
+    low = np.full(ncats, np.nan)
+    high = np.full(ncats, np.nan)
+    codes = np.array([job[0] for job in jobs], dtype=np.intp)
+    for n in range(0, ncats):
+        values = np.concatenate([results[j] for j in np.flatnonzero(codes == n)])
+        if not np.all(np.isnan(values)):
+            low[n], high[n] = np.percentile(values, [(100-level)/2, 100-(100-level)/2])
+
+    return low, high
+
+
+def Binned_statistics(centers, binned, count, mean, std, percentiles=(2.5, 97.5)):
+
+    # Import dependencies
+    import numpy as np
+
+    centers = np.asarray(centers)
+    count = np.asarray(count)
+    cumulative = np.cumsum(np.atleast_2d(binned), axis=1)
+    statistics = dict()
+    statistics['count'] = count
+    statistics['mean'] = np.asarray(mean)
+    statistics['std'] = np.asarray(std)
+    statistics['sem'] = statistics['std']/np.sqrt(count)
+    for name, q in [('median', 50), ('q1', 25), ('q3', 75), ('low', percentiles[0]), ('high', percentiles[1])]:
+        index = np.sum(cumulative < q/100*count[:, np.newaxis], axis=1)
+        statistics[name] = centers[np.minimum(index, len(centers)-1)]
+
+    return statistics
+
+
+def Error_bars(statistics, error_type='SD', sortedData=None, offsets=None, seed=None):
+
+    # Import dependencies
+    import numpy as np
+
+    mean = statistics['mean']
+    if error_type == 'SEM':
+        return mean, mean-statistics['sem'], mean+statistics['sem']
+    if error_type == 'CI':
+        if sortedData is None:
+            # Without the data points: normal approximation of the interval
+            return mean, mean-1.96*statistics['sem'], mean+1.96*statistics['sem']
+        # Large categories are not resampled, their bootstrap interval of
+        # the mean is the normal approximation
+        large = np.diff(offsets) > 100000
+        low, high = Bootstrap_interval(sortedData, offsets, 'mean', seed=seed, max_count=100000)
+        low = np.where(large, mean-1.96*statistics['sem'], low)
+        high = np.where(large, mean+1.96*statistics['sem'], high)
+        return mean, low, high
+    if error_type == 'IQR':
+        return statistics['median'], statistics['q1'], statistics['q3']
+    if error_type == 'Percentile':
+        return statistics['median'], statistics['low'], statistics['high']
+
+    return mean, mean-statistics['std'], mean+statistics['std']
@@ -0,0 +1,254 @@
+"""
+Functions to compute the trendlines of all categories at once from the
+category-sorted data (see Group_categories). The least squares line of
+every category follows from sums per category (bincount over chunks of the
+data), and is drawn between its two end points. The LOWESS trend is
+computed on binned data: the data points of a category are summarized in
+bins along x, local linear fits with tricube weights are made on the bin
+means at a small fixed grid, and robustness iterations reweight the data
+points by their residuals (bisquare weights), as in LOWESS. The cost is
+linear in the number of data points. NaN values are ignored. With weights
+(e.g. survey weights or the counts of binned data points) the fits are
+weighted least squares, and the LOWESS bins hold weighted sums.
+
+INPUT
+Group_regression(sortedDatax, sortedDatay, offsets, weights)
+sortedDatax: N x 1 numpy array containing the x-values sorted by category
+sortedDatay: N x 1 numpy array containing the y-values sorted by category
+offsets:     (K+1) x 1 numpy array with the start of every category in
+             sortedDatax, see Group_categories
+weights:     N x 1 numpy array with the weight of every data point, sorted
+             as sortedDatax. Defaults to None (every data point counts once).
+
+OUTPUT
+regression:  dict with K x 1 numpy arrays
+             'count'      number of (non-NaN) data points
+             'slope'      slope of the least squares line
+             'intercept'  intercept of the least squares line
+             'low'        smallest x-value
+             'high'       largest x-value
+
+Group_trendlines(sortedDatax, sortedDatay, offsets, trendline, grid_size, bins, frac, iterations, weights)
+trendline:   False, True or 'Linear' (least squares line) or 'Lowess'
+             (robust locally weighted trend)
+grid_size:   number of points of a LOWESS trend. Defaults to 64.
+bins:        number of bins along x per category. Defaults to 100.
+frac:        fraction of the data points of a category used in every local
+             fit. Defaults to 2/3.
+iterations:  number of robustness iterations. Defaults to 2.
+
+OUTPUT
+xTrendline, yTrendline: concatenated trendlines of all categories (2
+             points per line, grid_size points per LOWESS trend)
+trendlineOffsets: (K+1) x 1 numpy array, the trendline of category n is
+             xTrendline[trendlineOffsets[n]:trendlineOffsets[n+1]]
+
+Binned_lowess(sortedDatax, sortedDatay, offsets, regression, grid_size, bins, frac, iterations, weights)
+Returns the grid and the LOWESS trend (K x grid_size numpy arrays), see
+Group_trendlines; regression is the output of Group_regression.
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Group_regression(sortedDatax, sortedDatay, offsets, weights=None):
+
+    # Import dependencies
+    import numpy as np
+    from group_categories import Chunk_codes
+
+    datax = np.asarray(sortedDatax)[offsets[0]:offsets[-1]]
+    datay = np.asarray(sortedDatay)[offsets[0]:offsets[-1]]
+    if weights is not None:
+        weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+    ncats = len(offsets) - 1
+    chunk = 2**16
+
+    # Means per category, read in chunks so temporary arrays stay small
+    count = np.zeros(ncats, dtype=np.intp)
+    total = np.zeros(ncats)
+    sumx = np.zeros(ncats)
+    sumy = np.zeros(ncats)
+    low = np.full(ncats, np.inf)
+    high = np.full(ncats, -np.inf)
+    for start in range(0, len(datax), chunk):
+        partx = datax[start:start+chunk]
+        party = datay[start:start+chunk]
+        valid = ~(np.isnan(partx) | np.isnan(party))
+        codes = Chunk_codes(offsets, start, start+len(partx))[valid]
+        partWeights = np.ones(len(codes)) if weights is None else weights[start:start+chunk][valid]
+        count += np.bincount(codes, minlength=ncats)
+        total += np.bincount(codes, weights=partWeights, minlength=ncats)
+        sumx += np.bincount(codes, weights=partWeights*partx[valid], minlength=ncats)
+        sumy += np.bincount(codes, weights=partWeights*party[valid], minlength=ncats)
+        np.minimum.at(low, codes, partx[valid])
+        np.maximum.at(high, codes, partx[valid])
+
+    # Centered sums of squares and products
+    with np.errstate(invalid='ignore', divide='ignore'):
+        meanx = sumx/total
+        meany = sumy/total
+        sxx = np.zeros(ncats)
+        sxy = np.zeros(ncats)
+        for start in range(0, len(datax), chunk):
+            partx = datax[start:start+chunk]
+            party = datay[start:start+chunk]
+            valid = ~(np.isnan(partx) | np.isnan(party))
+            codes = Chunk_codes(offsets, start, start+len(partx))[valid]
+            deviation = partx[valid] - meanx[codes]
+            weighted = deviation if weights is None else deviation*weights[start:start+chunk][valid]
+            sxx += np.bincount(codes, weights=weighted*deviation, minlength=ncats)
+            sxy += np.bincount(codes, weights=weighted*(party[valid] - meany[codes]), minlength=ncats)
+
+        # A category with a single x-value gets a horizontal line
+        slope = np.where(sxx > 0, sxy/sxx, 0.0)
+
+    regression = dict()
+    regression['count'] = count
+    regression['slope'] = slope
+    regression['intercept'] = meany - slope*meanx
+    regression['low'] = np.where(count > 0, low, np.nan)
+    regression['high'] = np.where(count > 0, high, np.nan)
+
+    return regression
+
+
+def Group_trendlines(sortedDatax, sortedDatay, offsets, trendline=True, grid_size=64, bins=100, frac=2/3, iterations=2,
+                     weights=None):
+
+    # Import dependencies
+    import numpy as np
+
+    ncats = len(offsets) - 1
+    if trendline is False:
+        return np.zeros(0), np.zeros(0), np.zeros(ncats+1, dtype=np.intp)
+
+    regression = Group_regression(sortedDatax, sortedDatay, offsets, weights)
+    if trendline == 'Lowess':
+        xTrendline, yTrendline = Binned_lowess(sortedDatax, sortedDatay, offsets, regression, grid_size, bins,
+                                               frac, iterations, weights)
+        return xTrendline.ravel(), yTrendline.ravel(), grid_size*np.arange(ncats+1)
+
+    # Straight lines through their two end points
+    xTrendline = np.column_stack((regression['low']-0.05, regression['high']+0.05))
+    yTrendline = xTrendline*regression['slope'][:, np.newaxis] + regression['intercept'][:, np.newaxis]
+
+    return xTrendline.ravel(), yTrendline.ravel(), 2*np.arange(ncats+1)
+
+
+def Binned_lowess(sortedDatax, sortedDatay, offsets, regression, grid_size=64, bins=100, frac=2/3, iterations=2,
+                  weights=None):
+
+    # Import dependencies
+    import numpy as np
+    from group_categories import Chunk_codes
+
+    datax = np.asarray(sortedDatax)[offsets[0]:offsets[-1]]
+    datay = np.asarray(sortedDatay)[offsets[0]:offsets[-1]]
+    if weights is not None:
+        weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+    ncats = len(offsets) - 1
+    chunk = 2**16
+
+    # Bins and evaluation grid of every category span its x-range
+    low = np.nan_to_num(regression['low'])
+    high = np.nan_to_num(regression['high'])
+    width = np.where(high > low, (high-low)/bins, 1.0)
+    grid = low[:, np.newaxis] + (high-low)[:, np.newaxis]*np.linspace(0, 1, grid_size)[np.newaxis, :]
+    step = np.where(high > low, (high-low)/(grid_size-1), 1.0)
+
+    robustness = None
+    for iteration in range(0, iterations+1):
+        # Weighted count, x and y sums per bin
+        binCount = np.zeros(ncats*bins)
+        binx = np.zeros(ncats*bins)
+        biny = np.zeros(ncats*bins)
+        for start in range(0, len(datax), chunk):
+            partx = datax[start:start+chunk]
+            party = datay[start:start+chunk]
+            valid = ~(np.isnan(partx) | np.isnan(party))
+            codes = Chunk_codes(offsets, start, start+len(partx))[valid]
+            partx = partx[valid]
+            party = party[valid]
+            index = np.clip(((partx - low[codes])/width[codes]).astype(np.intp), 0, bins-1)
+            flat = codes*bins + index
+            partWeights = np.ones(len(flat)) if weights is None else weights[start:start+chunk][valid]
+            if robustness is not None:
+                partWeights = partWeights*robustness[start:start+chunk][valid]
+            binCount += np.bincount(flat, weights=partWeights, minlength=ncats*bins)
+            binx += np.bincount(flat, weights=partWeights*partx, minlength=ncats*bins)
+            biny += np.bincount(flat, weights=partWeights*party, minlength=ncats*bins)
+        binCount = binCount.reshape(ncats, bins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            binx = np.where(binCount > 0, binx.reshape(ncats, bins)/binCount, 0.0)
+            biny = np.where(binCount > 0, biny.reshape(ncats, bins)/binCount, 0.0)
+        if robustness is None:
+            # The span of the local fits is set by the counts before the
+            # robustness weights
+            spanCount = binCount
+
+        # Local linear fits, a batch of categories at a time
+        fit = np.empty(grid.shape)
+        batch = max(1, 2**20//(grid_size*bins))
+        for first in range(0, ncats, batch):
+            rows = slice(first, first+batch)
+            fit[rows] = Local_linear(grid[rows], binx[rows], biny[rows], binCount[rows], spanCount[rows], width[rows],
+                                     frac)
+        if iteration == iterations:
+            # Categories without (weighted) data points have no trend
+            fit[~(np.sum(spanCount, axis=1) > 0)] = np.nan
+            break
+
+        # Robustness weights from the residuals of all data points
+        robustness = np.empty(len(datax))
+        for start in range(0, len(datax), chunk):
+            partx = datax[start:start+chunk]
+            codes = Chunk_codes(offsets, start, start+len(partx))
+            position = np.clip((partx - low[codes])/step[codes], 0, grid_size-1)
+            index = np.minimum(np.nan_to_num(position).astype(np.intp), grid_size-2)
+            fraction = position - index
+            estimate = fit[codes, index]*(1-fraction) + fit[codes, index+1]*fraction
+            robustness[start:start+len(partx)] = np.abs(datay[start:start+chunk] - estimate)
+        bounds = offsets - offsets[0]
+        scale = np.array([np.nanmedian(robustness[bounds[n]:bounds[n+1]]) if regression['count'][n] > 0 else np.nan
+                          for n in range(0, ncats)])
+        scale = 6*np.where(scale > 0, scale, np.inf)
+        for start in range(0, len(datax), chunk):
+            residual = robustness[start:start+chunk]/scale[Chunk_codes(offsets, start, min(start+chunk, len(datax)))]
+            robustness[start:start+chunk] = np.where(residual < 1, (1 - residual**2)**2, 0.0)
+
+    return grid, fit
+
+
+def Local_linear(grid, binx, biny, binCount, spanCount, width, frac=2/3):
+
+    # Import dependencies
+    import numpy as np
+
+    # Span: the distance from every grid point that includes frac of the
+    # data points of the category
+    distance = np.abs(grid[:, :, np.newaxis] - binx[:, np.newaxis, :])
+    distance = np.where(spanCount[:, np.newaxis, :] > 0, distance, np.inf)
+    nearest = np.argsort(distance, axis=2)
+    sortedDistance = np.take_along_axis(distance, nearest, axis=2)
+    cumulative = np.cumsum(np.take_along_axis(np.broadcast_to(spanCount[:, np.newaxis, :], distance.shape), nearest,
+                                              axis=2), axis=2)
+    reached = np.minimum(np.sum(cumulative < frac*cumulative[:, :, -1:], axis=2), distance.shape[2]-1)
+    span = np.take_along_axis(sortedDistance, reached[:, :, np.newaxis], axis=2)[:, :, 0]
+    span = np.maximum(np.where(np.isfinite(span), span, 0.0), width[:, np.newaxis])
+
+    # Weighted least squares on the bin means with tricube weights
+    local = binCount[:, np.newaxis, :]*np.clip(1 - (distance/(1.0001*span[:, :, np.newaxis]))**3, 0, 1)**3
+    total = np.maximum(np.sum(local, axis=2), 1e-300)
+    meanx = np.sum(local*binx[:, np.newaxis, :], axis=2)/total
+    meany = np.sum(local*biny[:, np.newaxis, :], axis=2)/total
+    deviation = binx[:, np.newaxis, :] - meanx[:, :, np.newaxis]
+    sxx = np.sum(local*deviation**2, axis=2)
+    sxy = np.sum(local*deviation*(biny[:, np.newaxis, :] - meany[:, :, np.newaxis]), axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(sxx > 1e-12*total*width[:, np.newaxis]**2, sxy/sxx, 0.0)
+
+    return meany + slope*(grid - meanx)
@@ -0,0 +1,325 @@
+"""
+Jitter distribution figure (External plot type) that is updated while data
+arrives, for example from a running measurement. Per category the number
+of data points, mean, standard deviation and binned distribution are kept
+as running totals (see New_groups and Add_chunk in streaming_input), with
+a bounded sample of jitter points. Appending a batch only updates the
+statistics with the new data points and only recomputes the
+distributions, jitter and artists of the categories in the batch; the
+artists are updated in place and redrawn with blitting. The cost of an
+update therefore grows with the batch size and the number of categories
+in it, not with the number of data points appended before.
+
+INPUT
+IncrementalJitterFigure(data, cats, KWARG1 = value1, ...)
+data:     N x 1 numpy array with the first data points (optional)
+cats:     N x 1 list or numpy array with their categories
+
+OPTIONAL INPUT
+    'Colors'       Color of the jitter plots, one row per category:
+                   np.array([[r,g,b], [r,g,b], ...]). Categories without
+                   a color get the default colors.
+    'Markersize'   Markersize of data points. Defaults to 150.
+    'Linewidth'    Linewidth of the mean and std plot. Defaults to 3.
+    'Capsize'      Capsize of the mean and std plot. Defaults to 5.
+    'YLabel'       Ylabel: string. Defaults to empty string.
+    'DistType'     'Kernel' or 'Gaussian'. Defaults to Kernel.
+    'GridSize'     Number of points of the distributions. Defaults to 512.
+    'Bins'         Number of bins of the running distributions.
+                   Defaults to 4096.
+    'SampleSize'   Maximum number of jitter points per category.
+                   Defaults to 1000.
+    'Seed'         Seed of the jitter and of the sample. Defaults to None.
+    'Blit'         True or False, redraw only the data artists.
+                   Defaults to True.
+    'Figure'       Existing matplotlib figure to draw in. Defaults to a
+                   new figure.
+    'Show'         True or False, show the figure. Defaults to True.
+
+METHODS
+append(data, cats)   add a batch of data points and update the figure
+redraw()             draw the whole figure again (axes, ticks, labels)
+
+EXAMPLE
+live = IncrementalJitterFigure(YLabel='Step length (m)')
+for data, cats in measurement:
+    live.append(data, cats)
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+class IncrementalJitterFigure:
+
+    def __init__(self, data=None, cats=None, **kwargs):
+
+        # Import dependencies
+        import numpy as np
+        import matplotlib.pyplot as plt
+        from streaming_input import New_groups
+
+        # Default settings
+        self.colors = None
+        self.marker_size = 150
+        self.line_width = 3
+        self.cap_size = 5
+        self.y_label = ''
+        self.dist_type = 'Kernel'
+        self.grid_size = 512
+        self.blit = True
+        bins = 4096
+        sample_size = 1000
+        seed = None
+        figure = None
+        show = True
+
+        # Optional settings
+        for item, value in kwargs.items():
+            if item == 'Colors':
+                self.colors = value
+            if item == 'Markersize':
+                self.marker_size = value
+            if item == 'Linewidth':
+                self.line_width = value
+            if item == 'Capsize':
+                self.cap_size = value
+            if item == 'YLabel':
+                self.y_label = value
+            if item == 'DistType':
+                if value != 'Kernel' and value != 'Gaussian':
+                    print('Unknown DistType. Choose between "Kernel" and "Gaussian". The default distribution (Kernal) is used.')
+                else:
+                    self.dist_type = value
+            if item == 'GridSize':
+                self.grid_size = int(value)
+            if item == 'Bins':
+                bins = int(value)
+            if item == 'SampleSize':
+                sample_size = int(value)
+            if item == 'Seed':
+                seed = value
+            if item == 'Blit':
+                self.blit = value
+            if item == 'Figure':
+                figure = value
+            if item == 'Show':
+                show = value
+
+        self.state = New_groups(bins, sample_size, seed)
+        
+        # Every category gets the random stream of its name when it first
+        # appears, as in jitter_distribution_layout
+        self.seeds = np.random.SeedSequence(seed)
+        self.rngs = list()
+
+        # Artists and drawn statistics per category
+        self.points = list()
+        self.curves = list()
+        self.fills = list()
+        self.jitter = list()
+        self.value = list()
+        self.density = list()
+        self.background = None
+        self.drawing = False
+
+        if figure is None:
+            self.fig, self.axs = plt.subplots(nrows=1, ncols=2, gridspec_kw={'width_ratios': [3, 1]})
+        else:
+            self.fig = figure
+            self.fig.clf()
+            self.axs = self.fig.subplots(nrows=1, ncols=2, gridspec_kw={'width_ratios': [3, 1]})
+        self.axs[1].sharey(self.axs[0])
+        self.axs[1].tick_params(axis='both', colors='none')
+        for side in ['bottom', 'left', 'right', 'top']:
+            self.axs[1].spines[side].set_color('none')
+        self.axs[0].set(ylabel=self.y_label)
+
+        # Means and standard deviations of all categories
+        self.bars = self.axs[0].vlines([], [], [], colors='k', linewidth=self.line_width)
+        self.caps, = self.axs[0].plot([], [], linestyle='none', marker='_', markersize=2*self.cap_size,
+                                      markeredgecolor='k')
+        self.means = self.axs[0].scatter(np.zeros(0), np.zeros(0), s=self.marker_size, color='k',
+                                         edgecolors='none', zorder=3)
+
+        self.fig.canvas.mpl_connect('draw_event', self.Forget_background)
+        if show:
+            plt.show(block=False)
+        if data is not None:
+            self.append(data, cats)
+
+    def append(self, data, cats):
+
+        # Import dependencies
+        import numpy as np
+        from streaming_input import Add_chunk
+
+        ncats = len(self.state['catnames'])
+        changed = Add_chunk(self.state, np.asarray(data).ravel(), np.asarray(cats).ravel())
+        if len(changed) == 0:
+            return self.fig
+        for n in range(ncats, len(self.state['catnames'])):
+            self.New_category(n)
+        self.Update_categories(changed)
+
+        # New categories or data outside the axes need a full redraw
+        limits = self.Data_limits()
+        if len(self.state['catnames']) > ncats or not self.Within_view(limits):
+            self.redraw(limits)
+        else:
+            self.Blit()
+
+        return self.fig
+
+    def New_category(self, n):
+
+        # Import dependencies
+        import numpy as np
+        import matplotlib as mpl
+        from jitter_distribution_figure import Category_streams
+
+        if self.colors is not None and len(self.colors) > n:
+            color = self.colors[n]
+        else:
+            color = mpl.colormaps['Dark2']([n])[0]
+        self.points.append(self.axs[0].scatter(np.zeros(0), np.zeros(0), s=self.marker_size, color=color,
+                                               edgecolors='none', alpha=0.6))
+        self.curves.append(self.axs[1].plot([], [], color=color, linewidth=0.7*self.line_width)[0])
+        self.fills.append(self.axs[1].fill_between(x=np.zeros(0), y1=np.zeros(0), y2=0, color=color, alpha=0.4,
+                                                   edgecolor='none'))
+        self.rngs.append(np.random.default_rng(Category_streams(self.seeds.entropy, [self.state['catnames'][n]])[0]))
+        self.jitter.append(np.zeros((0, 2)))
+        self.value.append(np.zeros(0))
+        self.density.append(np.zeros(0))
+
+    def Update_categories(self, changed):
+
+        # Import dependencies
+        import numpy as np
+        from kernel_density import Binned_kernel_densities
+        from jitter_distribution_figure import Jitter, Distribution
+
+        state = self.state
+        count = state['count'][changed]
+        mean = state['mean'][changed, 0]
+        std = np.sqrt(state['m2'][changed, 0]/count)
+        centers = state['low'][0] + state['width'][0]*(np.arange(0, state['bins'])+0.5)
+
+        # Distributions of the categories with new data points only
+        kdes = Binned_kernel_densities(centers, state['binned'][0][changed], count, std, self.grid_size)
+        sampleCodes = state['sampleCodes']
+        starts = np.searchsorted(sampleCodes, changed, side='left')
+        stops = np.searchsorted(sampleCodes, changed, side='right')
+        for k, n in enumerate(changed):
+            sample = state['sample'][starts[k]:stops[k], 0]
+            if std[k] > 0:
+                xJitter, yJitter, xMean, yMean, xError, yError = Jitter(sample, n, kdes[k], self.grid_size,
+                                                                        mean[k], std[k], self.rngs[n])
+                density, value = Distribution(sample, self.dist_type, kdes[k], self.grid_size, mean[k], std[k])
+            else:
+                # No distribution yet, e.g. a category with one data point
+                xJitter, yJitter = np.full(len(sample), float(n)), sample
+                density, value = np.zeros(0), np.zeros(0)
+            self.jitter[n] = np.column_stack((xJitter, yJitter))
+            self.value[n] = value
+            self.density[n] = density
+
+            self.points[n].set_offsets(self.jitter[n])
+            self.curves[n].set_data(density, value)
+            polygon = np.concatenate((np.column_stack((density, value)), np.column_stack((density[::-1], np.zeros(len(value))))))
+            self.fills[n].set_verts([polygon])
+
+        # Means and standard deviations of all categories, K values
+        ncats = len(state['catnames'])
+        x = np.arange(ncats) + 0.2
+        mean = state['mean'][:, 0]
+        std = np.sqrt(state['m2'][:, 0]/state['count'])
+        self.bars.set_segments(np.stack((np.column_stack((x, mean-std)), np.column_stack((x, mean+std))), axis=1))
+        self.caps.set_data(np.concatenate((x, x)), np.concatenate((mean-std, mean+std)))
+        self.means.set_offsets(np.column_stack((x, mean)))
+
+    def Data_limits(self):
+
+        # Import dependencies
+        import numpy as np
+
+        count = self.state['count']
+        mean = self.state['mean'][:, 0]
+        std = np.sqrt(self.state['m2'][:, 0]/count)
+        values = [value for value in self.value if len(value)] + [self.jitter[n][:, 1] for n in range(len(self.jitter)) if len(self.jitter[n])]
+        low = min(np.min(mean-std), min([np.min(value) for value in values]))
+        high = max(np.max(mean+std), max([np.max(value) for value in values]))
+        peak = max([np.max(density) for density in self.density if len(density)] + [0.0])
+        if peak == 0:
+            peak = 1.0
+
+        return low, high, peak
+
+    def Within_view(self, limits):
+
+        low, high, peak = limits
+        ylim = self.axs[0].get_ylim()
+        xlim = self.axs[1].get_xlim()
+        return low >= ylim[0] and high <= ylim[1] and peak <= xlim[1]
+
+    def redraw(self, limits=None):
+
+        # Import dependencies
+        import numpy as np
+
+        if limits is None:
+            limits = self.Data_limits()
+        low, high, peak = limits
+
+        # Limits with a margin, so small updates fit without a full redraw
+        margin = 0.1*(high-low) if high > low else 1.0
+        ncats = len(self.state['catnames'])
+        self.axs[0].set_ylim([low-margin, high+margin])
+        self.axs[1].set_xlim([0, 1.2*peak])
+        self.axs[0].set(xticks=np.arange(start=0.1, stop=ncats, step=1), xticklabels=self.state['catnames'])
+        self.axs[0].set_xlim([-0.5, ncats+0.03])
+        if not self.blit:
+            self.fig.canvas.draw_idle()
+            return
+
+        # Store the figure without data artists as background for blitting
+        self.drawing = True
+        for artist in self.Data_artists():
+            artist.set_visible(False)
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.Data_artists():
+            artist.set_visible(True)
+        self.drawing = False
+        self.Blit()
+
+    def Data_artists(self):
+
+        return self.fills + self.curves + self.points + [self.bars, self.caps, self.means]
+
+    def Forget_background(self, event):
+
+        # Any other draw (e.g. resizing the window) invalidates the background
+        if not self.drawing:
+            self.background = None
+
+    def Blit(self):
+
+        canvas = self.fig.canvas
+        if not self.blit:
+            canvas.draw_idle()
+            return
+        if self.background is None:
+            self.redraw()
+            return
+
+        # Draw the data artists on the stored background
+        canvas.restore_region(self.background)
+        for artist in self.fills + self.curves:
+            self.axs[1].draw_artist(artist)
+        for artist in self.points + [self.bars, self.caps, self.means]:
+            self.axs[0].draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
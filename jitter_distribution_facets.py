@@ -0,0 +1,155 @@
+"""
+Function to create one figure with a jitter distribution panel per
+variable (small multiples), for example 20-40 outcome variables of the
+same cohort. The categories are grouped once for all variables, the
+statistics of the panels are computed in a thread pool (see
+jitter_distribution_layout), and all panels are drawn in one figure grid
+with the same categories on the x-axis.
+
+INPUT
+jitter_distribution_facets(data, cats)
+data:     N x V numpy array (or pandas DataFrame) with one column per
+          variable
+cats:     N x 1 list of character vectors, N x 1 numpy array of integer
+          codes or a pandas Categorical representing the
+          corresponding groups of the data points (rows)
+
+OPTIONAL INPUT
+jitter_distribution_facets(..., KWARG1 = value1, KWARG2 = value2, ...)
+
+    'Names'        List with the name of every variable, shown as the
+                   y-label of its panel. Defaults to the DataFrame
+                   columns or 'Variable 1', 'Variable 2', ...
+    'Columns'      Number of panels per row.
+                   Defaults to ceil(sqrt(V)).
+    'ShareY'       True or False, the same y-axis for all panels.
+                   Defaults to False.
+    'Workers'      Number of threads computing the panels. 0 computes
+                   them one after another. Defaults to the number of CPUs.
+    'Figure'       Existing matplotlib figure to draw in (it is cleared
+                   first). Defaults to a new figure.
+    'Show'         True or False, show the figure.
+                   Defaults to True.
+    'Profile'      A dict that is filled with a timing report, or a
+                   callable that receives it (see profiling.py). The
+                   stages of all panels are summed, every per category
+                   entry holds its 'panel' and 'sizes' holds a list with
+                   the sizes of every panel ('panels').
+                   Defaults to None (no profiling).
+
+All other settings of jitter_distribution_figure (DistType, ErrorType,
+PlotType, Colors, Markersize, YLim, Seed, Cache, ...) apply to every panel.
+
+OUTPUT
+fig:      matplotlib figure with one subfigure per variable
+
+EXAMPLE
+fig = jitter_distribution_facets(outcomes, groups, Names=outcomeNames, ErrorType='SEM')
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def jitter_distribution_facets(data=False, cats=False, **kwargs):
+
+    # Import dependencies
+    import os
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from concurrent.futures import ThreadPoolExecutor
+    from group_categories import Group_categories
+    from jitter_distribution_figure import jitter_distribution_layout, render_jitter_distribution
+    from profiling import New_report, Merge_reports, Finish_report
+
+    # Input errors
+    if type(data) == bool or type(cats) == bool:
+        raise Exception("Not enough input arguments")
+    if len(data) != len(cats):
+        raise Exception('Data and category vector should be the same length')
+
+    # Default settings
+    names = list(data.columns) if hasattr(data, 'columns') else None
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    nvars = data.shape[1]
+    columns = int(np.ceil(np.sqrt(nvars)))
+    share_y = False
+    workers = os.cpu_count()
+    figure = None
+    show = True
+    profile = None
+
+    # Optional settings, the others are passed to every panel
+    settings = dict()
+    for item, value in kwargs.items():
+        if item == 'Names':
+            names = list(value)
+        elif item == 'Columns':
+            columns = int(value)
+        elif item == 'ShareY':
+            share_y = value
+        elif item == 'Workers':
+            workers = value
+        elif item == 'Figure':
+            figure = value
+        elif item == 'Show':
+            show = value
+        elif item == 'Profile':
+            profile = value
+        else:
+            settings[item] = value
+    if names is None or len(names) != nvars:
+        names = ['Variable ' + str(v+1) for v in range(0, nvars)]
+    rows = int(np.ceil(nvars/columns))
+
+    # Group the categories once for all variables
+    grouping = Group_categories(cats)
+
+    # Statistics of every panel. Every thread gets its own settings and
+    # timing report, the reports are merged when all panels are done
+    report = New_report(profile)
+    panelReports = [dict() if report is not None else None for v in range(0, nvars)]
+    def Panel_layout(v):
+        return jitter_distribution_layout(data[:, v], cats, **dict(settings, Grouping=grouping, Profile=panelReports[v]))
+
+    if workers and nvars > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            layouts = list(pool.map(Panel_layout, range(0, nvars)))
+    else:
+        layouts = [Panel_layout(v) for v in range(0, nvars)]
+    if report is not None:
+        Merge_reports(report, panelReports, 'panel')
+
+    # One figure, one subfigure per panel
+    if figure is None:
+        fig = plt.figure(figsize=(4*columns, 3*rows))
+    else:
+        fig = figure
+        fig.clf()
+    panels = np.atleast_1d(fig.subfigures(rows, columns, squeeze=False).ravel())
+    jitterAxes = list()
+    for v in range(0, nvars):
+        render_jitter_distribution(layouts[v], **dict(settings, YLabel=names[v], Figure=panels[v], Show=False, Profile=report))
+        jitterAxes.append(panels[v].axes[0])
+
+        # Category names only below the bottom panel of every column
+        if v + columns < nvars:
+            jitterAxes[v].tick_params(axis='x', labelbottom=False)
+
+    for v in range(1, nvars):
+        jitterAxes[v].sharex(jitterAxes[0])
+        if share_y:
+            jitterAxes[v].sharey(jitterAxes[0])
+    if share_y:
+        jitterAxes[0].autoscale(axis='y')
+
+    Finish_report(report, profile)
+
+    if show:
+        plt.show(block=False)
+
+    return fig
@@ -2,11 +2,37 @@
 Function to create a figure showing the individual data points, mean, 
 standard deviation, and distribution of multiple categories. 
 
+The figure is made in two stages, which can also be called separately:
+jitter_distribution_layout computes all statistics (jitter coordinates,
+means, standard deviations and distributions) and returns them as a plot
+layout (a dict of numpy arrays, see plot_layout.py), and
+render_jitter_distribution draws a layout. A layout can be saved with
+Save_layout, loaded without copying with Load_layout, and rendered again
+with other plot settings without recomputing any statistics:
+    layout = jitter_distribution_layout(data, cats, DistType='Gaussian')
+    fig = render_jitter_distribution(layout, Colors=colors, PlotType='Internal')
+The settings DistType, ErrorType, GridSize, Bandwidth, Support, GridType,
+ChunkSize, SampleSize, LargeN, Seed, Cache, CacheSize, Grouping, Weights and
+Counts belong to the layout stage, all other settings to the render stage.
+
 INPUT
 jitter_distribution_figure(data, cats)
 data:     N x 1 numpy array containing the data points to be plotted
-cats:     N x 1 list of character vectors representing the 
+cats:     N x 1 list of character vectors, N x 1 numpy array of integer
+          codes or a pandas Categorical representing the 
           corresponding groups of the data points
+
+Very large datasets can be streamed (see Read_chunks in streaming_input):
+data and cats can be np.memmap arrays or paths to .npy files, or data can
+be an iterator yielding (data, cats) chunks or a path to a text file with
+a value and a category column (cats omitted). Means, standard deviations
+and distributions are computed from all data points, the jitter points
+from a sample per category.
+
+Pre-aggregated data can be plotted without the individual data points
+(see weighted_input.py): with the option Counts, data holds the bin edges
+and cats the K category names, and Counts the K x B binned counts. With
+the option Weights every data point has a weight (e.g. a survey weight).
           
 OPTIONAL INPUT
 jitter_plot(..., KWARG1 = value1, KWARG2 = value2, ...)
@@ -26,12 +52,123 @@ jitter_plot(..., KWARG1 = value1, KWARG2 = value2, ...)
                    Defaults to empty string.
     'DistType'     'Kernel' or 'Gaussian'. 
                    Defaults to Kernel. 
+    'ErrorType'    Error bar: 'SD' (mean +- standard deviation), 'SEM'
+                   (mean +- standard error), 'CI' (mean with 95%
+                   bootstrap confidence interval, see group_statistics.py),
+                   'IQR' (median with interquartile range) or
+                   'Percentile' (median with 2.5-97.5 percentiles).
+                   Defaults to SD.
     'PlotType'     'Interal' or 'External'.
                    The option 'Interal' plots the distribution to the
                    right of the mean and errorbar. 
                    The option 'External' plots the distribution to the
                    right of the figure outline.   
                    Defaults to External. 
+    'GridSize'     Number of points at which the Kernel and Gaussian
+                   distributions are evaluated, independent of the
+                   units of the data.
+                   Defaults to 512.
+    'ChunkSize'    Number of data points read at once from streamed input.
+                   Defaults to 100000.
+    'SampleSize'   Maximum number of jitter points per category for
+                   streamed input.
+                   Defaults to 1000.
+    'LargeN'       Number of data points above which the jitter columns
+                   show a stratified subsample with the same distribution
+                   as all data points. Means, standard deviations and
+                   distributions are computed from all data points.
+                   False shows all data points.
+                   Defaults to 100000.
+    'Seed'         Seed of the random jitter and of the sampled data
+                   points, for reproducible figures. Every category gets
+                   its own random stream from the seed and its name
+                   (np.random.SeedSequence), so the random offsets of a
+                   category do not depend on which other categories there
+                   are, on their order or on the thread computing it. The width of the jitter
+                   follows from the kernel density of the category, which
+                   is fitted on its own grid for data in memory; streamed
+                   and binned input (Counts) share the bins of all
+                   categories, so there it also depends on the data range
+                   of the other categories.
+                   Defaults to None (not reproducible).
+    'Bandwidth'    'Scott', 'Silverman' or 'SheatherJones'.
+                   Bandwidth rule of the kernel distributions. Scott and
+                   Silverman are normal reference rules, SheatherJones is
+                   a plug-in rule that suits skewed and multimodal data.
+                   Defaults to Scott.
+    'Support'      'Padded' or 'Data'.
+                   'Padded' draws the kernel distributions over the data
+                   range plus 3 bandwidths, 'Data' over the data range
+                   only (the density is reflected at its ends).
+                   Defaults to Padded.
+    'GridType'     'Uniform' or 'Quantile'.
+                   'Quantile' places half of the GridSize points at
+                   quantiles of the kernel distribution, so skewed and
+                   heavy-tailed data are drawn accurately with a small
+                   GridSize.
+                   Defaults to Uniform.
+    'Cache'        Directory in which computed layouts are stored (see
+                   layout_cache.py). A figure of the same data and the
+                   same DistType, GridSize, Bandwidth, Support, GridType,
+                   ChunkSize, SampleSize, LargeN and Seed is rendered from
+                   the stored layout, also when plot settings such as
+                   Colors or YLabel differ. Only an integer Seed (or none)
+                   is cached.
+                   Defaults to None (no cache).
+    'CacheSize'    Maximum size of the cache directory in bytes; the least
+                   recently used layouts are removed.
+                   Defaults to 1e9.
+    'Collections'  True draws all categories with a fixed number of
+                   artists (one collection of jitter points, one of
+                   distribution curves, ...), False draws separate
+                   artists per category.
+                   Defaults to True.
+    'JitterType'   'Random' (random offsets scaled by the distribution)
+                   or 'Beeswarm' (data points placed side by side without
+                   overlap, as close to the center of the column as
+                   possible). The beeswarm is computed from the marker
+                   size and the size of the axes when the figure is drawn;
+                   points that do not fit within the column overlap at
+                   its edges.
+                   Defaults to Random.
+    'Weights'      N x 1 numpy array with the weight of every data point.
+                   Means, standard deviations, percentiles and
+                   distributions are weighted, the error bars use the
+                   effective number of data points ((sum w)^2/sum w^2; CI
+                   uses the normal approximation), and the jitter points
+                   are a sample drawn with a probability proportional to
+                   the weights (at most LargeN data points).
+                   Defaults to None (every data point counts once).
+    'Counts'       K x B numpy array with the number of data points per
+                   category and bin, for binned input: data holds the
+                   B+1 bin edges and cats the category names (optional).
+                   The jitter points are a representative sample of at
+                   most SampleSize data points per category.
+                   Defaults to None (data holds the data points).
+    'Grouping'     Output of Group_categories(cats), to group the
+                   categories only once when several variables with the
+                   same cats are plotted (see jitter_distribution_facets).
+                   Defaults to grouping cats.
+    'Figure'       Existing matplotlib figure to draw in (it is cleared
+                   first), for example to reuse one figure for many plots.
+                   Defaults to a new figure.
+    'Artists'      A dict that keeps the figure and its artists between
+                   renders. The first render stores them in the dict, a
+                   later render with the same dict and PlotType only
+                   replaces the data of the artists (points, curves, error
+                   bars), the tick labels and the axes limits, without
+                   clearing the figure or building its axes again (see
+                   render_server.py). With Collections False the figure
+                   in the dict is cleared and drawn again.
+                   Defaults to None.
+    'Show'         True or False, show the figure.
+                   Defaults to True.
+    'Profile'      A dict that is filled with a timing report, or a
+                   function that receives the report. The report holds
+                   the time per stage (grouping, kde, jitter,
+                   distribution, artists, draw, ...) and per category,
+                   and the array sizes (see profiling.py).
+                   Defaults to no profiling.
 
 Copyright (c) Matlab (original) version:
                 2022, Eline Zwijgers, Sint Maartenskliniek, 
@@ -46,42 +183,305 @@ Copyright (c) Matlab (original) version:
 
 def jitter_distribution_figure(data=False, cats=False, **kwargs):
     
+    # Import dependencies
+    from profiling import New_report, Finish_report
+    
+    # One report for the compute and render stage
+    profile = kwargs.get('Profile')
+    report = New_report(profile)
+    if report is not None:
+        kwargs['Profile'] = report
+    
+    layout = jitter_distribution_layout(data, cats, **kwargs)
+    fig = render_jitter_distribution(layout, **kwargs)
+    
+    Finish_report(report, profile)
+    
+    return fig
+
+
+def jitter_distribution_layout(data=False, cats=False, **kwargs):
+    
     # Import dependencies
     import numpy as np
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    import statsmodels.api as sm
+    from group_categories import Group_categories, Sort_segments
+    from group_statistics import Group_statistics, Binned_statistics, Error_bars
+    from kernel_density import Kernel_density, Kernel_densities, Binned_kernel_densities
+    from streaming_input import Is_stream, Read_chunks, Stream_groups
+    from large_n_rendering import Stratified_sample
+    from weighted_input import Binned_groups
+    from profiling import New_report, Stage, Finish_report
+    from plot_layout import Pack_arrays
+    from layout_cache import Layout_key, Load_cached, Store_cached
     
     # Input errors
-    if type(data) == bool or type(cats) == bool:
+    binned = kwargs.get('Counts') is not None
+    if type(data) == bool:
         raise Exception("Not enough input arguments")
-    elif len(data) != len(cats):
+    elif not Is_stream(data) and not binned and type(cats) == bool:
+        raise Exception("Not enough input arguments")
+    elif not Is_stream(data) and not binned and len(data) != len(cats):
         raise Exception('Data and category vector should be the same length')
     
-    # Category settings
-    catnames = list(dict.fromkeys(cats))
+    # Default settings
+    dist_type = 'Kernel'
+    error_type = 'SD'
+    grid_size = 512
+    bw_method = 'Scott'
+    support = 'Padded'
+    grid_type = 'Uniform'
+    chunk_size = 100000
+    sample_size = 1000
+    large_n = 100000
+    seed = None
+    cache = None
+    cache_size = 1e9
+    grouping = None
+    weights = None
+    counts = None
+    profile = None
+
+    # Optional settings, only those that change the statistics
+    for item, value in kwargs.items():
+        if item == 'DistType':
+            if value != 'Kernel' and value != 'Gaussian':
+                print('Unknown DistType. Choose between "Kernel" and "Gaussian". The default distribution (Kernal) is used.')
+            else:
+                dist_type = value
+        if item == 'ErrorType':
+            if value not in ['SD', 'SEM', 'CI', 'IQR', 'Percentile']:
+                print('Unknown ErrorType. Choose between "SD", "SEM", "CI", "IQR" and "Percentile". The default error (SD) is used.')
+            else:
+                error_type = value
+        if item == 'GridSize':
+            grid_size = int(value)
+        if item == 'Bandwidth':
+            if value not in ['Scott', 'Silverman', 'SheatherJones']:
+                print('Unknown Bandwidth. Choose between "Scott", "Silverman" and "SheatherJones". The default bandwidth (Scott) is used.')
+            else:
+                bw_method = value
+        if item == 'Support':
+            if value != 'Padded' and value != 'Data':
+                print('Unknown Support. Choose between "Padded" and "Data". The default support (Padded) is used.')
+            else:
+                support = value
+        if item == 'GridType':
+            if value != 'Uniform' and value != 'Quantile':
+                print('Unknown GridType. Choose between "Uniform" and "Quantile". The default grid (Uniform) is used.')
+            else:
+                grid_type = value
+        if item == 'ChunkSize':
+            chunk_size = int(value)
+        if item == 'SampleSize':
+            sample_size = int(value)
+        if item == 'LargeN':
+            large_n = value
+        if item == 'Seed':
+            seed = value
+        if item == 'Cache':
+            cache = value
+        if item == 'CacheSize':
+            cache_size = value
+        if item == 'Grouping':
+            grouping = value
+        if item == 'Weights':
+            weights = value
+        if item == 'Counts':
+            counts = value
+        if item == 'Profile':
+            profile = value
+    
+    if weights is not None:
+        if Is_stream(data) or counts is not None:
+            print('Weights are only used with the data points in memory. The data points are not weighted.')
+            weights = None
+        elif len(weights) != len(data):
+            raise Exception('Data and weights vector should be the same length')
+        elif np.any(np.asarray(weights) < 0):
+            raise Exception('Weights cannot be negative')
+    
+    report = New_report(profile, keep=True)
+    
+    # Layout of the same data and statistics settings computed before
+    key = None
+    if cache is not None:
+        with Stage(report, 'cache'):
+            inputs = [data, cats] + [value for value in [weights, counts] if value is not None]
+            key = Layout_key('jitter_distribution', inputs, {'DistType': dist_type, 'ErrorType': error_type, 'GridSize': grid_size, 'Bandwidth': bw_method, 'Support': support, 'GridType': grid_type, 'ChunkSize': chunk_size, 'SampleSize': sample_size, 'LargeN': large_n, 'Seed': seed})
+            layout = Load_cached(cache, key) if key is not None else None
+        if layout is not None:
+            Finish_report(report, profile)
+            return layout
+    
+    summary = None
+    sortedWeights = None
+    if Is_stream(data) or counts is not None:
+        # Summarize the data one chunk at a time, or summarize the binned
+        # counts; keep a sample for the jitter
+        with Stage(report, 'input'):
+            if counts is not None:
+                summary = Binned_groups(data, counts, None if type(cats) == bool else cats, 8*grid_size, sample_size, seed)
+            else:
+                summary = Stream_groups(Read_chunks(data, cats, chunk_size), 8*grid_size, sample_size, seed)
+        
+        # Bins coarser than the grid are smoothed over at least half a bin
+        min_bandwidth = summary['resolution'][0]/2 if counts is not None else 0
+        catnames = summary['catnames']
+        sortedData = summary['sample'][:, 0]
+        offsets = summary['offsets']
+        means = summary['mean'][:, 0]
+        stds = summary['std'][:, 0]
+        with Stage(report, 'kde'):
+            kdes = Binned_kernel_densities(summary['centers'][0], summary['binned'][0], summary['count'], stds, grid_size, min_bandwidth, bw_method, support, grid_type)
+            
+            # Distribution of all data
+            total = np.sum(summary['count'])
+            pooledMean = np.sum(summary['count']*means)/total
+            pooledStd = np.sqrt(np.sum(summary['count']*(stds**2 + (means-pooledMean)**2))/total)
+            ydens = Binned_kernel_densities(summary['centers'][0], np.sum(summary['binned'][0], axis=0), total, pooledStd, grid_size, min_bandwidth, bw_method, support, grid_type)[0].density
+        presorted = False
+        with Stage(report, 'statistics'):
+            statistics = Binned_statistics(summary['centers'][0], summary['binned'][0], summary['count'], means, stds)
+            center, lower, upper = Error_bars(statistics, error_type)
+    else:
+        # Category settings
+        with Stage(report, 'grouping'):
+            if grouping is None:
+                grouping = Group_categories(cats)
+            catnames, codes, order, offsets = grouping
+            del grouping, codes
+            sortedData = np.asarray(data).ravel()[order]
+            if weights is not None:
+                sortedWeights = np.asarray(weights, dtype=float).ravel()[order]
+            
+            # The sort order is not used anymore (a Grouping passed in is
+            # kept by the caller)
+            del order
+            
+            # Sorted by value within every category, in place
+            Sort_segments(sortedData, offsets, sortedWeights)
+        presorted = True
+        
+        # Summary statistics and error bars of all categories at once; the
+        # bootstrap interval of weighted data is replaced by the normal
+        # approximation
+        with Stage(report, 'statistics'):
+            statistics = Group_statistics(sortedData, offsets, presorted=presorted, weights=sortedWeights)
+            means = statistics['mean']
+            stds = statistics['std']
+            center, lower, upper = Error_bars(statistics, error_type, sortedData if weights is None else None, offsets, seed)
+        
+        # Kernel density of every category and of all data, fitted once
+        with Stage(report, 'kde'):
+            kdes = Kernel_densities(sortedData, offsets, grid_size, presorted, sortedWeights, bw_method, support, grid_type)
+            ydens = Kernel_density(sortedData, grid_size, 'numpy', sortedWeights, bw_method, support, grid_type).density
+    
+    if report is not None:
+        report['sizes']['N'] = int(offsets[-1]-offsets[0]) if summary is None else int(np.sum(summary['count']))
+        report['sizes']['K'] = len(catnames)
+        report['sizes']['grid_size'] = grid_size
+    
+    # Large-N mode: jitter points from a stratified subsample. Weighted data
+    # points are always sampled, with a probability proportional to their
+    # weight, so the jitter points show the weighted distribution
+    if sortedWeights is not None:
+        with Stage(report, 'large_n'):
+            npoints = offsets[-1]-offsets[0]
+            sortedData, offsets = Stratified_sample(sortedData, offsets, min(large_n, npoints) if large_n else npoints, seed,
+                                                    presorted, sortedWeights)
+    elif large_n and offsets[-1]-offsets[0] > large_n:
+        with Stage(report, 'large_n'):
+            sortedData, offsets = Stratified_sample(sortedData, offsets, large_n, seed, presorted)
+    
+    # Jitter and distribution of every category, every category has the
+    # random stream of its name so the result does not depend on the other
+    # categories or on the order (or thread) in which they are computed
+    streams = Category_streams(seed, catnames)
+    
+    # The jitter points are written into one array, the data points are not copied
+    yJitter = sortedData[offsets[0]:offsets[-1]]
+    jitterOffsets = offsets - offsets[0]
+    xJitter = np.empty(len(yJitter), dtype=yJitter.dtype if np.issubdtype(yJitter.dtype, np.floating) else float)
+    xMeans, values, densities = [], [], []
+    for n in range(0, len(catnames)):
+        thisData = yJitter[jitterOffsets[n]:jitterOffsets[n+1]]
+        with Stage(report, 'jitter', catnames[n]) as entry:
+            thisJitter, thisData, xMean, yMean, xError, yError = Jitter(thisData, n, kdes[n], grid_size, means[n], stds[n], streams[n])
+            xJitter[jitterOffsets[n]:jitterOffsets[n+1]] = thisJitter
+            entry['points'] = len(thisJitter)
+            entry['support'] = len(kdes[n].support)
+        with Stage(report, 'distribution', catnames[n]) as entry:
+            density, value = Distribution(thisData, dist_type, kdes[n], grid_size, means[n], stds[n])
+            entry['grid'] = len(value)
+        xMeans.append(xMean)
+        values.append(value)
+        densities.append(density)
+    
+    layout = dict()
+    layout['figure'] = 'jitter_distribution'
+    layout['catnames'] = np.array([str(name) for name in catnames])
+    layout['distType'] = dist_type
+    layout['xJitter'] = xJitter
+    layout['offsets'] = jitterOffsets
+    layout['yJitter'] = yJitter
+    layout['xMean'] = np.array(xMeans, dtype=float)
+    layout['yMean'] = np.asarray(center, dtype=float)
+    layout['yLower'] = np.asarray(lower, dtype=float)
+    layout['yUpper'] = np.asarray(upper, dtype=float)
+    layout['errorType'] = error_type
+    layout['value'], layout['curveOffsets'] = Pack_arrays(values)
+    layout['density'] = Pack_arrays(densities)[0]
+    layout['peak'] = np.max(ydens)
+    
+    if key is not None:
+        with Stage(report, 'cache'):
+            Store_cached(cache, key, layout, cache_size)
+    
+    Finish_report(report, profile)
+    
+    return layout
+
+
+def render_jitter_distribution(layout, **kwargs):
+    
+    # Import dependencies
+    import numpy as np
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    from profiling import New_report, Stage, Finish_report
+    from collection_artists import Add_points, Add_curves, Add_errorbars
+    
+    catnames = layout['catnames'].tolist()
+    offsets = layout['offsets']
+    curveOffsets = layout['curveOffsets']
     
     # Default plot settings
-    colormap = mpl.colormaps['Dark2']
-    cols = colormap([0])
-    for n in range(1, len(catnames)):
-        cols = np.vstack((cols, colormap([n])))
+    colors = None
     marker_size = 150
     line_width = 3
     cap_size = 5
-    dist_type = 'Kernel'
     plot_type = 'External'
     y_label = ''
+    collections = True
+    jitter_type = 'Random'
+    figure = None
+    artists = None
+    show = True
+    profile = None
 
     # Optional plot settings
     for item, value in kwargs.items():
         if item == 'Colors':
-            if len(cols) != len(catnames):
-                print('Number of colors is not equal to the number of categories. The default colors are used')
-            else:
-                cols = value
+            colors = value
         if item == 'Markersize':
             marker_size = value
+        if item == 'Collections':
+            collections = value
+        if item == 'JitterType':
+            if value != 'Random' and value != 'Beeswarm':
+                print('Unknown JitterType. Choose between "Random" and "Beeswarm". The default jitter (Random) is used.')
+            else:
+                jitter_type = value
         if item == 'Linewidth':
             line_width = value
         if item == 'Capsize':
@@ -90,31 +490,81 @@ def jitter_distribution_figure(data=False, cats=False, **kwargs):
             y_lim = value
         if item == 'YLabel':
             y_label = value
-        if item == 'DistType':
-            if value != 'Kernel' and value != 'Gaussian':
-                print('Unknown DistType. Choose between "Kernel" and "Gaussian". The default distribution (Kernal) is used.')
-            else:
-                dist_type = value
         if item == 'PlotType':
             if value != 'Internal' and value != 'External':
                 print('Unknown PlotType. Choose between "External" and "Internal". The default plot setting (External) is used.')
             else:
                 plot_type = value
+        if item == 'Figure':
+            figure = value
+        if item == 'Artists':
+            artists = value
+        if item == 'Show':
+            show = value
+        if item == 'Profile':
+            profile = value
+    
+    report = New_report(profile, keep=True)
+    
+    # Colors
+    colormap = mpl.colormaps['Dark2']
+    cols = colormap([0])
+    for n in range(1, len(catnames)):
+        cols = np.vstack((cols, colormap([n])))
+    if colors is not None:
+        if len(colors) != len(catnames):
+            print('Number of colors is not equal to the number of categories. The default colors are used')
+        else:
+            cols = colors
+    
+    # Artists of an earlier render with the same dict are updated in place
+    reuse = False
+    if artists is not None:
+        if collections and artists.get('plotType') == plot_type:
+            reuse = True
+        else:
+            figure = artists.get('figure', figure)
+            artists.clear()
+            if collections:
+                artists['plotType'] = plot_type
     
     # Plotting
     if plot_type == 'External':
         # Jitter plot
-        fig, axs = plt.subplots(nrows=1, ncols=2, gridspec_kw={'width_ratios': [3, 1]})
+        with Stage(report, 'setup'):
+            if reuse:
+                fig = artists['figure']
+                axs = artists['axes']
+                for ax in axs:
+                    ax.autoscale(tight=False)
+            elif figure is None:
+                fig, axs = plt.subplots(nrows=1, ncols=2, gridspec_kw={'width_ratios': [3, 1]})
+            else:
+                fig = figure
+                fig.clf()
+                axs = fig.subplots(nrows=1, ncols=2, gridspec_kw={'width_ratios': [3, 1]})
+            if artists is not None:
+                artists['figure'] = fig
+                artists['axes'] = axs
         
-        for n in range(0,len(catnames)):
-            thisCat = catnames[n]
-            indices = [i for i, s in enumerate(cats) if thisCat in s]
-            thisData = data[indices].flatten()
-            xJitter, yJitter, xMean, yMean, xError, yError = Jitter(thisData, n)
+        if collections:
+            with Stage(report, 'artists'):
+                points = [Add_points(axs[0], layout['xJitter'], layout['yJitter'], offsets, cols, marker_size, artists=artists)]
+                Add_errorbars(axs[0], layout['xMean'], layout['yMean'], layout['yLower'], layout['yUpper'], line_width, cap_size, marker_size,
+                              artists=artists)
+        else:
+            points = list()
+            for n in range(0,len(catnames)):
+                xJitter = layout['xJitter'][offsets[n]:offsets[n+1]]
+                yJitter = layout['yJitter'][offsets[n]:offsets[n+1]]
+                xMean = layout['xMean'][n]
+                yMean = layout['yMean'][n]
+                yError = [[yMean-layout['yLower'][n]], [layout['yUpper'][n]-yMean]]
             
-            axs[0].scatter(xJitter, yJitter, s=marker_size, color=cols[n], edgecolors='none', alpha=0.6) #MarkerSize=marker_size, MarkerFaceColor=col, MarkerEdgeColor=None, MarkerFaceAlpha=0.6)
-            axs[0].errorbar(xMean, yMean, yerr=yError, ecolor='k', elinewidth=line_width, capsize=cap_size)
-            axs[0].scatter(xMean, yMean, s=marker_size, color='k', edgecolors='none')                
+                with Stage(report, 'artists', catnames[n]):
+                    points.append(axs[0].scatter(xJitter, yJitter, s=marker_size, color=cols[n], edgecolors='none', alpha=0.6)) #MarkerSize=marker_size, MarkerFaceColor=col, MarkerEdgeColor=None, MarkerFaceAlpha=0.6)
+                    axs[0].errorbar(xMean, yMean, yerr=yError, ecolor='k', elinewidth=line_width, capsize=cap_size)
+                    axs[0].scatter(xMean, yMean, s=marker_size, color='k', edgecolors='none')                
             
         # Format axis of jitter plot
         axs[0].set(xticks=np.arange(start=0.1, stop=len(catnames), step=1), xticklabels=catnames)
@@ -125,16 +575,20 @@ def jitter_distribution_figure(data=False, cats=False, **kwargs):
                 axs[0].set_ylim(y_lim)
         
         # Distribution plot
-        for n in range(0,len(catnames)):
-            thisCat = catnames[n]
-            indices = [i for i, s in enumerate(cats) if thisCat in s]
-            thisData = data[indices].flatten()
-            xDistribution, yDistribution = Distribution(thisData, dist_type)
-            axs[1].plot(xDistribution, yDistribution, color=cols[n], linewidth=0.7*line_width)
-            axs[1].fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
+        if collections:
+            with Stage(report, 'artists'):
+                Add_curves(axs[1], layout['density'], layout['value'], curveOffsets, cols, 0.7*line_width, artists=artists)
+        else:
+            for n in range(0,len(catnames)):
+                xDistribution = layout['density'][curveOffsets[n]:curveOffsets[n+1]]
+                yDistribution = layout['value'][curveOffsets[n]:curveOffsets[n+1]]
+                with Stage(report, 'artists', catnames[n]):
+                    axs[1].plot(xDistribution, yDistribution, color=cols[n], linewidth=0.7*line_width)
+                    axs[1].fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
         
         # Format axis of distribution plot
-        axs[1].sharey(axs[0])
+        if not reuse:
+            axs[1].sharey(axs[0])
         axs[1].tick_params(axis='both', colors='none')
         axs[1].spines['bottom'].set_color('none')
         axs[1].spines['left'].set_color('none')
@@ -144,34 +598,52 @@ def jitter_distribution_figure(data=False, cats=False, **kwargs):
             
     elif plot_type == 'Internal':
         # Jitter plot combined with distribution plot
-        fig, axs = plt.subplots(nrows=1, ncols=1)
+        with Stage(report, 'setup'):
+            if reuse:
+                fig = artists['figure']
+                axs = artists['axes']
+                axs.autoscale(tight=False)
+            elif figure is None:
+                fig, axs = plt.subplots(nrows=1, ncols=1)
+            else:
+                fig = figure
+                fig.clf()
+                axs = fig.subplots(nrows=1, ncols=1)
+            if artists is not None:
+                artists['figure'] = fig
+                artists['axes'] = axs
         
-        for n in range(0, len(catnames)):
-            thisCat = catnames[n]
-            indices = [i for i, s in enumerate(cats) if thisCat in s]
-            thisData = data[indices].flatten()
-            
-            # Scale of distribution
-            kde = sm.nonparametric.KDEUnivariate(data)
-            kde.fit()
-            ydens = kde.density
-            if dist_type == 'Kernel':
-                scale = 0.20/np.max(ydens)
-            elif dist_type == 'Gaussian':
-                scale = 0.1/np.max(ydens)
-            
-            xJitter, yJitter, xDistribution, yDistribution, xMean, yMean, xError, yError = Jitter_distribution(thisData, n, dist_type, scale)
-            
-            # Plot Jitter
-            axs.scatter(xJitter, yJitter, s=marker_size, color=cols[n], edgecolors='none', alpha=0.6)
-            
-            # Plot distribution
-            axs.plot(xDistribution, yDistribution, color=cols[n], linewidth=0.7*line_width)
-            axs.fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
-            
+        # Distributions to the right of the means, as in Jitter_distribution
+        xDistributions = Internal_curves(layout)
+        
+        if collections:
+            with Stage(report, 'artists'):
+                points = [Add_points(axs, layout['xJitter'], layout['yJitter'], offsets, cols, marker_size, artists=artists)]
+                Add_curves(axs, xDistributions, layout['value'], curveOffsets, cols, 0.7*line_width, artists=artists)
+                Add_errorbars(axs, layout['xMean'], layout['yMean'], layout['yLower'], layout['yUpper'], line_width, cap_size, marker_size,
+                              artists=artists)
+        else:
+            points = list()
+            for n in range(0, len(catnames)):
+                xJitter = layout['xJitter'][offsets[n]:offsets[n+1]]
+                yJitter = layout['yJitter'][offsets[n]:offsets[n+1]]
+                xMean = layout['xMean'][n]
+                yMean = layout['yMean'][n]
+                yError = [[yMean-layout['yLower'][n]], [layout['yUpper'][n]-yMean]]
+                xDistribution = xDistributions[curveOffsets[n]:curveOffsets[n+1]]
+                yDistribution = layout['value'][curveOffsets[n]:curveOffsets[n+1]]
             
-            axs.errorbar(xMean, yMean, yerr=yError, ecolor='k', elinewidth=line_width, capsize=cap_size)
-            axs.scatter(xMean, yMean, s=marker_size, color='k', edgecolors='none')                
+                with Stage(report, 'artists', catnames[n]):
+                    # Plot Jitter
+                    points.append(axs.scatter(xJitter, yJitter, s=marker_size, color=cols[n], edgecolors='none', alpha=0.6))
+                
+                    # Plot distribution
+                    axs.plot(xDistribution, yDistribution, color=cols[n], linewidth=0.7*line_width)
+                    axs.fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
+                
+                
+                    axs.errorbar(xMean, yMean, yerr=yError, ecolor='k', elinewidth=line_width, capsize=cap_size)
+                    axs.scatter(xMean, yMean, s=marker_size, color='k', edgecolors='none')                
         
         # Format axis
         axs.set(xticks=np.arange(start=0.1, stop=len(catnames), step=1), xticklabels=catnames)
@@ -179,68 +651,209 @@ def jitter_distribution_figure(data=False, cats=False, **kwargs):
         axs.set(ylabel=y_label)
         for item,value in kwargs.items():
             if item=='YLim':
-                axs[0].set_ylim(y_lim)
+                axs.set_ylim(y_lim)
+    
+    # Beeswarm positions from the final axes limits and marker size
+    if jitter_type == 'Beeswarm':
+        with Stage(report, 'beeswarm'):
+            Swarm_points(axs[0] if plot_type == 'External' else axs, points, layout['yJitter'], offsets, marker_size)
+    
+    # Drawing the canvas is only timed when profiling
+    if report is not None:
+        with Stage(report, 'draw'):
+            fig.canvas.draw()
+    Finish_report(report, profile)
 
-    plt.show(block=False)
+    if show:
+        plt.show(block=False)
     
-    return
+    return fig
 
 
 
 
 
-def Jitter(data, pos):
+def Jitter(data, pos, kde=None, grid_size=512, mean=None, std=None, rng=None):
     
     # Import dependencies
     import numpy as np
-    from scipy import stats
-    import statsmodels.api as sm
-    from scipy.interpolate import interp1d
-                
-    kde = sm.nonparametric.KDEUnivariate(data)
-    kde.fit()
-    density = kde.density
-    value = kde.support
-    density = density[np.argwhere(value>=np.min(data))].flatten()
-    value = value[np.argwhere(value>=np.min(data))].flatten()
-    density = density[np.argwhere(value<=np.max(data))].flatten()
-    value = value[np.argwhere(value<=np.max(data))].flatten()
-    value[0] = np.min(data)
-    value[-1] = np.max(data)
-    
-    width = 0.05/np.max(density)
-    set_jitterstrength = interp1d(value, density*width, kind='linear')
-    jitterstrength = set_jitterstrength(data)
-    jit = 2*(np.random.uniform(low=0, high=1, size=len(data))-0.5)
-    
-    xJitter = pos + jit*jitterstrength
+    from kernel_density import Kernel_density
+    
+    if kde is None:
+        kde = Kernel_density(data, grid_size)
+    xJitter = Jitter_positions(data, pos, kde, rng)
     yJitter = data
     
     xMean = pos+0.2
-    yMean = np.nanmean(data)
+    yMean = np.nanmean(data) if mean is None else mean
     xError = pos+0.2
-    yError = np.nanstd(data)
+    yError = np.nanstd(data) if std is None else std
         
     return xJitter, yJitter, xMean, yMean, xError, yError
 
 
-def Distribution(data, dist_type):
+def Category_streams(seed, catnames):
+    
+    # Import dependencies
+    import hashlib
+    import numpy as np
+    
+    # Streams keyed by a hash of the category name, under the entropy of
+    # the seed, instead of spawned in the order of the categories
+    root = np.random.SeedSequence(seed)
+    return [np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (int.from_bytes(
+            hashlib.blake2b(str(name).encode(), digest_size=8).digest(), 'little'),)) for name in catnames]
+
+
+def Jitter_positions(data, pos, kde, rng=None):
+    
+    # Import dependencies
+    import numpy as np
+    
+    # Random offset scaled by the density at every data point, a chunk at a
+    # time so the float64 temporaries stay small. A seed, SeedSequence or
+    # Generator; never the global random state, which is shared between
+    # threads. The peak of the density lies within the range of the data
+    # points, so the support (padded or clipped) is used as it is
+    rng = np.random.default_rng(rng)
+    data = np.asarray(data)
+    xJitter = np.empty(len(data), dtype=data.dtype if np.issubdtype(data.dtype, np.floating) else np.float64)
+    scale = 2*0.05/np.max(kde.density)
+    chunk = 2**16
+    for start in range(0, len(data), chunk):
+        part = rng.uniform(low=0, high=1, size=len(xJitter[start:start+chunk]))
+        part -= 0.5
+        part *= scale
+        part *= np.interp(data[start:start+chunk], kde.support, kde.density)
+        part += pos
+        xJitter[start:start+chunk] = part
+    
+    return xJitter
+
+
+def Internal_curves(layout):
     
     # Import dependencies
     import numpy as np
-    from scipy import stats
-    import statsmodels.api as sm
     
+    dist_type = str(layout['distType'])
+    curveOffsets = layout['curveOffsets']
+    
+    # Scale of distribution, from the fit on all data
+    if dist_type == 'Kernel':
+        scale = 0.20/layout['peak']
+    elif dist_type == 'Gaussian':
+        scale = 0.1/layout['peak']
+    
+    # Distributions to the right of the means, as in Jitter_distribution
+    density = np.array(layout['density'])
+    starts = curveOffsets[:-1]
     if dist_type == 'Gaussian':
-            mean_data = np.nanmean(data)
-            std_data = np.nanstd(data)
-            xnormdis = np.arange(start=-3*std_data+mean_data, stop=3*std_data+mean_data, step=0.001)
-            y_norm = stats.norm.pdf(xnormdis, mean_data, std_data)
+        density[starts] = 0
+        density[curveOffsets[1:]-1] = 0
+    elif dist_type == 'Kernel' and len(density) > 0:
+        density -= np.repeat(np.minimum.reduceat(density, starts), np.diff(curveOffsets))
+    
+    return density*scale + np.repeat(np.arange(len(curveOffsets)-1), np.diff(curveOffsets)) + 0.20
+
+
+def Swarm_points(ax, points, yJitter, offsets, marker_size, width=0.15):
+    
+    # Import dependencies
+    import numpy as np
+    
+    # Data units per pixel, with the limits the axes will be drawn with
+    box = ax.get_window_extent()
+    xlim = ax.get_xlim()
+    ylim = ax.get_ylim()
+    xScale = (xlim[1]-xlim[0])/max(box.width, 1)
+    yScale = (ylim[1]-ylim[0])/max(box.height, 1)
+    diameter = np.sqrt(marker_size)*ax.figure.dpi/72
+    
+    # Every column is centered on its category, at most width to each side
+    xSwarm = np.empty(offsets[-1]-offsets[0])
+    for n in range(0, len(offsets)-1):
+        data = np.asarray(yJitter[offsets[n]:offsets[n+1]], dtype=float)
+        xSwarm[offsets[n]-offsets[0]:offsets[n+1]-offsets[0]] = n + xScale*Beeswarm(data/yScale, diameter, width/xScale)
+    
+    yJitter = np.asarray(yJitter[offsets[0]:offsets[-1]], dtype=float)
+    if len(points) == 1:
+        points[0].set_offsets(np.column_stack((xSwarm, yJitter)))
+    else:
+        for n in range(0, len(points)):
+            rows = slice(offsets[n]-offsets[0], offsets[n+1]-offsets[0])
+            points[n].set_offsets(np.column_stack((xSwarm[rows], yJitter[rows])))
+    
+    return xSwarm
+
+
+def Beeswarm(data, diameter, width=float('inf')):
+    
+    # Import dependencies
+    import math
+    import numpy as np
+    from collections import deque
+    
+    # Sweep through the data points sorted by value. Only points placed
+    # less than one diameter below can overlap, they are kept in a window
+    # (the spatial index); points at the edges are not added to it
+    order = np.argsort(data, kind='stable')
+    values = np.asarray(data)[order].tolist()
+    offsets = np.zeros(len(values))
+    window = deque()
+    squared = diameter*diameter
+    for i, y in enumerate(values):
+        if math.isnan(y):
+            break
+        while window and y - window[0][0] >= diameter:
+            window.popleft()
+        
+        # Intervals blocked by the window, merged; the point goes to the
+        # center or to the nearest end of the blocked interval around it
+        blocked = sorted([(placedX - math.sqrt(squared - (y-placedY)**2), placedX + math.sqrt(squared - (y-placedY)**2))
+                          for placedY, placedX in window])
+        x = 0.0
+        low = high = None
+        for start, stop in blocked:
+            if high is not None and start < high:
+                high = max(high, stop)
+                continue
+            if low is not None and low < 0.0 < high:
+                break
+            low, high = start, stop
+        if low is not None and low < 0.0 < high:
+            x = low if -low < high else high
+        if abs(x) <= width:
+            window.append((y, x))
+        else:
+            x = math.copysign(width, x)
+        offsets[i] = x
+    
+    swarm = np.empty(len(values))
+    swarm[order] = offsets
+    
+    return swarm
+
+
+def Distribution(data, dist_type, kde=None, grid_size=512, mean=None, std=None):
+    
+    # Import dependencies
+    import numpy as np
+    from kernel_density import Kernel_density, Normal_pdf
+    
+    if dist_type == 'Gaussian':
+            mean_data = np.nanmean(data) if mean is None else mean
+            std_data = np.nanstd(data) if std is None else std
+            # A category without spread (a single or constant value) is drawn with
+            # sigma = 1, like the kernel bandwidth
+            sigma = std_data if std_data > 0 else 1.0
+            xnormdis = np.linspace(start=-3*sigma+mean_data, stop=3*sigma+mean_data, num=grid_size)
+            y_norm = Normal_pdf(xnormdis, mean_data, sigma)
             xDistribution = y_norm
             yDistribution = xnormdis
     elif dist_type == 'Kernel':
-            kde = sm.nonparametric.KDEUnivariate(data)
-            kde.fit()
+            if kde is None:
+                kde = Kernel_density(data, grid_size)
             density = kde.density
             value = kde.support
             xDistribution = density
@@ -249,38 +862,26 @@ def Distribution(data, dist_type):
 
 
 
-def Jitter_distribution(data, pos, dist_type, scale):
+def Jitter_distribution(data, pos, dist_type, scale, kde=None, grid_size=512, mean=None, std=None, rng=None):
     
     # Import dependencies
     import numpy as np
-    from scipy import stats
-    import statsmodels.api as sm
-    from scipy.interpolate import interp1d
-                
-    kde = sm.nonparametric.KDEUnivariate(data)
-    kde.fit()
-    density = kde.density
-    value = kde.support
-    density = density[np.argwhere(value>=np.min(data))].flatten()
-    value = value[np.argwhere(value>=np.min(data))].flatten()
-    density = density[np.argwhere(value<=np.max(data))].flatten()
-    value = value[np.argwhere(value<=np.max(data))].flatten()
-    value[0] = np.min(data)
-    value[-1] = np.max(data)
-    
-    width = 0.05/np.max(density)
-    set_jitterstrength = interp1d(value, density*width, kind='linear')
-    jitterstrength = set_jitterstrength(data)
-    jit = 2*(np.random.uniform(low=0, high=1, size=len(data))-0.5)
-    
-    xJitter = pos + jit*jitterstrength
+    from kernel_density import Kernel_density, Normal_pdf
+    
+    if kde is None:
+        kde = Kernel_density(data, grid_size)
+    xJitter = Jitter_positions(data, pos, kde, rng)
     yJitter = data
     
+    mean_data = np.nanmean(data) if mean is None else mean
+    std_data = np.nanstd(data) if std is None else std
+    
     if dist_type == 'Gaussian':
-        mean_data = np.nanmean(data)
-        std_data = np.nanstd(data)
-        xnormdis = np.arange(start=-3*std_data+mean_data, stop=3*std_data+mean_data, step=0.001)
-        y_norm = stats.norm.pdf(xnormdis, mean_data, std_data)
+        # A category without spread (a single or constant value) is drawn with
+        # sigma = 1, like the kernel bandwidth
+        sigma = std_data if std_data > 0 else 1.0
+        xnormdis = np.linspace(start=-3*sigma+mean_data, stop=3*sigma+mean_data, num=grid_size)
+        y_norm = Normal_pdf(xnormdis, mean_data, sigma)
         y_norm[0] = 0
         y_norm[-1] = 0
         y_norm = y_norm*scale
@@ -293,8 +894,6 @@ def Jitter_distribution(data, pos, dist_type, scale):
         yError = std_data
         
     elif dist_type == 'Kernel':
-        kde = sm.nonparametric.KDEUnivariate(data)
-        kde.fit()
         value = kde.support
         f = kde.density*scale
         min_f = np.min(f)
@@ -303,9 +902,9 @@ def Jitter_distribution(data, pos, dist_type, scale):
         xDistribution = f+offset
         yDistribution = value
         xMean = pos+0.2
-        yMean = np.nanmean(data)
+        yMean = mean_data
         xError = pos+0.2
-        yError = np.nanstd(data)
+        yError = std_data
             
     return xJitter, yJitter, xDistribution, yDistribution, xMean, yMean, xError, yError
     
@@ -0,0 +1,691 @@
+"""
+Functions to fit the kernel density estimate of every category once, so the
+jitter, distribution and scaling steps of a figure can share the same fit.
+All categories are fitted at once: every category gets its own grid with
+the same number of points over its data range plus 3 bandwidths, the data
+points are linearly binned onto these grids in a single pass and smoothed
+together by FFT convolution with a Gaussian kernel, so the fit of a
+category does not depend on the other categories. The bandwidth follows
+from a normal reference rule (Scott or Silverman) or from the
+Sheather-Jones plug-in rule, computed from the same binned counts by FFT. The support of a category can be padded with
+3 bandwidths or clipped to its data range (boundary corrected by
+reflection), and its points can be placed equidistant or by the quantiles
+of the density, so skewed and heavy-tailed data need far fewer points.
+
+INPUT
+Kernel_densities(sortedData, offsets, grid_size, presorted, weights, bw_method, support, grid_type)
+sortedData: N x 1 numpy array containing the data points sorted by category.
+            Non-finite values (NaN, inf) are left out of the fit of their
+            category.
+offsets:    (K+1) x 1 numpy array with the start of every category in
+            sortedData, see Group_categories
+grid_size:  number of points of the support, independent of the units
+            of the data. Defaults to 512.
+presorted:  True when the data points of every category are also sorted
+            by value (see Sort_segments), so the quartiles are read
+            directly. Defaults to False.
+weights:    N x 1 numpy array with the weight of every data point, sorted
+            as sortedData. The densities, standard deviations and
+            quartiles are weighted, and the bandwidth follows from the
+            effective number of data points, (sum w)^2/sum w^2.
+            Defaults to None (every data point counts once).
+bw_method:  'Scott' (normal reference rule, 1.059 A n^-1/5 with A the
+            smaller of the standard deviation and IQR/1.349, as statsmodels
+            KDEUnivariate), 'Silverman' (0.9 A n^-1/5) or 'SheatherJones'
+            (solve-the-equation plug-in rule, better for skewed and
+            multimodal data). Defaults to 'Scott'.
+support:    'Padded' (data range plus 3 bandwidths) or 'Data' (data range
+            only, the density is reflected at the ends of the data range so
+            it still integrates to 1). Defaults to 'Padded'.
+grid_type:  'Uniform' (equidistant points) or 'Quantile' (half of the
+            points at quantiles of the density and half equidistant, so
+            the peaks are resolved and the tails keep some points).
+            Defaults to 'Uniform'.
+
+OUTPUT
+kdes:       dict with for every category index n a KernelDensity holding
+            the support, density and bandwidth of the fit. Categories
+            without weight (all weights or counts zero) get a curve of NaN
+            values and a NaN bandwidth. A padded,
+            uniform support is a view of the grid_size points of the
+            category grid of Batched_kernel_density; other supports have
+            grid_size points interpolated from that grid.
+
+Batched_kernel_density(sortedData, offsets, grid_size, presorted, weights, bw_method)
+grid:       K x G numpy array with the grid of every category (G =
+            grid_size points over its data range plus 3 bandwidths)
+density:    K x G numpy array with the density of every category
+bandwidth:  K x 1 numpy array with the bandwidth of every category
+
+Kernel_density(data, grid_size, method, weights, bw_method, support, grid_type)
+data:       N x 1 numpy array containing the data points of one category
+            (or of all categories for a global fit)
+method:     'numpy' (built-in FFT estimate, see Batched_kernel_density) or
+            'statsmodels' (KDEUnivariate, imported only when used).
+            Defaults to 'numpy'.
+weights:    N x 1 numpy array with the weight of every data point, for the
+            'numpy' method. Defaults to None.
+kde:        KernelDensity of the data points
+
+Normal_pdf(x, mean, std)
+x:          numpy array of values at which the normal (Gaussian)
+            probability density function is evaluated
+
+Binned_kernel_densities(centers, binned, count, std, grid_size, min_bandwidth, bw_method, support, grid_type)
+centers:    B x 1 numpy array with the equidistant bin centers
+binned:     K x B numpy array with the number of data points per category
+            and bin, for example accumulated by Stream_groups
+count:      K x 1 numpy array with the number of data points per category
+std:        K x 1 numpy array with the standard deviation per category
+min_bandwidth: smallest bandwidth, e.g. half the bin width of histograms
+            that were binned coarser than the centers. Defaults to 0.
+kdes:       dict with a KernelDensity for every category index n, as
+            returned by Kernel_densities
+
+Sheather_jones(binned, dx, count, reference)
+Sheather-Jones bandwidth (K x 1) of linearly binned data (K x B, bin width
+dx, a scalar or one per category), from the pair counts at every lag (autocorrelation by FFT), as the
+binned approximation of R's bw.SJ. count holds the (effective) number of
+data points and reference the Scott bandwidth, which is returned when the
+equation has no root.
+
+Joint_densities(sortedDatax, sortedDatay, offsets, grid_size, weights)
+sortedDatax: N x 1 numpy array containing the x-values sorted by category
+sortedDatay: N x 1 numpy array containing the y-values sorted by category
+grid_size:  number of grid points along each axis. Defaults to 128.
+weights:    N x 1 numpy array with the weight of every data point.
+            Defaults to None.
+gridx, gridy: G x 1 numpy arrays with the common grid of all categories
+density:    K x G x G numpy array with the 2D kernel density of every
+            category, density[n][i, j] at (gridx[j], gridy[i]) as used by
+            contour, NaN for categories without weight. The data points are linearly binned in one pass and
+            smoothed by FFT convolution, O(N + K G^2 log G).
+
+Hdr_levels(density, masses)
+masses:     probability masses of the highest density regions.
+            Defaults to (0.5, 0.8, 0.95).
+levels:     K x M numpy array with the density above which every mass of
+            every category lies, the contour levels of the regions (NaN for
+            categories without data points)
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+from collections import namedtuple
+
+
+# Result of a kernel density fit
+KernelDensity = namedtuple('KernelDensity', ['support', 'density', 'bandwidth'])
+
+
+def Kernel_density(data, grid_size=512, method='numpy', weights=None, bw_method='Scott', support='Padded',
+                   grid_type='Uniform'):
+
+    # Import dependencies
+    import numpy as np
+
+    if method == 'statsmodels':
+        # Optional dependency, only imported when asked for
+        import statsmodels.api as sm
+        kde = sm.nonparametric.KDEUnivariate(data)
+        kde.fit(gridsize=grid_size)
+        return KernelDensity(kde.support, kde.density, kde.bw)
+
+    data = np.asarray(data).ravel()
+    if weights is not None:
+        weights = np.asarray(weights).ravel()
+    return Kernel_densities(data, np.array([0, len(data)]), grid_size, False, weights, bw_method, support, grid_type)[0]
+
+
+def Kernel_densities(sortedData, offsets, grid_size=512, presorted=False, weights=None, bw_method='Scott',
+                     support='Padded', grid_type='Uniform'):
+
+    # Import dependencies
+    import numpy as np
+
+    # Supports that are interpolated and the binned Sheather-Jones rule need a
+    # category grid that is finer than the supports
+    bins = grid_size
+    if bw_method == 'SheatherJones' or support != 'Padded' or grid_type != 'Uniform':
+        bins = max(grid_size, 1024)
+    grid, density, bandwidth = Batched_kernel_density(sortedData, offsets, bins, presorted, weights, bw_method)
+
+    data = np.asarray(sortedData)[offsets[0]:offsets[-1]]
+    minimum, maximum = Category_range(data, offsets[:-1] - offsets[0], np.diff(offsets), presorted, All_finite(data))
+
+    return Category_supports(grid, density, bandwidth, minimum, maximum, grid_size, support, grid_type)
+
+
+def Binned_kernel_densities(centers, binned, count, std, grid_size=512, min_bandwidth=0, bw_method='Scott',
+                            support='Padded', grid_type='Uniform'):
+
+    # Import dependencies
+    import numpy as np
+
+    binned = np.atleast_2d(binned)
+    count = np.atleast_1d(count)
+    dx = centers[1] - centers[0]
+
+    # Bandwidth of every category from its binned quantiles
+    cumulative = np.cumsum(binned, axis=1)
+    def Quantile(q):
+        return centers[np.minimum(np.sum(cumulative < q*count[:, np.newaxis], axis=1), len(centers)-1)]
+    bandwidth = Reference_bandwidth(count, np.atleast_1d(std), Quantile(0.75)-Quantile(0.25))
+    if bw_method == 'Silverman':
+        bandwidth = bandwidth*0.9/1.059
+    elif bw_method == 'SheatherJones':
+        bandwidth = Sheather_jones(binned, dx, count, bandwidth)
+    bandwidth = np.maximum(bandwidth, min_bandwidth)
+
+    # Pad the bins with 3 bandwidths on both sides, categories without
+    # data points (NaN bandwidth) get a NaN curve
+    pad = int(np.ceil(3*np.max(bandwidth[np.isfinite(bandwidth)], initial=0)/dx)) + 1
+    binned = np.pad(binned, ((0, 0), (pad, pad)))
+    grid = centers[0] + dx*np.arange(-pad, len(centers)+pad)
+    density = Smooth_binned(binned, dx, bandwidth)
+
+    # Data range of every category from its occupied bins
+    occupied = binned > 0
+    minimum = np.where(np.any(occupied, axis=1), grid[np.argmax(occupied, axis=1)], np.nan)
+    maximum = np.where(np.any(occupied, axis=1), grid[len(grid)-1-np.argmax(occupied[:, ::-1], axis=1)], np.nan)
+
+    return Category_supports(grid, density, bandwidth, minimum, maximum, grid_size, support, grid_type)
+
+
+def Batched_kernel_density(sortedData, offsets, grid_size=512, presorted=False, weights=None, bw_method='Scott'):
+
+    # Import dependencies
+    import numpy as np
+    from group_categories import Chunk_codes
+    from group_statistics import Weighted_percentile
+
+    data = np.asarray(sortedData)[offsets[0]:offsets[-1]]
+    counts = np.diff(offsets)
+    starts = offsets[:-1] - offsets[0]
+    ncats = len(counts)
+    chunk = 2**16
+
+    # Non-finite data points (NaN, inf) are left out: only the valid data
+    # points of a category are counted, binned and used for its moments,
+    # quartiles and range
+    finite = All_finite(data)
+    presorted = presorted and finite
+    def Chunks():
+        for start in range(0, len(data), chunk):
+            part = data[start:start+chunk]
+            codes = Chunk_codes(offsets, start, start+len(part))
+            if finite:
+                yield start, part, codes, None
+            else:
+                valid = np.isfinite(part)
+                yield start, np.where(valid, part, 0), codes, valid
+
+    # Bandwidth of every category, the data is read in chunks so temporary
+    # arrays stay small and float32 data is not converted as a whole
+    if weights is None:
+        count = np.zeros(ncats) if not finite else counts
+        mean = np.zeros(ncats)
+        for start, part, codes, valid in Chunks():
+            mean += np.bincount(codes, weights=part, minlength=ncats)
+            if valid is not None:
+                count += np.bincount(codes, weights=valid, minlength=ncats)
+        mean /= np.where(count > 0, count, 1)
+        squares = np.zeros(ncats)
+        for start, part, codes, valid in Chunks():
+            deviation = (part - mean[codes])**2
+            if valid is not None:
+                deviation *= valid
+            squares += np.bincount(codes, weights=deviation, minlength=ncats)
+        std = np.sqrt(squares/np.maximum(count-1, 1))
+        effective = count
+    else:
+        # Weighted moments; the effective number of data points replaces
+        # the count in the variance correction and the bandwidth. Categories
+        # without weight are left out (zero mean and spread)
+        weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+        total = np.zeros(ncats)
+        weightSquares = np.zeros(ncats)
+        mean = np.zeros(ncats)
+        for start, part, codes, valid in Chunks():
+            partWeights = weights[start:start+chunk] if valid is None else weights[start:start+chunk]*valid
+            total += np.bincount(codes, weights=partWeights, minlength=ncats)
+            weightSquares += np.bincount(codes, weights=np.square(partWeights, dtype=np.float64), minlength=ncats)
+            mean += np.bincount(codes, weights=part*partWeights, minlength=ncats)
+        effective = total**2/np.maximum(weightSquares, 1e-300)
+        mean /= np.where(total > 0, total, 1)
+        squares = np.zeros(ncats)
+        for start, part, codes, valid in Chunks():
+            partWeights = weights[start:start+chunk] if valid is None else weights[start:start+chunk]*valid
+            squares += np.bincount(codes, weights=partWeights*(part - mean[codes])**2, minlength=ncats)
+        std = np.sqrt(squares/np.where(total > 0, total, 1)*effective/np.maximum(effective-1, 1e-12))
+
+    if weights is not None and presorted:
+        # Weighted quartiles from the sorted data points of every category
+        q1 = Weighted_percentile(data, weights, offsets-offsets[0], 25)
+        q3 = Weighted_percentile(data, weights, offsets-offsets[0], 75)
+        minimum, maximum = Category_range(data, starts, counts, True, True)
+    elif weights is not None:
+        # Selection per category, a copy of at most one category at a time
+        q1, q3 = np.empty(ncats), np.empty(ncats)
+        for n in range(0, ncats):
+            segment = data[starts[n]:starts[n]+counts[n]]
+            segmentWeights = weights[starts[n]:starts[n]+counts[n]]
+            if not finite:
+                valid = np.isfinite(segment)
+                segment, segmentWeights = segment[valid], segmentWeights[valid]
+            order = np.argsort(segment)
+            bounds = np.array([0, len(segment)])
+            q1[n] = Weighted_percentile(segment[order], segmentWeights[order], bounds, 25)[0]
+            q3[n] = Weighted_percentile(segment[order], segmentWeights[order], bounds, 75)[0]
+        minimum, maximum = Category_range(data, starts, counts, False, finite)
+    elif presorted:
+        # Quartiles and range from the sorted data points of every category
+        def Quantile(q):
+            position = starts + q*(counts-1)
+            lower = np.floor(position).astype(np.intp)
+            upper = np.minimum(lower+1, starts+counts-1)
+            return data[lower] + (data[upper]-data[lower])*(position-lower)
+        q1, q3 = Quantile(0.25), Quantile(0.75)
+        minimum, maximum = Category_range(data, starts, counts, True, True)
+    else:
+        # Selection per category, a copy of at most one category at a time
+        q1, q3 = np.full(ncats, np.nan), np.full(ncats, np.nan)
+        for n in range(0, ncats):
+            segment = data[starts[n]:starts[n]+counts[n]]
+            if not finite:
+                segment = segment[np.isfinite(segment)]
+            if len(segment) > 0:
+                q1[n], q3[n] = np.percentile(segment, [25, 75])
+        minimum, maximum = Category_range(data, starts, counts, False, finite)
+
+    bandwidth = Reference_bandwidth(effective, std, q3-q1)
+    if bw_method == 'Silverman':
+        bandwidth = bandwidth*0.9/1.059
+
+    # Grid of every category over its data range plus 3 bandwidths, all
+    # grids have the same number of points so they are smoothed in one batch.
+    # Categories without weight get a placeholder grid and a NaN density
+    num = max(int(grid_size), 2)
+    empty = ~(effective > 0)
+    low = np.where(empty, 0, minimum - 3*bandwidth)
+    dx = np.where(empty, 1, (maximum - minimum + 6*bandwidth)/(num-1))
+    grid = low[:, np.newaxis] + dx[:, np.newaxis]*np.arange(num)[np.newaxis, :]
+
+    # Linear binning of all categories, chunk by chunk
+    binned = np.zeros(ncats*num)
+    for start, part, codes, valid in Chunks():
+        position = (part - low[codes])/dx[codes]
+        if valid is not None:
+            position[~valid] = 0
+        index = np.clip(position.astype(np.intp), 0, num-2)
+        fraction = position - index
+        flat = codes*num + index
+        if weights is None and valid is None:
+            binned += np.bincount(flat, weights=1-fraction, minlength=ncats*num)
+            binned += np.bincount(flat+1, weights=fraction, minlength=ncats*num)
+        else:
+            partWeights = valid if weights is None else weights[start:start+chunk]
+            if weights is not None and valid is not None:
+                partWeights = partWeights*valid
+            binned += np.bincount(flat, weights=(1-fraction)*partWeights, minlength=ncats*num)
+            binned += np.bincount(flat+1, weights=fraction*partWeights, minlength=ncats*num)
+    binned = binned.reshape(ncats, num)
+
+    # The grid is padded by the reference bandwidth, the plug-in bandwidth
+    # is computed from the same binned counts
+    if bw_method == 'SheatherJones':
+        bandwidth = Sheather_jones(binned, dx, effective, bandwidth)
+
+    bandwidth[empty] = np.nan
+    density = Smooth_binned(binned, dx, bandwidth)
+    grid[empty] = np.nan
+
+    return grid, density, bandwidth
+
+
+def All_finite(data, chunk=2**16):
+
+    # Import dependencies
+    import numpy as np
+
+    # Checked in chunks, so no boolean copy of all data points is made
+    return all(np.all(np.isfinite(data[start:start+chunk])) for start in range(0, len(data), chunk))
+
+
+def Category_range(data, starts, counts, presorted=False, finite=True):
+
+    # Import dependencies
+    import numpy as np
+
+    if finite and presorted:
+        return data[starts].astype(np.float64), data[starts+counts-1].astype(np.float64)
+    if finite:
+        return np.minimum.reduceat(data, starts).astype(np.float64), np.maximum.reduceat(data, starts).astype(np.float64)
+
+    # Range of the finite data points only, NaN for categories without any
+    minimum, maximum = np.full(len(starts), np.nan), np.full(len(starts), np.nan)
+    for n in range(0, len(starts)):
+        segment = data[starts[n]:starts[n]+counts[n]]
+        segment = segment[np.isfinite(segment)]
+        if len(segment) > 0:
+            minimum[n], maximum[n] = np.min(segment), np.max(segment)
+
+    return minimum, maximum
+
+
+def Reference_bandwidth(count, std, iqr):
+
+    # Import dependencies
+    import numpy as np
+
+    # Normal reference rule, as statsmodels KDEUnivariate
+    sigma = np.minimum(std, iqr/1.349)
+    sigma = np.where(sigma > 0, sigma, std)
+    sigma = np.where(sigma > 0, sigma, 1.0)
+
+    # Categories without data points get a NaN bandwidth
+    count = np.asarray(count, dtype=float)
+
+    return np.where(count > 0, 1.059*sigma*np.maximum(count, 1e-300)**(-0.2), np.nan)
+
+
+def Sheather_jones(binned, dx, count, reference):
+
+    # Import dependencies
+    import numpy as np
+
+    binned = np.atleast_2d(binned)
+    count = np.asarray(count, dtype=float)
+    ncats, num = binned.shape
+    dx = np.broadcast_to(np.asarray(dx, dtype=float), (ncats,))
+    scale = reference*count**0.2/1.059
+
+    # Number of pairs of data points at every lag of the grid, from the
+    # autocorrelation of the binned counts (both orders of every pair)
+    length = 1 << int(np.ceil(np.log2(2*num)))
+    batch = max(1, 2**18//length)
+    pairs = np.empty((ncats, num))
+    for start in range(0, ncats, batch):
+        rows = slice(start, start+batch)
+        spectrum = np.fft.rfft(binned[rows], n=length, axis=1)
+        pairs[rows] = np.fft.irfft(spectrum*np.conj(spectrum), n=length, axis=1)[:, :num]
+    pairs[:, 1:] *= 2
+
+    def Functional(order, g):
+        # Estimate of the integrated squared derivative of the density
+        # (psi_4 or psi_6) with a Gaussian kernel of bandwidth g
+        finite = (g/dx)[np.isfinite(g/dx)]
+        lags = int(min(num, np.ceil(8*np.max(finite, initial=0)) + 1))
+        u2 = (np.arange(lags)[np.newaxis, :]*(dx/g)[:, np.newaxis])**2
+        if order == 4:
+            derivative = (u2**2 - 6*u2 + 3)*np.exp(-u2/2)
+        else:
+            derivative = (u2**3 - 15*u2**2 + 45*u2 - 15)*np.exp(-u2/2)
+        total = np.sum(pairs[:, :lags]*derivative, axis=1)
+        return total/(count*np.maximum(count-1, 1)*g**(order+1)*np.sqrt(2*np.pi))
+
+    # Pilot bandwidths and the equation h = (c1/psi_4(alpha2 h^5/7))^1/5
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        a = 1.24*scale*count**(-1/7)
+        b = 1.23*scale*count**(-1/9)
+        c1 = 1/(2*np.sqrt(np.pi)*count)
+        alpha2 = 1.357*(Functional(4, a)/-Functional(6, b))**(1/7)
+        def Equation(h):
+            return (c1/Functional(4, alpha2*h**(5/7)))**(1/5) - h
+
+        # Bisection of all categories at once, from the bracket of bw.SJ
+        lower = 0.1*1.144*scale*count**(-1/5)
+        upper = 1.144*scale*count**(-1/5)
+        for attempt in range(0, 10):
+            outside = ~(Equation(lower)*Equation(upper) <= 0)
+            if not np.any(outside):
+                break
+            lower = np.where(outside, lower/1.2, lower)
+            upper = np.where(outside, upper*1.2, upper)
+        valLower = Equation(lower)
+        for iteration in range(0, 40):
+            middle = (lower + upper)/2
+            valMiddle = Equation(middle)
+            left = valLower*valMiddle <= 0
+            upper = np.where(left, middle, upper)
+            lower = np.where(left, lower, middle)
+            valLower = np.where(left, valLower, valMiddle)
+        bandwidth = (lower + upper)/2
+
+    # Sparse or degenerate categories keep the reference bandwidth
+    valid = np.isfinite(bandwidth) & (bandwidth > 0) & ~outside
+
+    return np.where(valid, bandwidth, reference)
+
+
+def Smooth_binned(binned, dx, bandwidth):
+
+    # Import dependencies
+    import numpy as np
+
+    # Gaussian smoothing of all rows by FFT convolution, a batch of rows at
+    # a time so the spectra of many categories are not held at once
+    # The bin width is common or one per row (category grids)
+    num = binned.shape[1]
+    dx = np.broadcast_to(np.asarray(dx, dtype=float), binned.shape[:1])
+    length = 1 << int(np.ceil(np.log2(2*num)))
+    frequency = np.fft.rfftfreq(length)
+    batch = max(1, 2**18//length)
+    density = np.empty(binned.shape)
+    for start in range(0, binned.shape[0], batch):
+        rows = slice(start, start+batch)
+        kernel = np.exp(-2*(np.pi*frequency[np.newaxis, :]*np.nan_to_num(bandwidth[rows]/dx[rows])[:, np.newaxis])**2)
+        density[rows] = np.fft.irfft(np.fft.rfft(binned[rows], n=length, axis=1)*kernel, n=length, axis=1)[:, :num]
+
+    # Rows without data points or with a NaN bandwidth are NaN
+    total = np.sum(binned, axis=1)
+    density[~((total > 0) & np.isfinite(bandwidth))] = np.nan
+    np.maximum(density, 0, out=density)
+    density /= np.where(total > 0, total, 1)[:, np.newaxis]*dx[:, np.newaxis]
+
+    return density
+
+
+def Category_supports(grid, density, bandwidth, minimum, maximum, grid_size=512, support='Padded', grid_type='Uniform'):
+
+    # Import dependencies
+    import numpy as np
+
+    # Categories without data points or weight get a NaN curve
+    kdes = dict()
+    empty = ~np.isfinite(bandwidth)
+    missing = KernelDensity(np.full(grid_size, np.nan), np.full(grid_size, np.nan), np.nan)
+
+    if grid.ndim == 2 and support == 'Padded' and grid_type == 'Uniform':
+        # The grid of every category is its support
+        for n in range(0, len(bandwidth)):
+            kdes[n] = missing if empty[n] else KernelDensity(grid[n], density[n], bandwidth[n])
+        return kdes
+    if support == 'Padded' and grid_type == 'Uniform':
+        # Support of every category on the common grid: data range plus 3
+        # bandwidths
+        first = np.searchsorted(grid, minimum - 3*bandwidth, side='left')
+        last = np.searchsorted(grid, maximum + 3*bandwidth, side='right')
+
+        # Every support has at most about grid_size points (strided views)
+        step = np.maximum(-((first-last)//grid_size), 1)
+
+        for n in range(0, len(bandwidth)):
+            kdes[n] = missing if empty[n] else KernelDensity(grid[first[n]:last[n]:step[n]], density[n, first[n]:last[n]:step[n]],
+                                                             bandwidth[n])
+        return kdes
+
+    for n in range(0, len(bandwidth)):
+        # Data range, reflected at its ends, or data range plus 3 bandwidths,
+        # interpolated from the category grid or the common grid
+        if empty[n]:
+            kdes[n] = missing
+            continue
+        rowGrid = grid[n] if grid.ndim == 2 else grid
+        clipped = support == 'Data' and maximum[n] > minimum[n]
+        low = minimum[n] if clipped else minimum[n] - 3*bandwidth[n]
+        high = maximum[n] if clipped else maximum[n] + 3*bandwidth[n]
+        if grid_type == 'Quantile':
+            value = Quantile_grid(rowGrid, density[n], low, high, grid_size)
+        else:
+            value = np.linspace(low, high, grid_size)
+        estimate = np.interp(value, rowGrid, density[n], left=0, right=0)
+        if clipped:
+            estimate += np.interp(2*low - value, rowGrid, density[n], left=0, right=0)
+            estimate += np.interp(2*high - value, rowGrid, density[n], left=0, right=0)
+        kdes[n] = KernelDensity(value, estimate, bandwidth[n])
+
+    return kdes
+
+
+def Quantile_grid(grid, density, low, high, grid_size=512):
+
+    # Import dependencies
+    import numpy as np
+
+    # Cumulative density between low and high on the grid
+    inside = grid[np.searchsorted(grid, low, side='right'):np.searchsorted(grid, high, side='left')]
+    value = np.concatenate(([low], inside, [high]))
+    estimate = np.interp(value, grid, density, left=0, right=0)
+    cumulative = np.concatenate(([0], np.cumsum((estimate[1:] + estimate[:-1])/2*np.diff(value))))
+    if cumulative[-1] <= 0:
+        return np.linspace(low, high, grid_size)
+
+    # Half of the points at quantiles, half equidistant for the tails
+    increasing = np.concatenate(([True], np.diff(cumulative) > 0))
+    quantiles = np.interp(np.linspace(0, cumulative[-1], grid_size//2), cumulative[increasing], value[increasing])
+
+    return np.unique(np.concatenate((quantiles, np.linspace(low, high, grid_size - grid_size//2))))
+
+
+def Normal_pdf(x, mean, std):
+
+    # Import dependencies
+    import numpy as np
+
+    return np.exp(-0.5*((x-mean)/std)**2)/(std*np.sqrt(2*np.pi))
+
+
+def Joint_densities(sortedDatax, sortedDatay, offsets, grid_size=128, weights=None):
+
+    # Import dependencies
+    import numpy as np
+    from group_categories import Chunk_codes
+
+    datax = np.asarray(sortedDatax)[offsets[0]:offsets[-1]]
+    datay = np.asarray(sortedDatay)[offsets[0]:offsets[-1]]
+    if weights is not None:
+        weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+    ncats = len(offsets) - 1
+    chunk = 2**16
+
+    # Mean, standard deviation and range per category and axis, in chunks
+    count = np.zeros(ncats)
+    squaredWeights = np.zeros(ncats)
+    sums = np.zeros((2, ncats))
+    squares = np.zeros((2, ncats))
+    low = np.full(2, np.inf)
+    high = np.full(2, -np.inf)
+    for start in range(0, len(datax), chunk):
+        parts = [datax[start:start+chunk], datay[start:start+chunk]]
+        valid = ~(np.isnan(parts[0]) | np.isnan(parts[1]))
+        codes = Chunk_codes(offsets, start, start+len(valid))[valid]
+        partWeights = np.ones(len(codes)) if weights is None else weights[start:start+chunk][valid]
+        count += np.bincount(codes, weights=partWeights, minlength=ncats)
+        squaredWeights += np.bincount(codes, weights=partWeights**2, minlength=ncats)
+        for axis in range(0, 2):
+            part = parts[axis][valid].astype(np.float64)
+            sums[axis] += np.bincount(codes, weights=partWeights*part, minlength=ncats)
+            squares[axis] += np.bincount(codes, weights=partWeights*part**2, minlength=ncats)
+            if len(part):
+                low[axis] = min(low[axis], np.min(part))
+                high[axis] = max(high[axis], np.max(part))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums/count
+        std = np.sqrt(np.maximum(squares/count - mean**2, 0))
+        effective = np.nan_to_num(count**2/squaredWeights)
+
+    # Normal reference rule for two dimensions (Scott), weighted data points
+    # count by their effective number
+    bandwidth = 1.06*std*np.maximum(effective, 1)**(-1/6)
+    bandwidth = np.where(bandwidth > 0, bandwidth, 1e-3*np.maximum(high-low, 1e-12)[:, np.newaxis])
+    bandwidth = np.nan_to_num(bandwidth, nan=1.0)
+
+    # Common grid of all categories: data range plus 3 bandwidths
+    if not np.all(np.isfinite(low)):
+        low, high = np.zeros(2), np.ones(2)
+    low = low - 3*np.max(bandwidth, axis=1)
+    high = high + 3*np.max(bandwidth, axis=1)
+    gridx = np.linspace(low[0], high[0], grid_size)
+    gridy = np.linspace(low[1], high[1], grid_size)
+    dx = gridx[1] - gridx[0]
+    dy = gridy[1] - gridy[0]
+
+    # Linear binning of all categories onto the grid, chunk by chunk
+    cells = grid_size*grid_size
+    binned = np.zeros(ncats*cells)
+    for start in range(0, len(datax), chunk):
+        partx = datax[start:start+chunk]
+        party = datay[start:start+chunk]
+        valid = ~(np.isnan(partx) | np.isnan(party))
+        codes = Chunk_codes(offsets, start, start+len(valid))[valid]
+        positionx = (partx[valid] - low[0])/dx
+        positiony = (party[valid] - low[1])/dy
+        indexx = np.minimum(positionx.astype(np.intp), grid_size-2)
+        indexy = np.minimum(positiony.astype(np.intp), grid_size-2)
+        fractionx = positionx - indexx
+        fractiony = positiony - indexy
+        if weights is not None:
+            fractiony = fractiony*weights[start:start+chunk][valid]
+            rest = weights[start:start+chunk][valid] - fractiony
+        else:
+            rest = 1 - fractiony
+        flat = codes*cells + indexy*grid_size + indexx
+        binned += np.bincount(flat, weights=(1-fractionx)*rest, minlength=ncats*cells)
+        binned += np.bincount(flat+1, weights=fractionx*rest, minlength=ncats*cells)
+        binned += np.bincount(flat+grid_size, weights=(1-fractionx)*fractiony, minlength=ncats*cells)
+        binned += np.bincount(flat+grid_size+1, weights=fractionx*fractiony, minlength=ncats*cells)
+    binned = binned.reshape(ncats, grid_size, grid_size)
+
+    # Gaussian smoothing by FFT convolution, a batch of categories at a time
+    length = 1 << int(np.ceil(np.log2(2*grid_size)))
+    frequencyx = np.fft.rfftfreq(length, d=dx)
+    frequencyy = np.fft.fftfreq(length, d=dy)
+    batch = max(1, 2**20//(length*length))
+    density = np.empty(binned.shape)
+    for first in range(0, ncats, batch):
+        rows = slice(first, first+batch)
+        kernel = np.exp(-2*np.pi**2*((frequencyy[np.newaxis, :, np.newaxis]*bandwidth[1, rows, np.newaxis, np.newaxis])**2
+                                     + (frequencyx[np.newaxis, np.newaxis, :]*bandwidth[0, rows, np.newaxis, np.newaxis])**2))
+        spectrum = np.fft.rfft2(binned[rows], s=(length, length))*kernel
+        density[rows] = np.fft.irfft2(spectrum, s=(length, length))[:, :grid_size, :grid_size]
+    np.maximum(density, 0, out=density)
+    density /= np.where(count > 0, count, 1)[:, np.newaxis, np.newaxis]*dx*dy
+    density[~(count > 0)] = np.nan
+
+    return gridx, gridy, density
+
+
+def Hdr_levels(density, masses=(0.5, 0.8, 0.95)):
+
+    # Import dependencies
+    import numpy as np
+
+    # Density above which the given probability mass of every category lies
+    flat = np.asarray(density).reshape(len(density), -1)
+    ordered = -np.sort(-flat, axis=1)
+    cumulative = np.cumsum(ordered, axis=1, dtype=np.float64)
+    total = cumulative[:, -1:]
+    cumulative /= np.where(total > 0, total, 1)
+    levels = np.empty((len(flat), len(masses)))
+    for k, mass in enumerate(masses):
+        index = np.minimum(np.sum(cumulative < mass, axis=1), flat.shape[1]-1)
+        levels[:, k] = ordered[np.arange(len(flat)), index]
+
+    # Categories without data points (NaN or zero density) have no regions
+    levels[~(total[:, 0] > 0)] = np.nan
+
+    return levels
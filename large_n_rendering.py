@@ -0,0 +1,188 @@
+"""
+Functions to render figures with very many data points. Jitter columns show
+a stratified subsample of the data points, and scatter plots show a binned
+density image instead of one marker per data point. Means, standard
+deviations and distributions are still computed from all data points.
+
+INPUT
+Stratified_sample(sortedData, offsets, max_points, seed, presorted, weights)
+sortedData: N x 1 numpy array containing the data points sorted by category
+offsets:    (K+1) x 1 numpy array with the start of every category in
+            sortedData, see Group_categories
+max_points: total number of data points to keep. Every category keeps a
+            share proportional to its size (at least 1 data point).
+seed:       seed of the random offset of the strata. Defaults to None.
+presorted:  True when the data points of every category are already sorted
+            by value (see Sort_segments). Defaults to False.
+weights:    N x 1 numpy array with the weight of every data point, sorted
+            as sortedData. Defaults to None (every data point counts once).
+
+OUTPUT
+sample:        M x 1 numpy array with the sampled data points, sorted by
+               category and within a category by value
+sampleOffsets: (K+1) x 1 numpy array with the start of every category in
+               sample
+
+The data points of a category are sorted and split into equally sized
+strata; one data point is taken per stratum (systematic sampling), so the
+sample has the same quantiles as all data points. With weights the strata
+hold equal sums of weights, so a data point is drawn with a probability
+proportional to its weight (heavy data points can be drawn more than once)
+and the sample represents the weighted distribution.
+
+Weighted_sample(sortedWeights, offsets, max_points, seed)
+index:         M x 1 numpy array with the positions in sortedData of the
+               data points drawn with a probability proportional to their
+               weight (systematic sampling of the cumulative weights),
+               sorted by category
+sampleOffsets: (K+1) x 1 numpy array with the start of every category in
+               index
+
+Density_counts(sortedDatax, sortedDatay, offsets, bins, extent, weights)
+sortedDatax: N x 1 numpy array containing the x-values sorted by category
+sortedDatay: N x 1 numpy array containing the y-values sorted by category
+bins:        number of bins along each axis. Defaults to 256.
+extent:      np.array([xmin, xmax, ymin, ymax]). Defaults to the data range,
+             widened like matplotlib axis limits when x or y is constant.
+weights:     N x 1 numpy array with the weight of every data point.
+             Defaults to None.
+
+OUTPUT
+counts:      K x bins x bins numpy array with the (weighted) number of data
+             points of every category per bin
+extent:      np.array([xmin, xmax, ymin, ymax]) of the bins
+
+Composite_density(counts, cols)
+cols:        K x 3 (or K x 4) numpy array with the color of every category
+image:       bins x bins x 4 numpy array with the RGBA image of all
+             categories, to be drawn with imshow(..., origin='lower')
+
+The image is made in two steps, so the counts can be stored in a plot
+layout and the colors changed without binning the data again.
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Stratified_sample(sortedData, offsets, max_points, seed=None, presorted=False, weights=None):
+
+    # Import dependencies
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    data = np.asarray(sortedData)[offsets[0]:offsets[-1]]
+    counts = np.diff(offsets)
+    starts = offsets[:-1] - offsets[0]
+
+    if weights is not None:
+        # Strata of equal weight in the sorted data of every category
+        weights = np.asarray(weights)[offsets[0]:offsets[-1]]
+        if not presorted:
+            order = np.lexsort((data, np.repeat(np.arange(len(counts)), counts)))
+            data = data[order]
+            weights = weights[order]
+        index, sampleOffsets = Weighted_sample(weights, offsets-offsets[0], max_points, rng)
+        return data[index], sampleOffsets
+
+    # Number of data points per category, proportional to its size
+    size = np.minimum(counts, np.maximum(np.ceil(max_points*counts/np.sum(counts)), 1)).astype(np.intp)
+    sampleOffsets = np.concatenate(([0], np.cumsum(size)))
+
+    # One data point per stratum of the sorted data of every category
+    if presorted:
+        sortedValues = data
+    else:
+        sortedValues = data[np.lexsort((data, np.repeat(np.arange(len(counts)), counts)))]
+    sampleCodes = np.repeat(np.arange(len(counts)), size)
+    stratum = np.arange(sampleOffsets[-1]) - sampleOffsets[sampleCodes]
+    position = (stratum + rng.random(len(stratum)))*counts[sampleCodes]/size[sampleCodes]
+    index = starts[sampleCodes] + np.minimum(position.astype(np.intp), counts[sampleCodes]-1)
+
+    return sortedValues[index], sampleOffsets
+
+
+def Weighted_sample(sortedWeights, offsets, max_points, seed=None):
+
+    # Import dependencies
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    weights = np.asarray(sortedWeights)[offsets[0]:offsets[-1]]
+    counts = np.diff(offsets)
+    starts = offsets[:-1] - offsets[0]
+
+    # One data point per stratum of equal weight, found in the cumulative
+    # weights of the category
+    cumulative = np.concatenate(([0], np.cumsum(weights, dtype=np.float64)))
+    before = cumulative[starts]
+    total = cumulative[starts+counts] - before
+
+    # Number of data points per category, proportional to its size;
+    # categories without weight get none
+    size = np.minimum(counts, np.maximum(np.ceil(max_points*counts/max(np.sum(counts), 1)), 1)).astype(np.intp)
+    size[~(total > 0)] = 0
+    sampleOffsets = np.concatenate(([0], np.cumsum(size)))
+
+    sampleCodes = np.repeat(np.arange(len(counts)), size)
+    stratum = np.arange(sampleOffsets[-1]) - sampleOffsets[sampleCodes]
+    position = before[sampleCodes] + (stratum + rng.random(len(stratum)))*total[sampleCodes]/size[sampleCodes]
+    index = np.searchsorted(cumulative, position, side='right') - 1
+    index = np.clip(index, starts[sampleCodes], starts[sampleCodes]+counts[sampleCodes]-1)
+
+    return index, sampleOffsets
+
+
+def Density_counts(sortedDatax, sortedDatay, offsets, bins=256, extent=None, weights=None):
+
+    # Import dependencies
+    import numpy as np
+
+    datax = np.asarray(sortedDatax)[offsets[0]:offsets[-1]]
+    datay = np.asarray(sortedDatay)[offsets[0]:offsets[-1]]
+    ncats = len(offsets) - 1
+    codes = np.repeat(np.arange(ncats), np.diff(offsets))
+    if extent is None:
+        extent = np.array([np.nanmin(datax), np.nanmax(datax), np.nanmin(datay), np.nanmax(datay)])
+    extent = np.array(extent, dtype=float)
+
+    # A constant x or y gets a range of 5% around its value (0.05 around 0),
+    # as matplotlib widens equal axis limits
+    for low, high in [(0, 1), (2, 3)]:
+        if extent[high] - extent[low] <= 0:
+            center = extent[low]
+            extent[low], extent[high] = (center - 0.05*abs(center), center + 0.05*abs(center)) if center != 0 else (-0.05, 0.05)
+
+    # 2D histogram of all categories in one pass
+    valid = (datax >= extent[0]) & (datax <= extent[1]) & (datay >= extent[2]) & (datay <= extent[3])
+    ix = np.minimum(((datax[valid]-extent[0])/(extent[1]-extent[0])*bins).astype(np.intp), bins-1)
+    iy = np.minimum(((datay[valid]-extent[2])/(extent[3]-extent[2])*bins).astype(np.intp), bins-1)
+    cellWeights = None if weights is None else np.asarray(weights)[offsets[0]:offsets[-1]][valid]
+    counts = np.bincount((codes[valid]*bins + iy)*bins + ix, weights=cellWeights, minlength=ncats*bins*bins).reshape(ncats, bins, bins)
+
+    return counts, extent
+
+
+def Composite_density(counts, cols):
+
+    # Import dependencies
+    import numpy as np
+
+    # Composite the categories, opacity increases with the density
+    ncats, binsy, binsx = counts.shape
+    image = np.zeros((binsy, binsx, 4))
+    for n in range(0, ncats):
+        # Weighted counts can be fractional, a category without weight is
+        # left out of the image
+        peak = np.max(counts[n])
+        if not peak > 0:
+            continue
+        alpha = 0.6*np.sqrt(counts[n]/peak)
+        image[:, :, :3] = np.asarray(cols[n])[:3]*alpha[:, :, np.newaxis] + image[:, :, :3]*(1-alpha[:, :, np.newaxis])
+        image[:, :, 3] = alpha + image[:, :, 3]*(1-alpha)
+    covered = image[:, :, 3] > 0
+    image[covered, :3] /= image[covered, 3][:, np.newaxis]
+
+    return image
@@ -0,0 +1,150 @@
+"""
+Functions to cache computed plot layouts on disk, so replotting the same
+data with other colors, labels or marker sizes skips all statistics. A
+layout is stored under a hash of the input data and of the settings that
+change the statistics (e.g. DistType, GridSize, Seed); settings that only
+change the rendering are not part of the key. The cache directory is kept
+below a maximum size by removing the least recently used layouts.
+
+INPUT
+Layout_key(name, inputs, settings)
+name:      name of the layout function, e.g. 'jitter_distribution'
+inputs:    list with the input data (numpy arrays, lists, pandas objects,
+           np.memmap arrays or paths to files; a file is identified by its
+           path, size and modification time)
+settings:  dict with the settings that change the statistics
+
+OUTPUT
+key:       hexadecimal hash, or None when an input cannot be hashed (e.g.
+           an iterator of chunks) or the Seed setting is not an integer or
+           None (a random Generator gives other jitter on every call)
+
+Load_cached(directory, key)
+directory: path of the cache directory
+key:       hash returned by Layout_key
+
+OUTPUT
+layout:    the cached layout (memory-mapped, see Load_layout), or None. A
+           cached file that cannot be read (e.g. truncated) counts as a
+           miss and is removed.
+
+Store_cached(directory, key, layout, max_bytes)
+max_bytes: maximum size of the cache directory in bytes. Defaults to 1e9.
+
+EXAMPLE
+fig = jitter_distribution_figure(data, cats, Cache='layout_cache')
+fig = jitter_distribution_figure(data, cats, Cache='layout_cache', Colors=colors)   # cache hit
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Layout_key(name, inputs, settings):
+
+    # Import dependencies
+    import os
+    import hashlib
+    import numpy as np
+
+    # Only reproducible seeds, the repr of a Generator differs per call
+    seed = settings.get('Seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, np.integer))):
+        return None
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(name.encode())
+    digest.update(repr(sorted(settings.items())).encode())
+    for value in inputs:
+        if isinstance(value, (str, os.PathLike)):
+            status = os.stat(value)
+            digest.update(('file:%s:%d:%d' % (os.path.abspath(value), status.st_size, status.st_mtime_ns)).encode())
+            continue
+        if hasattr(value, '__next__'):
+            return None
+
+        array = np.asarray(value)
+        if array.dtype.hasobject:
+            array = array.astype(str)
+        digest.update(('array:%s:%s' % (array.dtype.str, array.shape)).encode())
+        digest.update(np.ascontiguousarray(array).view(np.uint8).ravel() if array.size else b'')
+
+    return digest.hexdigest()
+
+
+def Load_cached(directory, key):
+
+    # Import dependencies
+    import os
+    import zipfile
+    from plot_layout import Load_layout
+
+    path = os.path.join(directory, key + '.npz')
+    if not os.path.exists(path):
+        return None
+    try:
+        layout = Load_layout(path)
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+        # A corrupt layout is a miss, it is computed and stored again
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    # Mark the layout as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return layout
+
+
+def Store_cached(directory, key, layout, max_bytes=1e9):
+
+    # Import dependencies
+    import os
+    import tempfile
+    from plot_layout import Save_layout
+
+    os.makedirs(directory, exist_ok=True)
+
+    # Write to a temporary file first, so readers never see a partial layout;
+    # it is not named .npz, so eviction leaves it alone while it is written
+    handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            Save_layout(layout, file)
+        os.replace(temporary, os.path.join(directory, key + '.npz'))
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        return
+
+    Evict_cached(directory, max_bytes)
+
+
+def Evict_cached(directory, max_bytes=1e9):
+
+    # Import dependencies
+    import os
+
+    entries = list()
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.npz') and entry.is_file():
+            status = entry.stat()
+            entries.append((status.st_mtime_ns, status.st_size, entry.path))
+
+    # Remove the least recently used layouts until the cache fits
+    total = sum([size for time, size, path in entries])
+    for time, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,98 @@
+"""
+Functions to store the computed statistics of a figure (the plot layout)
+separately from the rendering. A layout is a dict of numpy arrays, as
+returned by jitter_distribution_layout and scatter_distribution_layout, and
+can be rendered many times (other colors, labels or sizes) without
+recomputing any statistics. Arrays that differ in length per category are
+concatenated, with an offsets array marking the start of every category.
+
+INPUT
+Save_layout(layout, path)
+layout:   dict of numpy arrays (and strings or numbers)
+path:     path of the .npz file (or an open binary file). The file is not
+          compressed, so it can be loaded without copying.
+
+Load_layout(path, mmap)
+path:     path of the .npz file
+mmap:     True (arrays are read-only memory maps into the file, nothing
+          is copied) or False (arrays are read into memory).
+          Defaults to True.
+
+OUTPUT
+layout:   dict of numpy arrays
+
+Pack_arrays(arrays)
+arrays:   list with one numpy array per category
+
+OUTPUT
+values:   numpy array with all arrays concatenated
+offsets:  (K+1) x 1 numpy array, category n is values[offsets[n]:offsets[n+1]]
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Pack_arrays(arrays):
+
+    # Import dependencies
+    import numpy as np
+
+    lengths = [len(array) for array in arrays]
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.intp)
+    if len(arrays) == 0:
+        return np.zeros(0), offsets
+
+    return np.concatenate([np.atleast_1d(array) for array in arrays]), offsets
+
+
+def Save_layout(layout, path):
+
+    # Import dependencies
+    import numpy as np
+
+    np.savez(path, **{key: np.asarray(value) for key, value in layout.items()})
+
+
+def Load_layout(path, mmap=True):
+
+    # Import dependencies
+    import zipfile
+    import struct
+    import numpy as np
+
+    layout = dict()
+    if not mmap:
+        with np.load(path) as file:
+            for key in file.files:
+                layout[key] = file[key]
+        return layout
+
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            key = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                layout[key] = np.load(archive.open(info))
+                continue
+
+            # Start of the .npy data behind the local file header
+            file.seek(info.header_offset)
+            header = file.read(30)
+            nameLength, extraLength = struct.unpack('<HH', header[26:30])
+            file.seek(info.header_offset + 30 + nameLength + extraLength)
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(file)
+
+            if dtype.hasobject or len(shape) == 0 or np.prod(shape) == 0:
+                # Scalars, empty arrays and objects cannot be memory-mapped
+                layout[key] = np.lib.format.read_array(archive.open(info), allow_pickle=False)
+            else:
+                layout[key] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(),
+                                        shape=shape, order='F' if fortran else 'C')
+
+    return layout
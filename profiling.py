@@ -0,0 +1,115 @@
+"""
+Functions to time the stages of a figure function (grouping, kernel density
+fitting, jitter, distributions, artist creation and drawing) per figure and
+per category, together with the sizes of the arrays involved.
+
+INPUT
+New_report(profile, keep)
+profile:  option 'Profile' of a figure function: None/False (no
+          profiling), a dict that is filled with the report, or a
+          callable that receives the report when the figure is finished
+keep:     True to add to the stages of a dict that already holds a
+          report (used by the layout and render functions, so one dict
+          collects both stages), False to start a new report.
+          Defaults to False.
+
+OUTPUT
+report:   dict with
+          'stages'      dict with the total time (s) per stage
+          'categories'  list with per stage and category a dict with
+                        'stage', 'category', 'time' and the array sizes
+                        (e.g. 'points', 'grid', 'support')
+          'sizes'       dict with the sizes of the figure (e.g. 'N', 'K')
+          or None when profiling is off
+
+Stage(report, name, category)
+Context manager timing one stage. The yielded dict can be filled with
+array sizes, which are stored with the per category timing.
+
+EXAMPLE
+with Stage(report, 'jitter', catnames[n]) as entry:
+    xJitter, yJitter, ... = Jitter(thisData, n)
+    entry['points'] = len(xJitter)
+
+Finish_report(report, profile)
+Sends the report to the callable given as profile option.
+
+Merge_reports(report, reports, key)
+Adds the reports of parts of a figure (e.g. the panels of
+jitter_distribution_facets, each filled by its own thread) to report: the
+stage times are summed, the per category entries get the index of their
+part under key, and 'sizes' gets a list with the sizes of every part.
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+from contextlib import contextmanager
+
+
+def New_report(profile, keep=False):
+
+    if profile is None or profile is False:
+        return None
+
+    if isinstance(profile, dict):
+        report = profile
+        if keep and 'stages' in report:
+            return report
+    else:
+        report = dict()
+    report['stages'] = dict()
+    report['categories'] = list()
+    report['sizes'] = dict()
+
+    return report
+
+
+@contextmanager
+def Stage(report, name, category=None):
+
+    # Import dependencies
+    import time
+
+    entry = dict()
+    if report is None:
+        yield entry
+        return
+
+    start = time.perf_counter()
+    yield entry
+    elapsed = time.perf_counter() - start
+
+    report['stages'][name] = report['stages'].get(name, 0.0) + elapsed
+    if category is not None:
+        entry['stage'] = name
+        entry['category'] = category
+        entry['time'] = elapsed
+        report['categories'].append(entry)
+
+
+def Finish_report(report, profile):
+
+    if report is not None and callable(profile):
+        profile(report)
+
+    return report
+
+
+def Merge_reports(report, reports, key='part'):
+
+    if report is None:
+        return report
+
+    report['sizes'][key + 's'] = list()
+    for index, part in enumerate(reports):
+        for name, elapsed in part['stages'].items():
+            report['stages'][name] = report['stages'].get(name, 0.0) + elapsed
+        for entry in part['categories']:
+            entry[key] = index
+            report['categories'].append(entry)
+        report['sizes'][key + 's'].append(part['sizes'])
+
+    return report
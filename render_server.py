@@ -0,0 +1,456 @@
+"""
+Local render service for web backends: a small HTTP server (on a loopback
+TCP port or a Unix socket) that renders jitter distribution and scatter
+distribution figures to PNG or SVG bytes. The figure functions are
+imported once in a pool of warm worker processes, and every worker keeps
+one pre-built figure template per layout (jitter External, jitter
+Internal and the scatter 2 x 2 grid) with all its axes and artists. A
+request is drawn by render_jitter_distribution or
+render_scatter_distribution with the option Artists, which only replaces
+the data of the artists (points, curves, error bars, trendlines, ...), the
+tick labels and the axes limits, so it pays neither interpreter start-up,
+imports nor plt.subplots.
+
+INPUT
+RenderServer(address, workers, max_queue, layouts)
+address:   ('127.0.0.1', port) for a TCP server (port 0 picks a free
+           port), or the path of a Unix socket. Defaults to
+           ('127.0.0.1', 8765).
+workers:   number of worker processes. Defaults to the number of CPUs.
+max_queue: maximum number of requests waiting for a worker; further
+           requests are rejected with 503. Defaults to 64.
+layouts:   directory with plot layouts saved with Save_layout, which
+           requests can render by name. Defaults to None (requests need
+           data).
+
+METHODS
+start()    start the workers (templates built and rendered once) and
+           serve requests in a background thread
+stop()     stop serving and shut down the workers
+url        address of the running server
+
+ENDPOINTS
+POST /render   JSON body with
+               'figure'    'jitter_distribution' or 'scatter_distribution'
+               'data'      lists with the data: {'data': [...], 'cats': [...]}
+                           or {'datax': [...], 'datay': [...], 'cats': [...]}
+               'layout'    instead of 'data': name of a plot layout saved
+                           with Save_layout in the layouts directory of the
+                           server (a path relative to it). Names outside
+                           that directory are rejected with 400.
+               'settings'  dict with the settings of the figure function,
+                           e.g. {'PlotType': 'Internal', 'YLabel': 'Y'}
+               'format'    'png' or 'svg'. Defaults to 'png'.
+               'dpi'       resolution of png images. Defaults to 100.
+               Responds with the image bytes, 400 for an invalid request
+               (unknown layout, invalid data or settings), 500 when the
+               render fails and 503 when the queue is full. Tracebacks
+               are logged on the server (logging) and not sent.
+GET /metrics   JSON with the number of requests, the queue depth (requests
+               waiting for a worker), the requests being rendered and the
+               latency (total, queue wait and render time; mean, 50th, 95th
+               and 99th percentile in seconds of the last 1000 requests)
+GET /health    'ok' when the server runs
+
+Request_render(address, request, timeout)
+Sends a request to a running server (TCP or Unix socket) and returns the
+image bytes; raises an Exception with the response text on errors.
+
+Run from the command line:
+    python render_server.py --port 8765 --workers 4
+    python render_server.py --socket /tmp/render.sock --layouts /srv/layouts
+
+EXAMPLE
+server = RenderServer(('127.0.0.1', 0), workers=2)
+server.start()
+png = Request_render(server.address, {'figure': 'jitter_distribution',
+                     'data': {'data': data.tolist(), 'cats': cats.tolist()},
+                     'settings': {'YLabel': 'Step length (m)'}})
+server.stop()
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+# Figures of one worker process with their artists, built once per layout
+# type and updated in place by every request (option Artists of the figure
+# functions)
+templates = dict()
+
+
+def Init_worker():
+
+    # Import dependencies once per worker
+    import io
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    from jitter_distribution_figure import jitter_distribution_layout
+    from scatter_distribution_figure import scatter_distribution_layout
+
+    # Build every template and render it once, so fonts and caches are warm
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=100)
+    cats = rng.integers(0, 2, 100)
+    jitterLayout = jitter_distribution_layout(data, cats)
+    scatterLayout = scatter_distribution_layout(data, data + rng.normal(size=100), cats, Trendline=True)
+    for kind, layout, settings in [('External', jitterLayout, {'PlotType': 'External'}),
+                                   ('Internal', jitterLayout, {'PlotType': 'Internal'}),
+                                   ('scatter', scatterLayout, dict())]:
+        fig = Render_template(kind, layout, settings)
+        for fmt in ['png', 'svg']:
+            fig.savefig(io.BytesIO(), format=fmt)
+
+
+def Worker_ready(delay=0.05):
+
+    # Import dependencies
+    import os
+    import time
+
+    # Short job, so warming up starts every worker process
+    time.sleep(delay)
+    return os.getpid()
+
+
+def Render_request(request):
+
+    # Import dependencies
+    import io
+    import time
+    import traceback
+    import numpy as np
+    from plot_layout import Load_layout
+    from jitter_distribution_figure import jitter_distribution_layout
+    from scatter_distribution_figure import scatter_distribution_layout
+
+    started = time.time()
+    result = {'body': None, 'status': 200, 'error': None, 'traceback': None, 'started': started}
+    try:
+        figure = request.get('figure', 'jitter_distribution')
+        settings = dict(request.get('settings', dict()))
+        for item in ['Figure', 'Artists', 'Show', 'Profile', 'Cache']:
+            settings.pop(item, None)
+        if figure == 'jitter_distribution':
+            kind = settings.get('PlotType', 'External')
+            if kind != 'Internal':
+                kind = 'External'
+        elif figure == 'scatter_distribution':
+            kind = 'scatter'
+        else:
+            raise ValueError('Unknown figure. Choose between "jitter_distribution" and "scatter_distribution".')
+
+        # Plot layout from the data or from a saved layout
+        if 'layout' in request:
+            layout = Load_layout(request['layout'])
+        elif figure == 'jitter_distribution':
+            data = request['data']
+            layout = jitter_distribution_layout(np.asarray(data['data'], dtype=float), np.asarray(data['cats']), **settings)
+        else:
+            data = request['data']
+            layout = scatter_distribution_layout(np.asarray(data['datax'], dtype=float), np.asarray(data['datay'], dtype=float),
+                                                 np.asarray(data['cats']), **settings)
+    except Exception as error:
+        # Invalid data, settings or layout file: an error of the request
+        result.update(status=400, error='Invalid request: ' + str(error), traceback=traceback.format_exc())
+    else:
+        try:
+            fig = Render_template(kind, layout, settings)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=request.get('format', 'png'), dpi=request.get('dpi', 100))
+            result['body'] = buffer.getvalue()
+        except Exception:
+            result.update(status=500, error='Render failed', traceback=traceback.format_exc())
+
+    result['render'] = time.time()-started
+    return result
+
+
+def Render_template(kind, layout, settings):
+
+    # Import dependencies
+    from jitter_distribution_figure import render_jitter_distribution
+    from scatter_distribution_figure import render_scatter_distribution
+
+    # The figure functions update the artists of the template in place
+    artists = templates.setdefault(kind, dict())
+    if kind == 'scatter':
+        return render_scatter_distribution(layout, **dict(settings, Artists=artists, Show=False))
+    return render_jitter_distribution(layout, **dict(settings, Artists=artists, Show=False))
+
+
+def Percentiles(values):
+
+    # Import dependencies
+    import numpy as np
+
+    if len(values) == 0:
+        return {'mean': None, 'p50': None, 'p95': None, 'p99': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': float(np.mean(values)), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+
+class RenderServer:
+
+    def __init__(self, address=('127.0.0.1', 8765), workers=None, max_queue=64, layouts=None):
+
+        # Import dependencies
+        import os
+        import threading
+        from collections import deque
+
+        self.address = address
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_queue = max_queue
+        self.layouts = None if layouts is None else os.path.realpath(layouts)
+        self.pool = None
+        self.server = None
+        self.thread = None
+
+        # Metrics, updated by the request threads
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.counts = {'requests': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+        self.latency = deque(maxlen=1000)
+        self.wait = deque(maxlen=1000)
+        self.render = deque(maxlen=1000)
+
+    @property
+    def url(self):
+
+        if isinstance(self.address, str):
+            return 'unix:' + self.address
+        return 'http://%s:%d' % self.address
+
+    def start(self):
+
+        # Import dependencies
+        import os
+        import socketserver
+        import threading
+        from http.server import ThreadingHTTPServer
+        from concurrent.futures import ProcessPoolExecutor, wait
+
+        # Warm workers: every process starts, imports and builds its templates
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=Init_worker)
+        wait([self.pool.submit(Worker_ready) for n in range(0, self.workers)])
+
+        handler = Request_handler(self)
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self.server = socketserver.ThreadingUnixStreamServer(self.address, handler)
+        else:
+            self.server = ThreadingHTTPServer(self.address, handler)
+            self.address = self.server.server_address[:2]
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+
+        # Import dependencies
+        import os
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def layout_path(self, name):
+
+        # Import dependencies
+        import os
+
+        # Only files inside the layouts directory, so clients cannot probe
+        # other paths of the server
+        if self.layouts is None:
+            raise ValueError('The server has no layouts directory.')
+        if not isinstance(name, str):
+            raise ValueError('Unknown layout.')
+        path = os.path.realpath(os.path.join(self.layouts, name))
+        if os.path.commonpath([self.layouts, path]) != self.layouts or not os.path.isfile(path):
+            raise ValueError('Unknown layout.')
+
+        return path
+
+    def submit(self, request):
+
+        # Import dependencies
+        import time
+        import logging
+
+        received = time.time()
+        with self.lock:
+            self.counts['requests'] += 1
+            if self.pending - self.workers >= self.max_queue:
+                self.counts['rejected'] += 1
+                return None
+            self.pending += 1
+        try:
+            result = self.pool.submit(Render_request, request).result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+        # Tracebacks stay in the server log
+        if result['status'] == 400:
+            logging.getLogger(__name__).warning('Invalid render request\n%s', result['traceback'])
+        elif result['status'] != 200:
+            logging.getLogger(__name__).error('Render failed\n%s', result['traceback'])
+
+        with self.lock:
+            self.counts['completed' if result['status'] == 200 else 'failed'] += 1
+            self.latency.append(time.time() - received)
+            self.wait.append(max(result['started'] - received, 0.0))
+            self.render.append(result['render'])
+
+        return result
+
+    def metrics(self):
+
+        with self.lock:
+            metrics = dict(self.counts)
+            metrics['workers'] = self.workers
+            metrics['queue_depth'] = max(self.pending - self.workers, 0)
+            metrics['rendering'] = min(self.pending, self.workers)
+            metrics['latency'] = Percentiles(list(self.latency))
+            metrics['queue_wait'] = Percentiles(list(self.wait))
+            metrics['render_time'] = Percentiles(list(self.render))
+
+        return metrics
+
+
+def Request_handler(service):
+
+    # Import dependencies
+    import json
+    from http.server import BaseHTTPRequestHandler
+
+    content_types = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+
+            if self.path == '/metrics':
+                self.Respond(200, 'application/json', json.dumps(service.metrics()).encode())
+            elif self.path == '/health':
+                self.Respond(200, 'text/plain', b'ok')
+            else:
+                self.Respond(404, 'text/plain', b'Not found')
+
+        def do_POST(self):
+
+            if self.path != '/render':
+                self.Respond(404, 'text/plain', b'Not found')
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if request.get('format', 'png') not in content_types:
+                    raise ValueError('Unknown format. Choose between "png" and "svg".')
+                if request.get('figure', 'jitter_distribution') not in ['jitter_distribution', 'scatter_distribution']:
+                    raise ValueError('Unknown figure. Choose between "jitter_distribution" and "scatter_distribution".')
+                if 'data' not in request and 'layout' not in request:
+                    raise ValueError('The request needs data or a layout.')
+                if 'layout' in request:
+                    request['layout'] = service.layout_path(request['layout'])
+            except (ValueError, TypeError, AttributeError) as error:
+                self.Respond(400, 'text/plain', str(error).encode())
+                return
+
+            result = service.submit(request)
+            if result is None:
+                self.Respond(503, 'text/plain', b'Render queue is full')
+            elif result['status'] != 200:
+                self.Respond(result['status'], 'text/plain', result['error'].encode())
+            else:
+                self.Respond(200, content_types[request.get('format', 'png')], result['body'])
+
+        def Respond(self, status, content_type, body):
+
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+
+            # Quiet, the metrics endpoint reports the requests
+            pass
+
+        def address_string(self):
+
+            # Unix socket clients have no host address
+            return str(self.client_address)
+
+    return Handler
+
+
+def Request_render(address, request, timeout=60):
+
+    # Import dependencies
+    import json
+    import socket
+    import http.client
+
+    if isinstance(address, str):
+        # HTTP over a Unix socket
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(timeout)
+                self.sock.connect(address)
+        connection = UnixConnection('localhost', timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(address[0], address[1], timeout=timeout)
+
+    try:
+        if request is None:
+            connection.request('GET', '/metrics')
+        else:
+            connection.request('POST', '/render', body=json.dumps(request), headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise Exception('Render request failed (%d): %s' % (response.status, body.decode(errors='replace')))
+
+    return json.loads(body) if request is None else body
+
+
+if __name__ == '__main__':
+
+    import time
+    import logging
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Local render server for the figure functions')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--layouts', default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    address = args.socket if args.socket else (args.host, args.port)
+    server = RenderServer(address, args.workers, args.max_queue, args.layouts).start()
+    print('Serving on ' + server.url, flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
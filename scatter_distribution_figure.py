@@ -2,13 +2,38 @@
  Function to create a scatter plot showing the individual data points
  and the distributions on the X and Y axis. 
 
+ The figure is made in two stages, which can also be called separately:
+ scatter_distribution_layout computes the scatter points (or the binned
+ density image), trendlines and distributions and returns them as a plot
+ layout (a dict of numpy arrays, see plot_layout.py), and
+ render_scatter_distribution draws a layout. A saved layout (Save_layout,
+ Load_layout) can be rendered again with other colors, labels, limits or
+ marker sizes without recomputing any statistics. The settings Trendline,
+ Contours, PlotType, GridSize, Bandwidth, Support, GridType, ChunkSize,
+ SampleSize, LargeN, Seed, Cache, CacheSize, Weights and Counts belong to
+ the layout stage, all other settings to the render stage.
+
  INPUT
  scatter_distribution_figure(datax, datay, cats)
  datax:    N x 1 numpy array containing x-values of the data to be plotted
  datay:    N x 1 numpy array containing y-values of the data to be plotted 
- cats:     N x 1 list of character vectors representing the 
+ cats:     N x 1 list of character vectors, N x 1 numpy array of integer
+           codes or a pandas Categorical representing the 
            corresponding groups of the data points
 
+ Very large datasets can be streamed (see Read_chunks in streaming_input):
+ datax, datay and cats can be np.memmap arrays or paths to .npy files, or
+ datax can be an iterator yielding (datax, datay, cats) chunks or a path to
+ a text file with x, y and category columns (datay and cats omitted).
+ Means, standard deviations and distributions are computed from all data
+ points, the scatter points and trendlines from a sample per category.
+
+ Pre-aggregated data can be plotted without the individual data points
+ (see weighted_input.py): with the option Counts, datax and datay hold the
+ bin edges of both axes and cats the K category names, and Counts the
+ K x Bx x By binned counts. With the option Weights every data point has a
+ weight (e.g. a survey weight).
+
  OPTIONAL INPUT
  scatter_plot(..., KWARG1 = value1, KWARG2 = value2, ...)
  
@@ -17,7 +42,9 @@
                     Defaults to copper colormap 
      'Markersize'   Markersize of data points.
                     Defaults to 100. 
-     'Trendline'    True or False. 
+     'Trendline'    True or 'Linear' (least squares line), 'Lowess'
+                    (robust locally weighted trend on binned data, see
+                    group_trendlines.py) or False.
                     Defaults to False.  
      'XLim'         Xlim: np.array([min, max])
                     Defaults to standard lims. 
@@ -29,6 +56,94 @@
                     Defaults to empty string.
      'DistType'     'Kernel' or 'Gaussian'. 
                     Defaults to Kernel.
+     'GridSize'     Number of points at which the Kernel and Gaussian
+                    distributions are evaluated, independent of the
+                    units of the data.
+                    Defaults to 512.
+     'Bandwidth'    'Scott', 'Silverman' or 'SheatherJones'.
+                    Bandwidth rule of the kernel distributions (see
+                    jitter_distribution_figure).
+                    Defaults to Scott.
+     'Support'      'Padded' (data range plus 3 bandwidths) or 'Data'
+                    (data range only, reflected at its ends).
+                    Defaults to Padded.
+     'GridType'     'Uniform' or 'Quantile' (half of the GridSize points at
+                    quantiles of the kernel distribution).
+                    Defaults to Uniform.
+     'ChunkSize'    Number of data points read at once from streamed input.
+                    Defaults to 100000.
+     'SampleSize'   Maximum number of scatter points per category for
+                    streamed input.
+                    Defaults to 1000.
+     'LargeN'       Number of data points above which the scatter plot is
+                    drawn as a binned density image instead of one marker
+                    per data point. False always draws markers.
+                    Defaults to 100000.
+     'Seed'         Seed of the sampled data points of streamed input, for
+                    reproducible figures.
+                    Defaults to None (not reproducible).
+     'Cache'        Directory in which computed layouts are stored (see
+                    layout_cache.py). A figure of the same data and the
+                    same Trendline, Contours, PlotType, GridSize, Bandwidth,
+                    Support, GridType, ChunkSize, SampleSize, LargeN and
+                    Seed is rendered from the stored layout, also when
+                    plot settings such as Colors or XLabel differ. Only an
+                    integer Seed (or none) is cached.
+                    Defaults to None (no cache).
+     'CacheSize'    Maximum size of the cache directory in bytes; the least
+                    recently used layouts are removed.
+                    Defaults to 1e9.
+     'Contours'     'Filled' (filled highest density regions) or 'HDR'
+                    (contour lines of the highest density regions) of the
+                    joint density of every category, a 2D kernel density
+                    estimate on a 128 x 128 grid (see Joint_densities in
+                    kernel_density.py), or False.
+                    Defaults to False.
+     'ContourLevels' Probability masses of the highest density regions,
+                    e.g. 0.5 is the smallest region holding half of the
+                    data points of a category.
+                    Defaults to (0.5, 0.8, 0.95).
+     'Weights'      N x 1 numpy array with the weight of every data point.
+                    Distributions, trendlines (weighted least squares or
+                    weighted LOWESS) and contours are weighted, and the
+                    scatter points are a sample drawn with a probability
+                    proportional to the weights (above LargeN data points
+                    the density image is weighted).
+                    Defaults to None (every data point counts once).
+     'Counts'       K x Bx x By numpy array with the number of data points
+                    per category and bin, for binned input: datax and
+                    datay hold the bin edges and cats the category names
+                    (optional). Trendlines and contours are fitted to the
+                    bins weighted by their counts, the scatter points are
+                    a representative sample of at most SampleSize data
+                    points per category.
+                    Defaults to None (datax and datay hold the data points).
+     'Collections'  True draws all categories with a fixed number of
+                    artists (one collection of scatter points, one of
+                    trendlines, ...), False draws separate artists per
+                    category.
+                    Defaults to True.
+     'Figure'       Existing matplotlib figure to draw in (it is cleared
+                    first), for example to reuse one figure for many plots.
+                    Defaults to a new figure.
+     'Artists'      A dict that keeps the figure and its artists between
+                    renders. The first render stores them in the dict, a
+                    later render with the same dict only replaces the data
+                    of the artists (points, trendlines, distributions),
+                    draws the density image, contours and legend again
+                    and updates the axes limits, without clearing the
+                    figure or building its axes again (see
+                    render_server.py). With Collections False the figure
+                    in the dict is cleared and drawn again.
+                    Defaults to None.
+     'Show'         True or False, show the figure.
+                    Defaults to True.
+     'Profile'      A dict that is filled with a timing report, or a
+                    function that receives the report. The report holds
+                    the time per stage (grouping, kde, trendline,
+                    distribution, artists, draw, ...) and per category,
+                    and the array sizes (see profiling.py).
+                    Defaults to no profiling.
 
  Copyright (c) Matlab (original) version:
                  2022, Eline Zwijgers, Sint Maartenskliniek, 
@@ -42,45 +157,316 @@
 
 def scatter_distribution_figure(datax=False, datay=False, cats=False, **kwargs):
     
+    # Import dependencies
+    from profiling import New_report, Finish_report
+    
+    # One report for the compute and render stage
+    profile = kwargs.get('Profile')
+    report = New_report(profile)
+    if report is not None:
+        kwargs['Profile'] = report
+    
+    layout = scatter_distribution_layout(datax, datay, cats, **kwargs)
+    fig = render_scatter_distribution(layout, **kwargs)
+    
+    Finish_report(report, profile)
+    
+    return fig
+
+
+def scatter_distribution_layout(datax=False, datay=False, cats=False, **kwargs):
+    
     # Import dependencies
     import numpy as np
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    import statsmodels.api as sm
+    from group_categories import Group_categories
+    from kernel_density import Kernel_densities, Binned_kernel_densities, Joint_densities
+    from streaming_input import Is_stream, Read_chunks, Stream_groups
+    from large_n_rendering import Density_counts, Weighted_sample
+    from weighted_input import Binned_groups
+    from profiling import New_report, Stage, Finish_report
+    from plot_layout import Pack_arrays
+    from group_trendlines import Group_trendlines
+    from layout_cache import Layout_key, Load_cached, Store_cached
     
-    if type(datax) == bool or type(datay) == bool or type(cats) == bool:
+    if type(datax) == bool:
         print("Not enough input arguments")
-    if len(datax) != len(datay):
-        print("Datax and datay arrays should be the same length")
-    if len(datax) != len(cats):
-        print("Data and category arrays should be the same length")
+    elif kwargs.get('Counts') is not None:
+        if type(datay) == bool:
+            print("Not enough input arguments")
+    elif not Is_stream(datax):
+        if type(datay) == bool or type(cats) == bool:
+            print("Not enough input arguments")
+        if len(datax) != len(datay):
+            print("Datax and datay arrays should be the same length")
+        if len(datax) != len(cats):
+            print("Data and category arrays should be the same length")
+    
+    # Default settings
+    trendline = False
+    contours = False
+    plot_type = 'Kernel'
+    grid_size = 512
+    bw_method = 'Scott'
+    support = 'Padded'
+    grid_type = 'Uniform'
+    chunk_size = 100000
+    sample_size = 1000
+    large_n = 100000
+    seed = None
+    cache = None
+    cache_size = 1e9
+    weights = None
+    counts = None
+    profile = None
+
+    # Optional settings, only those that change the statistics
+    for item, value in kwargs.items():
+        if item == 'Trendline':
+            if value is True or value == 'Linear':
+                trendline = 'Linear'
+            elif value is False or value == 'Lowess':
+                trendline = value
+            else:
+                print('Unknown Trendline. Choose between True, False, "Linear" and "Lowess". No trendline is drawn.')
+        if item == 'PlotType':
+            if value != 'Kernel' and value != 'Gaussian':
+                print('Unknown DistType. Choose between "Kernel" and "Gaussian". The default distribution (Kernal) is used.')
+            else:
+                plot_type = value
+        if item == 'GridSize':
+            grid_size = int(value)
+        if item == 'Bandwidth':
+            if value not in ['Scott', 'Silverman', 'SheatherJones']:
+                print('Unknown Bandwidth. Choose between "Scott", "Silverman" and "SheatherJones". The default bandwidth (Scott) is used.')
+            else:
+                bw_method = value
+        if item == 'Support':
+            if value != 'Padded' and value != 'Data':
+                print('Unknown Support. Choose between "Padded" and "Data". The default support (Padded) is used.')
+            else:
+                support = value
+        if item == 'GridType':
+            if value != 'Uniform' and value != 'Quantile':
+                print('Unknown GridType. Choose between "Uniform" and "Quantile". The default grid (Uniform) is used.')
+            else:
+                grid_type = value
+        if item == 'Contours':
+            if value is not False and value != 'Filled' and value != 'HDR':
+                print('Unknown Contours. Choose between False, "Filled" and "HDR". No contours are drawn.')
+            else:
+                contours = value
+        if item == 'ChunkSize':
+            chunk_size = int(value)
+        if item == 'SampleSize':
+            sample_size = int(value)
+        if item == 'LargeN':
+            large_n = value
+        if item == 'Seed':
+            seed = value
+        if item == 'Cache':
+            cache = value
+        if item == 'CacheSize':
+            cache_size = value
+        if item == 'Weights':
+            weights = value
+        if item == 'Counts':
+            counts = value
+        if item == 'Profile':
+            profile = value
+    
+    if weights is not None:
+        if Is_stream(datax) or counts is not None:
+            print('Weights are only used with the data points in memory. The data points are not weighted.')
+            weights = None
+        elif len(weights) != len(datax):
+            raise Exception('Data and weights arrays should be the same length')
+        elif np.any(np.asarray(weights) < 0):
+            raise Exception('Weights cannot be negative')
+    
+    report = New_report(profile, keep=True)
+    
+    # Layout of the same data and statistics settings computed before
+    key = None
+    if cache is not None:
+        with Stage(report, 'cache'):
+            inputs = [datax, datay, cats] + [value for value in [weights, counts] if value is not None]
+            key = Layout_key('scatter_distribution', inputs, {'Trendline': trendline, 'Contours': contours, 'PlotType': plot_type, 'GridSize': grid_size, 'Bandwidth': bw_method, 'Support': support, 'GridType': grid_type, 'ChunkSize': chunk_size, 'SampleSize': sample_size, 'LargeN': large_n, 'Seed': seed})
+            layout = Load_cached(cache, key) if key is not None else None
+        if layout is not None:
+            Finish_report(report, profile)
+            return layout
+    
+    summary = None
+    sortedWeights = None
+    if Is_stream(datax) or counts is not None:
+        # Summarize the data one chunk at a time, or summarize the binned
+        # counts; keep a sample for the scatter
+        with Stage(report, 'input'):
+            if counts is not None:
+                summary = Binned_groups([datax, datay], counts, None if type(cats) == bool else cats, 8*grid_size,
+                                        sample_size, seed)
+            else:
+                if type(datay) == bool:
+                    source = datax
+                else:
+                    source = [datax, datay]
+                summary = Stream_groups(Read_chunks(source, cats, chunk_size), 8*grid_size, sample_size, seed)
+        
+        # Bins coarser than the grid are smoothed over at least half a bin
+        min_bandwidth = summary['resolution']/2 if counts is not None else np.zeros(2)
+        catnames = summary['catnames']
+        sortedDatax = summary['sample'][:, 0]
+        sortedDatay = summary['sample'][:, 1]
+        offsets = summary['offsets']
+        meansx, meansy = summary['mean'].T
+        stdsx, stdsy = summary['std'].T
+        with Stage(report, 'kde'):
+            kdesx = Binned_kernel_densities(summary['centers'][0], summary['binned'][0], summary['count'], stdsx, grid_size, min_bandwidth[0], bw_method, support, grid_type)
+            kdesy = Binned_kernel_densities(summary['centers'][1], summary['binned'][1], summary['count'], stdsy, grid_size, min_bandwidth[1], bw_method, support, grid_type)
+    else:
+        # Category settings
+        with Stage(report, 'grouping'):
+            catnames, codes, order, offsets = Group_categories(cats)
+            del codes
+            sortedDatax = np.asarray(datax).ravel()[order]
+            sortedDatay = np.asarray(datay).ravel()[order]
+            if weights is not None:
+                sortedWeights = np.asarray(weights, dtype=float).ravel()[order]
+            del order
+        meansx = meansy = stdsx = stdsy = [None]*len(catnames)
+        if weights is not None:
+            # Weighted mean and standard deviation of the Gaussian distributions
+            meansx, meansy, stdsx, stdsy = Weighted_moments(sortedDatax, sortedDatay, sortedWeights, offsets)
+        
+        # Kernel density of every category, fitted once per axis
+        with Stage(report, 'kde'):
+            if plot_type == 'Kernel':
+                kdesx = Kernel_densities(sortedDatax, offsets, grid_size, False, sortedWeights, bw_method, support, grid_type)
+                kdesy = Kernel_densities(sortedDatay, offsets, grid_size, False, sortedWeights, bw_method, support, grid_type)
+            else:
+                kdesx = dict.fromkeys(range(0, len(catnames)))
+                kdesy = dict.fromkeys(range(0, len(catnames)))
+    
+    if report is not None:
+        report['sizes']['N'] = int(offsets[-1]-offsets[0]) if summary is None else int(np.sum(summary['count']))
+        report['sizes']['K'] = len(catnames)
+        report['sizes']['grid_size'] = grid_size
+    
+    layout = dict()
+    layout['figure'] = 'scatter_distribution'
+    layout['catnames'] = np.array([str(name) for name in catnames])
+    layout['distType'] = plot_type
+    
+    # Scatter points, binned into a density image in large-N mode
+    if large_n and offsets[-1]-offsets[0] > large_n:
+        with Stage(report, 'large_n'):
+            layout['densityCounts'], layout['extent'] = Density_counts(sortedDatax, sortedDatay, offsets, weights=sortedWeights)
+        layout['x'] = np.zeros(0)
+        layout['y'] = np.zeros(0)
+        layout['offsets'] = np.zeros(len(catnames)+1, dtype=np.intp)
+    elif sortedWeights is not None:
+        # Weighted data points drawn with a probability proportional to their
+        # weight, so the scatter shows the weighted distribution
+        with Stage(report, 'large_n'):
+            index, layout['offsets'] = Weighted_sample(sortedWeights, offsets, offsets[-1]-offsets[0], seed)
+            layout['x'] = sortedDatax[offsets[0]:offsets[-1]][index]
+            layout['y'] = sortedDatay[offsets[0]:offsets[-1]][index]
+    else:
+        layout['x'] = sortedDatax[offsets[0]:offsets[-1]]
+        layout['y'] = sortedDatay[offsets[0]:offsets[-1]]
+        layout['offsets'] = offsets - offsets[0]
+    
+    # Data points of the trendlines and contours: all data points (weighted),
+    # the sample of streamed data, or the occupied bins weighted by their counts
+    if counts is not None:
+        fitDatax, fitDatay = summary['cells'][:, 0], summary['cells'][:, 1]
+        fitOffsets, fitWeights = summary['cellOffsets'], summary['cellWeights']
+    else:
+        fitDatax, fitDatay, fitOffsets, fitWeights = sortedDatax, sortedDatay, offsets, sortedWeights
+    
+    # Trendlines of all categories at once
+    with Stage(report, 'trendline') as entry:
+        xTrendline, yTrendline, trendlineOffsets = Group_trendlines(fitDatax, fitDatay, fitOffsets, trendline, weights=fitWeights)
+        entry['grid'] = len(xTrendline)
+    layout['xTrendline'] = xTrendline
+    layout['yTrendline'] = yTrendline
+    layout['trendlineOffsets'] = trendlineOffsets
+    
+    # Joint density of every category, drawn as contours
+    layout['contours'] = contours
+    if contours:
+        with Stage(report, 'contours') as entry:
+            layout['jointx'], layout['jointy'], jointDensity = Joint_densities(fitDatax, fitDatay, fitOffsets, weights=fitWeights)
+            layout['jointDensity'] = jointDensity.astype(np.float32)
+            entry['grid'] = jointDensity.size
+    
+    # Distributions of every category
+    xValues, xDensities, yValues, yDensities = [], [], [], []
+    for n in range(0,len(catnames)):
+        thisDatax = sortedDatax[offsets[n]:offsets[n+1]]
+        thisDatay = sortedDatay[offsets[n]:offsets[n+1]]
+        with Stage(report, 'distribution', catnames[n]) as entry:
+            yDensity, yValue, xPatch, yPatch = Distribution(thisDatay, 'y', plot_type, kdesy[n], grid_size, meansy[n], stdsy[n])
+            xValue, xDensity, xPatch, yPatch = Distribution(thisDatax, 'x', plot_type, kdesx[n], grid_size, meansx[n], stdsx[n])
+            entry['grid'] = len(xValue) + len(yValue)
+        xValues.append(xValue)
+        xDensities.append(xDensity)
+        yValues.append(yValue)
+        yDensities.append(yDensity)
+    
+    layout['xValue'], layout['xCurveOffsets'] = Pack_arrays(xValues)
+    layout['xDensity'] = Pack_arrays(xDensities)[0]
+    layout['yValue'], layout['yCurveOffsets'] = Pack_arrays(yValues)
+    layout['yDensity'] = Pack_arrays(yDensities)[0]
+    
+    if key is not None:
+        with Stage(report, 'cache'):
+            Store_cached(cache, key, layout, cache_size)
+    
+    Finish_report(report, profile)
+    
+    return layout
+
+
+def render_scatter_distribution(layout, **kwargs):
+    
+    # Import dependencies
+    import numpy as np
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    from large_n_rendering import Composite_density
+    from profiling import New_report, Stage, Finish_report
+    from collection_artists import Add_points, Add_curves, Legend_handles
     
-    # Category settings
-    catnames = list(dict.fromkeys(cats))
+    catnames = layout['catnames'].tolist()
+    offsets = layout['offsets']
+    trendlineOffsets = layout['trendlineOffsets']
+    xCurveOffsets = layout['xCurveOffsets']
+    yCurveOffsets = layout['yCurveOffsets']
     
     # Default plot settings
-    colormap = mpl.colormaps['Dark2']
-    cols = colormap([0])
-    for n in range(1, len(catnames)):
-        cols = np.vstack((cols, colormap([n])))
+    colors = None
     marker_size = 100
-    trendline = False
-    plot_type = 'Kernel'
     x_label = ''
     y_label = ''
     font_size = 20
+    contour_levels = (0.5, 0.8, 0.95)
+    collections = True
+    figure = None
+    artists = None
+    show = True
+    profile = None
 
     # Optional plot settings
     for item, value in kwargs.items():
         if item == 'Colors':
-            if len(cols) != len(catnames):
-                print('Number of colors is not equal to the number of categories. The default colors are used')
-            else:
-                cols = value
+            colors = value
         if item == 'Markersize':
             marker_size = value
-        if item == 'Trendline':
-            trendline = value
+        if item == 'Collections':
+            collections = value
+        if item == 'ContourLevels':
+            contour_levels = value
         if item == 'XLim':
             x_lim = value
         if item == 'YLim':
@@ -89,24 +475,88 @@ def scatter_distribution_figure(datax=False, datay=False, cats=False, **kwargs):
             x_label = value
         if item == 'YLabel':
             y_label = value
-        if item == 'PlotType':
-            if value != 'Kernel' and value != 'Gaussian':
-                print('Unknown DistType. Choose between "Kernel" and "Gaussian". The default distribution (Kernal) is used.')
-            else:
-                plot_type = value
+        if item == 'Figure':
+            figure = value
+        if item == 'Artists':
+            artists = value
+        if item == 'Show':
+            show = value
+        if item == 'Profile':
+            profile = value
+    
+    report = New_report(profile, keep=True)
+    
+    # Colors
+    colormap = mpl.colormaps['Dark2']
+    cols = colormap([0])
+    for n in range(1, len(catnames)):
+        cols = np.vstack((cols, colormap([n])))
+    if colors is not None:
+        if len(colors) != len(catnames):
+            print('Number of colors is not equal to the number of categories. The default colors are used')
+        else:
+            cols = colors
+    
+    # Artists of an earlier render with the same dict are updated in place
+    reuse = False
+    if artists is not None:
+        if collections and 'points' in artists:
+            reuse = True
+        else:
+            figure = artists.get('figure', figure)
+            artists.clear()
     
     # Plots
-    fig, axs = plt.subplots(nrows=2, ncols=2, gridspec_kw={'width_ratios': [3, 1], 'height_ratios': [1,3] })
+    with Stage(report, 'setup'):
+        if reuse:
+            fig = artists['figure']
+            axs = artists['axes']
+            # The density image, contours and legend are drawn again
+            for artist in [artists.pop('image', None), axs[1,0].get_legend()] + artists.pop('contours', []):
+                if artist is not None:
+                    artist.remove()
+            for ax in [axs[0,0], axs[1,0], axs[1,1]]:
+                ax.autoscale(tight=False)
+        elif figure is None:
+            fig, axs = plt.subplots(nrows=2, ncols=2, gridspec_kw={'width_ratios': [3, 1], 'height_ratios': [1,3] })
+        else:
+            fig = figure
+            fig.clf()
+            axs = fig.subplots(nrows=2, ncols=2, gridspec_kw={'width_ratios': [3, 1], 'height_ratios': [1,3] })
+        if artists is not None:
+            artists['figure'] = fig
+            artists['axes'] = axs
     
-    # Scatter plot 
-    for n in range(0,len(catnames)):
-        thisCat = catnames[n]
-        indices = [i for i, s in enumerate(cats) if thisCat in s]
-        thisDatax = datax[indices].flatten()
-        thisDatay = datay[indices].flatten()
-        axs[1,0].scatter(thisDatax, thisDatay, s=marker_size, color=cols[n], edgecolors='none', alpha=0.6, label = thisCat)
-        xTrendline, yTrendline = Scatter_trendline(thisDatax, thisDatay, trendline)
-        axs[1,0].plot(xTrendline, yTrendline, color=cols[n], linewidth=2, alpha=1)
+    # Scatter plot, as a binned density image in large-N mode
+    density_image = 'densityCounts' in layout
+    if density_image:
+        with Stage(report, 'large_n'):
+            image = Composite_density(layout['densityCounts'], cols)
+            image = axs[1,0].imshow(image, extent=layout['extent'], origin='lower', aspect='auto', interpolation='nearest')
+            if artists is not None:
+                artists['image'] = image
+    if collections:
+        with Stage(report, 'artists'):
+            Add_points(axs[1,0], layout['x'], layout['y'], offsets, cols, marker_size, artists=artists)
+            Add_curves(axs[1,0], layout['xTrendline'], layout['yTrendline'], trendlineOffsets, cols, 2, None, artists=artists,
+                       key='trendlines')
+    else:
+        for n in range(0,len(catnames)):
+            thisCat = catnames[n]
+            thisDatax = layout['x'][offsets[n]:offsets[n+1]]
+            thisDatay = layout['y'][offsets[n]:offsets[n+1]]
+            xTrendline = layout['xTrendline'][trendlineOffsets[n]:trendlineOffsets[n+1]]
+            yTrendline = layout['yTrendline'][trendlineOffsets[n]:trendlineOffsets[n+1]]
+            with Stage(report, 'artists', thisCat):
+                axs[1,0].scatter(thisDatax, thisDatay, s=marker_size, color=cols[n], edgecolors='none', alpha=0.6, label = thisCat)
+                axs[1,0].plot(xTrendline, yTrendline, color=cols[n], linewidth=2, alpha=1)
+    
+    # Highest density regions of every category, the smallest region on top
+    if 'jointDensity' in layout:
+        with Stage(report, 'contours'):
+            contours = Add_contours(axs[1,0], layout, cols, contour_levels)
+            if artists is not None:
+                artists['contours'] = contours
     
     # Format axis of scatter plot
     axs[1,0].set(xlabel=x_label)
@@ -119,20 +569,26 @@ def scatter_distribution_figure(datax=False, datay=False, cats=False, **kwargs):
             axs[1,0].set_ylim(y_lim)
     # axs[1,0].rcParams['axes.autolimit_mode'] = 'round_numbers'
     
-    if len(catnames)>1:
+    if len(catnames)>1 and collections:
+        axs[1,0].legend(handles=Legend_handles(catnames, cols, marker_size))
+    elif len(catnames)>1:
         axs[1,0].legend()
     
     # Distribution plot y-axis
-    for n in range(0,len(catnames)):
-        thisCat = catnames[n]
-        indices = [i for i, s in enumerate(cats) if thisCat in s]
-        thisDatay = datay[indices].flatten()
-        xDistribution, yDistribution, xPatch, yPatch= Distribution(thisDatay, 'y', plot_type)
-        axs[1,1].plot(xDistribution, yDistribution, color=cols[n], linewidth=1.5)
-        axs[1,1].fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
+    if collections:
+        with Stage(report, 'artists'):
+            Add_curves(axs[1,1], layout['yDensity'], layout['yValue'], yCurveOffsets, cols, 1.5, artists=artists, key='yCurves')
+    else:
+        for n in range(0,len(catnames)):
+            xDistribution = layout['yDensity'][yCurveOffsets[n]:yCurveOffsets[n+1]]
+            yDistribution = layout['yValue'][yCurveOffsets[n]:yCurveOffsets[n+1]]
+            with Stage(report, 'artists', catnames[n]):
+                axs[1,1].plot(xDistribution, yDistribution, color=cols[n], linewidth=1.5)
+                axs[1,1].fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
     
     # Format axis of distribution plot y-axis
-    axs[1,1].sharey(axs[1,0])
+    if not reuse:
+        axs[1,1].sharey(axs[1,0])
     axs[1,1].tick_params(axis='both', colors='none')
     axs[1,1].spines['bottom'].set_color('none')
     axs[1,1].spines['left'].set_color('none')
@@ -141,16 +597,20 @@ def scatter_distribution_figure(datax=False, datay=False, cats=False, **kwargs):
     
     
     # Distribution plot x-axis
-    for n in range(0,len(catnames)):
-        thisCat = catnames[n]
-        indices = [i for i, s in enumerate(cats) if thisCat in s]
-        thisDatax = datax[indices].flatten()
-        xDistribution, yDistribution, xPatch, yPatch= Distribution(thisDatax, 'x', plot_type)
-        axs[0,0].plot(xDistribution, yDistribution, color=cols[n], linewidth=1.5)
-        axs[0,0].fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
+    if collections:
+        with Stage(report, 'artists'):
+            Add_curves(axs[0,0], layout['xValue'], layout['xDensity'], xCurveOffsets, cols, 1.5, artists=artists, key='xCurves')
+    else:
+        for n in range(0,len(catnames)):
+            xDistribution = layout['xValue'][xCurveOffsets[n]:xCurveOffsets[n+1]]
+            yDistribution = layout['xDensity'][xCurveOffsets[n]:xCurveOffsets[n+1]]
+            with Stage(report, 'artists', catnames[n]):
+                axs[0,0].plot(xDistribution, yDistribution, color=cols[n], linewidth=1.5)
+                axs[0,0].fill_between(x=xDistribution, y1=yDistribution, y2=0, color=cols[n], alpha=0.4, edgecolor='none')
     
     # Format axis of distribution plot x-axis
-    axs[0,0].sharex(axs[1,0])
+    if not reuse:
+        axs[0,0].sharex(axs[1,0])
     axs[0,0].tick_params(axis='both', colors='none')
     axs[0,0].spines['bottom'].set_color('none')
     axs[0,0].spines['left'].set_color('none')
@@ -163,41 +623,108 @@ def scatter_distribution_figure(datax=False, datay=False, cats=False, **kwargs):
     axs[0,1].spines['right'].set_color('none')
     axs[0,1].spines['top'].set_color('none')
     
-    plt.show(block=False)
+    # Drawing the canvas is only timed when profiling
+    if report is not None:
+        with Stage(report, 'draw'):
+            fig.canvas.draw()
+    Finish_report(report, profile)
+    
+    if show:
+        plt.show(block=False)
     
-    return
+    return fig
     
 # Functions 
-def Scatter_trendline(datax, datay, trendline):
+def Add_contours(ax, layout, cols, contour_levels=(0.5, 0.8, 0.95)):
+    
+    # Import dependencies
+    import numpy as np
+    import matplotlib as mpl
+    from kernel_density import Hdr_levels
+    
+    masses = np.sort(np.atleast_1d(contour_levels))[::-1]
+    levels = Hdr_levels(layout['jointDensity'], masses)
+    filled = str(layout['contours']) == 'Filled'
+    contours = list()
+    for n in range(0, len(layout['jointDensity'])):
+        density = layout['jointDensity'][n]
+        theseLevels = np.unique(levels[n])
+        if len(theseLevels) == 0 or not np.all(np.isfinite(theseLevels)) or np.max(density) <= theseLevels[-1]:
+            continue
+        color = mpl.colors.to_rgba(cols[n])
+        if filled:
+            alphas = np.linspace(0.15, 0.5, len(theseLevels))
+            contours.append(ax.contourf(layout['jointx'], layout['jointy'], density, levels=np.append(theseLevels, np.max(density)),
+                                        colors=[color[:3] + (alpha,) for alpha in alphas], zorder=2))
+        else:
+            contours.append(ax.contour(layout['jointx'], layout['jointy'], density, levels=theseLevels, colors=[color],
+                                       linewidths=1.5, zorder=3))
+    
+    return contours
+
+
+def Scatter_trendline(datax, datay, trendline, method='numpy'):
     
     # Import dependencies
-    from sklearn import linear_model
     import numpy as np
     
     if trendline == False:
         xTrendline = np.array([])
         yTrendline = np.array([])
-    elif trendline == True:
-        model = linear_model.LinearRegression(fit_intercept=True) 
-        modelfit = model.fit(np.reshape(datax,(-1,1)),np.reshape(datay,(-1,1)))
-        xTrendline = np.arange(start=np.min(datax)-0.05, stop=np.max(datax)+0.05, step=0.01)
-        yTrendline = xTrendline*modelfit.coef_ + modelfit.intercept_
+    elif trendline == True or trendline == 'Linear':
+        if method == 'sklearn':
+            # Optional dependency, only imported when asked for
+            from sklearn import linear_model
+            model = linear_model.LinearRegression(fit_intercept=True) 
+            modelfit = model.fit(np.reshape(datax,(-1,1)),np.reshape(datay,(-1,1)))
+            slope = modelfit.coef_
+            intercept = modelfit.intercept_
+        else:
+            # Least squares fit
+            meanx = np.mean(datax)
+            meany = np.mean(datay)
+            slope = np.sum((datax-meanx)*(datay-meany))/np.sum((datax-meanx)**2)
+            intercept = meany - slope*meanx
+        # A straight line only needs its two end points
+        xTrendline = np.array([np.min(datax)-0.05, np.max(datax)+0.05])
+        yTrendline = xTrendline*slope + intercept
+    
+    return xTrendline, np.ravel(yTrendline)
     
-    return xTrendline, (yTrendline.T).flatten()
     
     
+def Weighted_moments(sortedDatax, sortedDatay, sortedWeights, offsets):
     
-def Distribution(data, direction, plot_type):
+    # Import dependencies
+    import numpy as np
+    
+    # Weighted mean and standard deviation of every category and axis
+    means = np.full((2, len(offsets)-1), np.nan)
+    stds = np.full((2, len(offsets)-1), np.nan)
+    for n in range(0, len(offsets)-1):
+        weights = sortedWeights[offsets[n]:offsets[n+1]]
+        if np.sum(weights) <= 0:
+            continue
+        for axis, data in enumerate([sortedDatax, sortedDatay]):
+            means[axis, n] = np.average(data[offsets[n]:offsets[n+1]], weights=weights)
+            stds[axis, n] = np.sqrt(np.average((data[offsets[n]:offsets[n+1]] - means[axis, n])**2, weights=weights))
+    
+    return means[0], means[1], stds[0], stds[1]
+
+
+def Distribution(data, direction, plot_type, kde=None, grid_size=512, mean=None, std=None):
     
     # Import dependencies
     import numpy as np
-    from scipy import stats
-    import statsmodels.api as sm
+    from kernel_density import Kernel_density, Normal_pdf
     
-    mean_data = np.nanmean(data)
-    std_data = np.nanstd(data)
-    xnormdis = np.arange(start=-3*std_data+mean_data, stop=3*std_data+mean_data, step=0.001)
-    y_norm = stats.norm.pdf(xnormdis, mean_data, std_data)
+    mean_data = np.nanmean(data) if mean is None else mean
+    std_data = np.nanstd(data) if std is None else std
+    # A category without spread (a single or constant value) is drawn with
+    # sigma = 1, like the kernel bandwidth
+    sigma = std_data if std_data > 0 else 1.0
+    xnormdis = np.linspace(start=-3*sigma+mean_data, stop=3*sigma+mean_data, num=grid_size)
+    y_norm = Normal_pdf(xnormdis, mean_data, sigma)
     
     if plot_type == 'Gaussian':
         if direction == 'y':
@@ -215,8 +742,8 @@ def Distribution(data, direction, plot_type):
             xPatch = xnormdis
             yPatch = y_norm/10
     elif plot_type == 'Kernel':
-        kde = sm.nonparametric.KDEUnivariate(data)
-        kde.fit()
+        if kde is None:
+            kde = Kernel_density(data, grid_size)
         density = kde.density
         value = kde.support
             
@@ -0,0 +1,269 @@
+"""
+Functions to summarize very large datasets one chunk at a time, so the
+figures can be made without loading all data points into memory.
+Per category the number of data points, mean and standard deviation
+(Welford/Chan updates) and the binned distribution are accumulated, and a
+bounded reservoir sample is kept for the jitter and scatter points.
+Peak memory depends on the number of categories, bins and sample size,
+not on the number of data points.
+
+INPUT
+Read_chunks(data, cats, chunk_size, delimiter, skip_rows)
+data:       one of
+            - an iterator yielding (data, cats) or (datax, datay, cats)
+              tuples of numpy arrays/lists per chunk
+            - a list of columns, each a numpy array, np.memmap or path
+              to a .npy file (loaded memory-mapped)
+            - a path to a delimited text file with one or more value
+              columns followed by a category column, read in blocks
+cats:       N x 1 list, numpy array or path to a .npy file with the
+            categories of a list of columns. Not used otherwise.
+chunk_size: number of data points per chunk. Defaults to 100000.
+delimiter:  column delimiter of a text file. Defaults to ','.
+skip_rows:  number of header lines of a text file. Defaults to 0.
+
+OUTPUT
+chunks:     iterator yielding (values, cats) per chunk, with values a
+            n x D numpy array (one column per variable)
+
+Stream_groups(chunks, bins, sample_size, seed)
+chunks:      iterator as returned by Read_chunks
+bins:        number of bins per variable. The bin range grows while
+             streaming by merging neighbouring bins. Defaults to 4096.
+sample_size: maximum number of data points kept per category for the
+             jitter and scatter points. Defaults to 1000.
+seed:        seed of the reservoir sample. Defaults to None.
+
+OUTPUT
+summary:    dict with
+            'catnames' list of the K category names (first appearance)
+            'count'    K x 1 numpy array with the number of data points
+            'mean'     K x D numpy array with the mean per variable
+            'std'      K x D numpy array with the standard deviation
+            'centers'  list with per variable the B x 1 bin centers
+            'binned'   list with per variable the K x B bin counts
+            'sample'   M x D numpy array with the sampled data points,
+                       sorted by category
+            'offsets'  (K+1) x 1 numpy array with the start of every
+                       category in 'sample'
+
+The accumulation can also be driven chunk by chunk, e.g. for figures that
+are updated while data arrives:
+New_groups(bins, sample_size, seed) returns an empty state (dict),
+Add_chunk(state, values, cats) adds one chunk (values n x D or n x 1) and
+returns the codes of the categories that received data points, and
+Group_summary(state) returns the summary dict described above.
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Is_stream(data):
+
+    # Import dependencies
+    import os
+    import numpy as np
+
+    return isinstance(data, (str, os.PathLike, np.memmap)) or hasattr(data, '__next__')
+
+
+def Read_chunks(data, cats=None, chunk_size=100000, delimiter=',', skip_rows=0):
+
+    # Import dependencies
+    import os
+    import itertools
+    import numpy as np
+
+    if isinstance(data, (str, os.PathLike)) and not str(data).endswith('.npy'):
+        # Delimited text file, read in blocks of lines
+        with open(data, 'r') as file:
+            for n in range(0, skip_rows):
+                next(file, None)
+            while True:
+                lines = list(itertools.islice(file, chunk_size))
+                if len(lines) == 0:
+                    break
+                ncols = len(lines[0].split(delimiter))
+                values = np.loadtxt(lines, delimiter=delimiter, usecols=range(0, ncols-1), ndmin=2)
+                chunkCats = np.loadtxt(lines, delimiter=delimiter, usecols=ncols-1, dtype=str, ndmin=1)
+                yield values, chunkCats
+
+    elif hasattr(data, '__next__'):
+        # Iterator of chunks
+        for chunk in data:
+            yield np.column_stack([np.asarray(column).ravel() for column in chunk[:-1]]), np.asarray(chunk[-1]).ravel()
+
+    else:
+        # Columns of (memory-mapped) arrays, read in slices
+        if isinstance(data, (str, os.PathLike)) or isinstance(data, np.ndarray):
+            data = [data]
+        columns = [np.load(column, mmap_mode='r') if isinstance(column, (str, os.PathLike)) else column for column in data]
+        if isinstance(cats, (str, os.PathLike)):
+            cats = np.load(cats, mmap_mode='r')
+        for start in range(0, len(columns[0]), chunk_size):
+            stop = start + chunk_size
+            values = np.column_stack([np.asarray(column[start:stop]).ravel() for column in columns])
+            yield values, np.asarray(cats[start:stop]).ravel()
+
+
+def Stream_groups(chunks, bins=4096, sample_size=1000, seed=None):
+
+    state = New_groups(bins, sample_size, seed)
+    for values, chunkCats in chunks:
+        Add_chunk(state, values, chunkCats)
+
+    return Group_summary(state)
+
+
+def New_groups(bins=4096, sample_size=1000, seed=None):
+
+    # Import dependencies
+    import numpy as np
+
+    state = dict()
+    state['bins'] = bins
+    state['sample_size'] = sample_size
+    state['rng'] = np.random.default_rng(seed)
+    state['catnames'] = list()
+    state['index'] = dict()
+    state['count'] = np.zeros(0)
+    state['mean'] = None
+    state['m2'] = None
+    state['low'] = None
+    state['width'] = None
+    state['binned'] = None
+    state['sample'] = None
+    state['sampleCodes'] = np.zeros(0, dtype=np.intp)
+    state['sampleKeys'] = np.zeros(0)
+
+    return state
+
+
+def Add_chunk(state, values, chunkCats):
+
+    # Import dependencies
+    import numpy as np
+
+    bins = state['bins']
+    catnames = state['catnames']
+    index = state['index']
+
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    valid = np.all(np.isfinite(values), axis=1)
+    values = values[valid]
+    chunkCats = np.asarray(chunkCats)[valid]
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.intp)
+    nvars = values.shape[1]
+
+    # Category codes, new categories are appended
+    uniq, first, inverse = np.unique(chunkCats, return_index=True, return_inverse=True)
+    for name in uniq[np.argsort(first)].tolist():
+        if name not in index:
+            index[name] = len(catnames)
+            catnames.append(name)
+    codes = np.array([index[name] for name in uniq.tolist()], dtype=np.intp)[inverse.ravel()]
+    ncats = len(catnames)
+
+    # Grow the accumulators with new categories
+    if state['mean'] is None:
+        state['mean'] = np.zeros((0, nvars))
+        state['m2'] = np.zeros((0, nvars))
+        state['binned'] = [np.zeros((0, bins)) for d in range(0, nvars)]
+        state['sample'] = np.zeros((0, nvars))
+    count = state['count']
+    mean = state['mean']
+    m2 = state['m2']
+    binned = state['binned']
+    grow = ncats - len(count)
+    if grow > 0:
+        count = np.pad(count, (0, grow))
+        mean = np.pad(mean, ((0, grow), (0, 0)))
+        m2 = np.pad(m2, ((0, grow), (0, 0)))
+        binned = [np.pad(b, ((0, grow), (0, 0))) for b in binned]
+
+    # Mean and variance per category (Chan's parallel Welford update)
+    chunkCount = np.bincount(codes, minlength=ncats).astype(float)
+    present = chunkCount > 0
+    total = count + chunkCount
+    for d in range(0, nvars):
+        chunkMean = np.bincount(codes, weights=values[:, d], minlength=ncats)/np.maximum(chunkCount, 1)
+        chunkM2 = np.bincount(codes, weights=(values[:, d]-chunkMean[codes])**2, minlength=ncats)
+        delta = chunkMean - mean[:, d]
+        mean[present, d] += delta[present]*chunkCount[present]/total[present]
+        m2[present, d] += chunkM2[present] + delta[present]**2*count[present]*chunkCount[present]/total[present]
+    count = total
+
+    # Binned distribution, the bin range doubles when data falls outside
+    low = state['low']
+    width = state['width']
+    if low is None:
+        span = np.max(values, axis=0) - np.min(values, axis=0)
+        span = np.where(span > 0, span, np.maximum(np.abs(np.min(values, axis=0)), 1.0)*1e-3)
+        low = np.min(values, axis=0) - span/2
+        width = 2*span/bins
+    for d in range(0, nvars):
+        while np.min(values[:, d]) < low[d] or np.max(values[:, d]) >= low[d] + bins*width[d]:
+            merged = binned[d].reshape(ncats, bins//2, 2).sum(axis=2)
+            binned[d] = np.zeros((ncats, bins))
+            if np.min(values[:, d]) < low[d]:
+                binned[d][:, bins//2:] = merged
+                low[d] -= bins*width[d]
+            else:
+                binned[d][:, :bins//2] = merged
+            width[d] *= 2
+        index_d = np.minimum(((values[:, d]-low[d])/width[d]).astype(np.intp), bins-1)
+        binned[d] += np.bincount(codes*bins + index_d, minlength=ncats*bins).reshape(ncats, bins)
+
+    # Reservoir sample per category: keep the smallest random keys
+    sample = np.vstack((state['sample'], values))
+    sampleCodes = np.concatenate((state['sampleCodes'], codes))
+    sampleKeys = np.concatenate((state['sampleKeys'], state['rng'].random(len(values))))
+    order = np.lexsort((sampleKeys, sampleCodes))
+    sortedCodes = sampleCodes[order]
+    rank = np.arange(len(order)) - np.searchsorted(sortedCodes, sortedCodes, side='left')
+    keep = order[rank < state['sample_size']]
+
+    state['count'] = count
+    state['mean'] = mean
+    state['m2'] = m2
+    state['low'] = low
+    state['width'] = width
+    state['binned'] = binned
+    state['sample'] = sample[keep]
+    state['sampleCodes'] = sampleCodes[keep]
+    state['sampleKeys'] = sampleKeys[keep]
+
+    return np.flatnonzero(present)
+
+
+def Group_summary(state):
+
+    # Import dependencies
+    import numpy as np
+
+    if state['mean'] is None:
+        raise Exception('No valid data points in the input')
+
+    bins = state['bins']
+    low = state['low']
+    width = state['width']
+    count = state['count']
+    catnames = state['catnames']
+
+    summary = dict()
+    summary['catnames'] = catnames
+    summary['count'] = count
+    summary['mean'] = state['mean']
+    summary['std'] = np.sqrt(state['m2']/count[:, np.newaxis])
+    summary['centers'] = [low[d] + width[d]*(np.arange(0, bins)+0.5) for d in range(0, len(low))]
+    summary['binned'] = state['binned']
+    summary['sample'] = state['sample']
+    summary['offsets'] = np.concatenate(([0], np.cumsum(np.bincount(state['sampleCodes'], minlength=len(catnames)))))
+
+    return summary
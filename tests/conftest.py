@@ -0,0 +1,9 @@
+"""
+The modules of this repository are flat scripts, the tests import them from
+the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
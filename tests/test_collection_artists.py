@@ -0,0 +1,102 @@
+"""
+Tests of the collection artists: a figure drawn with Collections True has
+the same data points, colors, curves, fills and error bars as the figure
+drawn with a few artists per category.
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from matplotlib.collections import LineCollection, PathCollection, PolyCollection
+from matplotlib.colors import to_rgba, to_rgba_array
+
+from jitter_distribution_figure import jitter_distribution_layout, render_jitter_distribution
+
+
+def Layout():
+    rng = np.random.default_rng(0)
+    data = np.concatenate((rng.normal(0, 1, 300), rng.gamma(2.0, size=200), rng.normal(5, 2, 100)))
+    cats = np.repeat(['a', 'b', 'c'], [300, 200, 100])
+    layout = dict(jitter_distribution_layout(data, cats, Seed=1))
+    # Asymmetric error bars, as of percentile intervals
+    layout['yLower'] = layout['yMean'] - np.array([0.2, 0.5, 1.0])
+    layout['yUpper'] = layout['yMean'] + np.array([0.9, 0.1, 0.4])
+    return layout
+
+
+def Black(colors):
+    return np.all(to_rgba_array(colors)[:, :3] == 0)
+
+
+def Vertices(path):
+    return np.unique(np.round(path.vertices, 10), axis=0)
+
+
+def Artists(fig):
+    # Data of the drawn artists, in drawing order
+    drawn = {'points': [], 'means': [], 'curves': [], 'fills': [], 'bars': [], 'caps': []}
+    for ax in fig.axes:
+        for collection in ax.collections:
+            if isinstance(collection, PathCollection):
+                offsets = np.asarray(collection.get_offsets())
+                if Black(collection.get_facecolors()):
+                    drawn['means'].append(offsets)
+                else:
+                    colors = np.broadcast_to(collection.get_facecolors(), (len(offsets), 4))
+                    drawn['points'].append(np.column_stack((offsets, colors)))
+            elif isinstance(collection, LineCollection):
+                colors = np.broadcast_to(collection.get_colors(), (len(collection.get_segments()), 4))
+                for segment, color in zip(collection.get_segments(), colors):
+                    if Black([color]):
+                        drawn['bars'].append(np.asarray(segment))
+                    else:
+                        drawn['curves'].append((np.asarray(segment), to_rgba(color)))
+            elif isinstance(collection, PolyCollection):
+                colors = np.broadcast_to(collection.get_facecolors(), (len(collection.get_paths()), 4))
+                for path, color in zip(collection.get_paths(), colors):
+                    drawn['fills'].append((Vertices(path), to_rgba(color)))
+        for line in ax.lines:
+            if line.get_marker() == '_':
+                drawn['caps'].append(np.asarray(line.get_xydata()))
+            elif len(line.get_xydata()) > 1:
+                drawn['curves'].append((np.asarray(line.get_xydata()), to_rgba(line.get_color())))
+    points = np.concatenate(drawn['points'])
+    drawn['points'] = points[np.lexsort(points.T[::-1])]
+    drawn['means'] = np.unique(np.concatenate(drawn['means']), axis=0)
+    drawn['bars'] = np.unique(np.round(np.concatenate(drawn['bars']), 10), axis=0)
+    drawn['caps'] = np.unique(np.round(np.concatenate(drawn['caps']), 10), axis=0)
+    return drawn
+
+
+@pytest.mark.parametrize('plot_type', ['External', 'Internal'])
+def test_collections_draw_the_same_figure(plot_type):
+    layout = Layout()
+    figures = [render_jitter_distribution(layout, PlotType=plot_type, Collections=collections, Show=False)
+               for collections in [True, False]]
+    drawn, expected = [Artists(fig) for fig in figures]
+
+    # Every data point, with the color of its category
+    assert len(drawn['points']) == len(layout['xJitter'])
+    np.testing.assert_allclose(drawn['points'], expected['points'])
+    np.testing.assert_allclose(drawn['means'], expected['means'])
+
+    # Curves and the fills below them
+    assert len(drawn['curves']) == len(expected['curves']) == 3
+    for (curve, color), (expectedCurve, expectedColor) in zip(drawn['curves'], expected['curves']):
+        np.testing.assert_allclose(curve, expectedCurve)
+        assert color == pytest.approx(expectedColor)
+    assert len(drawn['fills']) == len(expected['fills']) == 3
+    for (fill, color), (expectedFill, expectedColor) in zip(drawn['fills'], expected['fills']):
+        np.testing.assert_allclose(fill, expectedFill)
+        assert color == pytest.approx(expectedColor)
+
+    # Ends of the error bars and caps, lower and upper bounds differ
+    ends = np.column_stack((layout['xMean'], layout['yLower'], layout['xMean'], layout['yUpper']))
+    np.testing.assert_allclose(drawn['bars'], expected['bars'])
+    np.testing.assert_allclose(np.unique(drawn['bars'].reshape(-1, 2), axis=0),
+                               np.unique(np.round(ends.reshape(-1, 2), 10), axis=0))
+    np.testing.assert_allclose(drawn['caps'], expected['caps'])
+    for fig in figures:
+        plt.close(fig)
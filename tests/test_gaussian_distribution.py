@@ -0,0 +1,41 @@
+"""
+Tests of the Gaussian distribution curves: a category without spread (a
+single or constant value) gets a finite curve around its mean.
+"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from jitter_distribution_figure import jitter_distribution_layout
+from scatter_distribution_figure import scatter_distribution_layout
+
+
+def Data():
+    rng = np.random.default_rng(0)
+    data = np.concatenate((rng.normal(size=100), [2.5], [4.0, 4.0, 4.0]))
+    cats = np.repeat(['spread', 'single', 'constant'], [100, 1, 3])
+    return data, cats
+
+
+def test_jitter_curve_without_spread_is_finite():
+    data, cats = Data()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        layout = jitter_distribution_layout(data, cats, DistType='Gaussian', Seed=0)
+    assert np.all(np.isfinite(layout['density'])) and np.all(np.isfinite(layout['value']))
+    curveOffsets = layout['curveOffsets']
+    for n, mean in [(1, 2.5), (2, 4.0)]:
+        value = layout['value'][curveOffsets[n]:curveOffsets[n+1]]
+        assert value[0] == pytest.approx(mean - 3) and value[-1] == pytest.approx(mean + 3)
+
+
+def test_scatter_curves_without_spread_are_finite():
+    data, cats = Data()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        layout = scatter_distribution_layout(data, -data, cats, PlotType='Gaussian')
+    assert str(layout['distType']) == 'Gaussian'
+    for key in ['xValue', 'xDensity', 'yValue', 'yDensity']:
+        assert np.all(np.isfinite(layout[key])), key
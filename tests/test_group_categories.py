@@ -0,0 +1,56 @@
+"""
+Tests of the category grouping: names that are prefixes of other names,
+pandas categoricals with missing values, integer codes and the removal of
+empty categories.
+"""
+
+import numpy as np
+import pandas as pd
+
+from group_categories import Group_categories
+
+
+def Members(catnames, codes, order, offsets):
+    # Data point indices of each category, read from the sort order
+    return {name: sorted(order[offsets[n]:offsets[n+1]].tolist()) for n, name in enumerate(catnames)}
+
+
+def test_prefix_names_are_separate_categories():
+    cats = ['Group AB', 'Group A', 'Group AB', 'Group A', 'Group A']
+    catnames, codes, order, offsets = Group_categories(cats)
+    assert catnames == ['Group AB', 'Group A']
+    assert codes.tolist() == [0, 1, 0, 1, 1]
+    assert Members(catnames, codes, order, offsets) == {'Group AB': [0, 2], 'Group A': [1, 3, 4]}
+
+
+def test_pandas_categorical_with_missing_values():
+    cats = pd.Categorical(['b', None, 'a', 'b', None], categories=['c', 'b', 'a'])
+    catnames, codes, order, offsets = Group_categories(cats)
+    assert catnames == ['b', 'a']
+    assert codes.tolist() == [0, -1, 1, 0, -1]
+    # Missing values are sorted in front of the first category
+    assert offsets[0] == 2
+    assert sorted(order[:offsets[0]].tolist()) == [1, 4]
+    assert Members(catnames, codes, order, offsets) == {'b': [0, 3], 'a': [2]}
+
+
+def test_integer_codes_are_sorted():
+    cats = np.array([7, -2, 7, 3, -2, 7])
+    catnames, codes, order, offsets = Group_categories(cats)
+    assert catnames == [-2, 3, 7]
+    assert codes.tolist() == [2, 0, 2, 1, 0, 2]
+    assert Members(catnames, codes, order, offsets) == {-2: [1, 4], 3: [3], 7: [0, 2, 5]}
+
+    # Widely spread codes take the unique path with the same result
+    catnames, codes, order, offsets = Group_categories(np.array([10**12, -5, 10**12]))
+    assert catnames == [-5, 10**12]
+    assert codes.tolist() == [1, 0, 1]
+
+
+def test_empty_categories_are_removed():
+    cats = pd.Categorical(['z', 'x', 'z'], categories=['x', 'y', 'z', 'w'])
+    catnames, codes, order, offsets = Group_categories(cats)
+    assert catnames == ['x', 'z']
+    assert codes.tolist() == [1, 0, 1]
+    assert np.diff(offsets).tolist() == [1, 2]
+    assert Members(catnames, codes, order, offsets) == {'x': [1], 'z': [0, 2]}
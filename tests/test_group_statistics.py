@@ -0,0 +1,106 @@
+"""
+Regression tests of the grouped and weighted statistics against numpy.
+"""
+
+import numpy as np
+import pytest
+
+from group_categories import Group_categories, Sort_segments
+from group_statistics import Bootstrap_interval, Error_bars, Group_statistics, Weighted_percentile
+
+
+def Grouped(seed=0):
+    rng = np.random.default_rng(seed)
+    cats = rng.choice(['a', 'b', 'c'], size=1000)
+    data = rng.gamma(2.0, size=1000)
+    return data, cats
+
+
+def test_group_statistics_match_numpy():
+    data, cats = Grouped()
+    catnames, codes, order, offsets = Group_categories(cats)
+    sortedData = data[order]
+    statistics = Group_statistics(sortedData, offsets)
+    for n, name in enumerate(catnames):
+        values = data[cats == name]
+        assert statistics['count'][n] == len(values)
+        assert statistics['mean'][n] == pytest.approx(np.mean(values))
+        assert statistics['std'][n] == pytest.approx(np.std(values))
+        assert statistics['median'][n] == pytest.approx(np.median(values))
+        assert statistics['low'][n] == pytest.approx(np.percentile(values, 2.5))
+    Sort_segments(sortedData, offsets)
+    presorted = Group_statistics(sortedData, offsets, presorted=True)
+    for name in ['median', 'q1', 'q3', 'low', 'high']:
+        np.testing.assert_allclose(presorted[name], statistics[name])
+
+
+@pytest.mark.parametrize('presorted', [False, True])
+def test_weighted_statistics_match_repeated_data(presorted):
+    data, cats = Grouped(1)
+    weights = np.random.default_rng(2).integers(1, 4, size=len(data)).astype(float)
+    catnames, codes, order, offsets = Group_categories(cats)
+    sortedData, sortedWeights = data[order], weights[order]
+    if presorted:
+        Sort_segments(sortedData, offsets, sortedWeights)
+    statistics = Group_statistics(sortedData, offsets, presorted=presorted, weights=sortedWeights)
+    for n, name in enumerate(catnames):
+        values = np.repeat(data[cats == name], weights[cats == name].astype(int))
+        thisWeights = weights[cats == name]
+        assert statistics['count'][n] == pytest.approx(len(values))
+        assert statistics['effective'][n] == pytest.approx(np.sum(thisWeights)**2/np.sum(thisWeights**2))
+        assert statistics['mean'][n] == pytest.approx(np.mean(values))
+        assert statistics['std'][n] == pytest.approx(np.std(values))
+        for key, q in [('median', 50), ('q1', 25), ('q3', 75), ('low', 2.5), ('high', 97.5)]:
+            assert statistics[key][n] == pytest.approx(np.percentile(values, q))
+
+
+@pytest.mark.parametrize('q', [0, 2.5, 25, 50, 75, 97.5, 100])
+def test_weighted_percentile_matches_repeated_data(q):
+    rng = np.random.default_rng(1)
+    data = np.sort(rng.normal(size=50))
+    weights = rng.integers(0, 5, size=50)
+    weights[0] = 1
+    offsets = np.array([0, 50])
+    expected = np.percentile(np.repeat(data, weights), q)
+    assert Weighted_percentile(data, weights, offsets, q)[0] == pytest.approx(expected)
+
+
+def test_weighted_percentile_empty_and_zero_weight_segments():
+    data = np.array([1.0, 2.0, 3.0])
+    weights = np.array([0.0, 0.0, 1.0])
+    value = Weighted_percentile(data, weights, np.array([0, 0, 2, 3]), 50)
+    assert np.isnan(value[0]) and np.isnan(value[1])
+    assert value[2] == 3.0
+
+
+def test_bootstrap_interval_does_not_depend_on_workers():
+    rng = np.random.default_rng(5)
+    data = np.concatenate((rng.normal(size=3000), rng.exponential(size=50)))
+    offsets = np.array([0, 3000, 3050])
+    single = Bootstrap_interval(data, offsets, seed=4, workers=1)
+    threaded = Bootstrap_interval(data, offsets, seed=4, workers=8, max_indices=1e6)
+    np.testing.assert_array_equal(single, threaded)
+    assert single[0][0] < np.mean(data[:3000]) < single[1][0]
+
+
+def test_bootstrap_memory_is_capped_over_all_workers():
+    import tracemalloc
+    data = np.random.default_rng(6).normal(size=10**6)
+    tracemalloc.start()
+    Bootstrap_interval(data, np.array([0, 10**6]), resamples=16, seed=0, workers=16, max_indices=2*2**20)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Two batches of one resample (int32 indices and float64 values) at once
+    assert peak < 2*12*10**6 + 16*10**6
+
+
+def test_large_categories_use_the_normal_interval():
+    rng = np.random.default_rng(7)
+    data = np.concatenate((rng.normal(size=100001), rng.normal(size=500)))
+    offsets = np.array([0, 100001, 100501])
+    statistics = Group_statistics(data, offsets)
+    center, lower, upper = Error_bars(statistics, 'CI', data, offsets, seed=0)
+    assert lower[0] == pytest.approx(statistics['mean'][0] - 1.96*statistics['sem'][0])
+    assert upper[0] == pytest.approx(statistics['mean'][0] + 1.96*statistics['sem'][0])
+    low, high = Bootstrap_interval(data, offsets, seed=0)
+    assert lower[1] == low[1] and upper[1] == high[1]
@@ -0,0 +1,40 @@
+"""
+Regression tests of the grouped least squares lines and the binned LOWESS
+trend against numpy and statsmodels.
+"""
+
+import numpy as np
+import pytest
+
+from group_trendlines import Group_regression, Group_trendlines
+
+
+def test_regression_matches_polyfit():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=900)
+    y = 2 + 0.5*x + rng.normal(size=900)
+    weights = rng.random(900)
+    offsets = np.array([0, 400, 900])
+    regression = Group_regression(x, y, offsets)
+    weighted = Group_regression(x, y, offsets, weights)
+    for n in range(0, 2):
+        part = slice(offsets[n], offsets[n+1])
+        slope, intercept = np.polyfit(x[part], y[part], 1)
+        assert regression['slope'][n] == pytest.approx(slope)
+        assert regression['intercept'][n] == pytest.approx(intercept)
+        slope, intercept = np.polyfit(x[part], y[part], 1, w=np.sqrt(weights[part]))
+        assert weighted['slope'][n] == pytest.approx(slope)
+        assert weighted['intercept'][n] == pytest.approx(intercept)
+
+
+def test_lowess_matches_statsmodels():
+    sm = pytest.importorskip('statsmodels.api')
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0, 10, size=5000)
+    y = np.sin(x) + rng.normal(scale=0.3, size=5000)
+    y[rng.choice(5000, 50, replace=False)] += 10
+    offsets = np.array([0, 5000])
+    xTrend, yTrend, trendOffsets = Group_trendlines(x, y, offsets, 'Lowess', frac=0.2, iterations=2)
+    inside = (xTrend > 0.5) & (xTrend < 9.5)
+    expected = sm.nonparametric.lowess(y, x, frac=0.2, it=2, xvals=xTrend[inside])
+    assert np.max(np.abs(yTrend[inside] - expected)) < 0.05
@@ -0,0 +1,74 @@
+"""
+Tests of the incrementally updated jitter figure: a batch only updates the
+artists of its categories, data outside the axes redraws the figure, and
+the running statistics equal those of all data points.
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from incremental_figure import IncrementalJitterFigure
+
+
+def Figure():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=600)
+    cats = np.repeat(['a', 'b', 'c'], 200)
+    return IncrementalJitterFigure(data, cats, Seed=1, Show=False), data, cats
+
+
+def Count_calls(live, name):
+    calls = list()
+    method = getattr(live, name)
+    def Counted(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+    setattr(live, name, Counted)
+    return calls
+
+
+def test_batch_updates_only_its_categories():
+    live, data, cats = Figure()
+    before = [points.get_offsets().copy() for points in live.points]
+    curves = [curve.get_xydata().copy() for curve in live.curves]
+    updated = Count_calls(live, 'Update_categories')
+    live.append(np.random.default_rng(1).normal(size=50), ['b']*50)
+    assert [list(args[0]) for args in updated] == [[1]]
+    for n in [0, 2]:
+        np.testing.assert_array_equal(live.points[n].get_offsets(), before[n])
+        np.testing.assert_array_equal(live.curves[n].get_xydata(), curves[n])
+    assert len(live.points[1].get_offsets()) == 250
+    assert not np.array_equal(live.curves[1].get_xydata(), curves[1])
+    plt.close(live.fig)
+
+
+def test_data_outside_the_axes_redraws():
+    live, data, cats = Figure()
+    redraws = Count_calls(live, 'redraw')
+    blits = Count_calls(live, 'Blit')
+    live.append([0.1, -0.1], ['a', 'c'])
+    assert len(redraws) == 0 and len(blits) == 1
+    live.append([25.0], ['b'])
+    assert len(redraws) == 1
+    assert live.axs[0].get_ylim()[1] >= 25
+    plt.close(live.fig)
+
+
+def test_running_statistics_match_numpy():
+    live, data, cats = Figure()
+    rng = np.random.default_rng(2)
+    for size in [10, 1, 300]:
+        batch = rng.normal(3, 2, size)
+        batchCats = rng.choice(['a', 'b', 'c', 'd'], size)
+        live.append(batch, batchCats)
+        data = np.concatenate((data, batch))
+        cats = np.concatenate((cats, batchCats))
+    state = live.state
+    for n, name in enumerate(state['catnames']):
+        values = data[cats == name]
+        assert state['count'][n] == len(values)
+        np.testing.assert_allclose(state['mean'][n, 0], np.mean(values), rtol=1e-12)
+        np.testing.assert_allclose(np.sqrt(state['m2'][n, 0]/state['count'][n]), np.std(values), rtol=1e-10)
+    plt.close(live.fig)
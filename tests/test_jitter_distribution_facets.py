@@ -0,0 +1,22 @@
+"""
+Tests of the facet figure: panels computed in threads get their own settings
+and timing reports.
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+
+from jitter_distribution_facets import jitter_distribution_facets
+
+
+def test_panels_with_threads_and_profile():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(2000, 4))
+    cats = rng.choice(['a', 'b', 'c'], size=2000)
+    report = dict()
+    fig = jitter_distribution_facets(data, cats, Names=['w', 'x', 'y', 'z'], Profile=report, Workers=4, Show=False, Seed=1)
+    assert [panel.axes[0].get_ylabel() for panel in fig.subfigs] == ['w', 'x', 'y', 'z']
+    assert len(report['sizes']['panels']) == 4
+    panels = [entry['panel'] for entry in report['categories'] if entry['stage'] == 'jitter']
+    assert sorted(panels) == [0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3]
@@ -0,0 +1,74 @@
+"""
+Tests of the jitter positions: the beeswarm keeps the data points within
+its column one marker diameter apart, and the random jitter of a category
+only depends on the seed and its own data points.
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from jitter_distribution_figure import Beeswarm, jitter_distribution_layout, render_jitter_distribution
+
+
+def Distances(x, y):
+    # Distance of every pair of points
+    points = np.column_stack((x, y))
+    difference = points[:, np.newaxis, :] - points[np.newaxis, :, :]
+    distance = np.sqrt(np.sum(difference**2, axis=2))
+    return distance[np.triu_indices(len(points), 1)]
+
+
+@pytest.mark.parametrize('width', [np.inf, 4.0])
+def test_beeswarm_points_do_not_overlap(width):
+    data = np.random.default_rng(0).normal(0, 5, 400)
+    swarm = Beeswarm(data, 1.0, width)
+    assert np.all(np.abs(swarm) <= width)
+    # Points at the edges of the column are not placed and may overlap
+    placed = np.abs(swarm) < width
+    assert np.sum(placed) > 100
+    assert np.min(Distances(swarm[placed], data[placed])) >= 1 - 1e-9
+
+
+def test_rendered_beeswarm_points_do_not_overlap():
+    rng = np.random.default_rng(1)
+    data = np.concatenate((rng.normal(0, 1, 150), rng.normal(2, 0.5, 80)))
+    cats = np.repeat(['a', 'b'], [150, 80])
+    layout = jitter_distribution_layout(data, cats, Seed=0)
+    fig = render_jitter_distribution(layout, JitterType='Beeswarm', Show=False)
+    ax = fig.axes[0]
+    points = ax.collections[0]
+    diameter = np.sqrt(points.get_sizes()[0])*fig.dpi/72
+    # Positions in pixels, within 0.15 of the center of every category
+    offsets = np.asarray(points.get_offsets())
+    pixels = ax.transData.transform(offsets)
+    for n in range(0, 2):
+        rows = slice(layout['offsets'][n], layout['offsets'][n+1])
+        placed = np.abs(offsets[rows, 0] - n) < 0.15 - 1e-9
+        assert np.sum(placed) > 10
+        assert np.min(Distances(*pixels[rows][placed].T)) >= diameter*(1 - 1e-6)
+    plt.close(fig)
+
+
+def Category_jitter(groups, names, seed=3):
+    # Random offset of every data point, by category name
+    data = np.concatenate([groups[name] for name in names])
+    cats = np.repeat(names, [len(groups[name]) for name in names])
+    layout = jitter_distribution_layout(data, cats, Seed=seed)
+    offsets = layout['offsets']
+    return {str(name): layout['xJitter'][offsets[n]:offsets[n+1]] - n for n, name in enumerate(layout['catnames'])}
+
+
+@pytest.mark.parametrize('names', [['c', 'a', 'b'], ['b', 'c', 'a'], ['a', 'b', 'c', 'd'], ['d', 'c'], ['b']])
+def test_jitter_of_a_category_only_depends_on_its_own_stream(names):
+    rng = np.random.default_rng(0)
+    groups = {name: rng.normal(n, 1, 50 + 10*n) for n, name in enumerate('abcd')}
+    expected = Category_jitter(groups, ['a', 'b', 'c'])
+    jitter = Category_jitter(groups, names)
+    for name in set(names) & set(expected):
+        np.testing.assert_allclose(jitter[name], expected[name], rtol=0, atol=1e-12)
+    # Another seed gives other offsets
+    other = Category_jitter(groups, names, seed=4)
+    assert not np.array_equal(other[names[0]], jitter[names[0]])
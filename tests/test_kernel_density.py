@@ -0,0 +1,176 @@
+"""
+Regression tests of the batched FFT kernel density estimate and the
+Sheather-Jones bandwidth against direct (O(N^2)) and statsmodels references.
+"""
+
+import numpy as np
+import pytest
+
+from kernel_density import Binned_kernel_densities, Kernel_density, Kernel_densities, Normal_pdf
+
+
+def Direct_density(data, bandwidth, points):
+    # Sum of a Gaussian kernel on every data point
+    return np.mean(Normal_pdf(points[:, np.newaxis], data[np.newaxis, :], bandwidth), axis=1)
+
+
+def Direct_sheather_jones(data):
+    # Solve-the-equation bandwidth of R's bw.SJ, exact pair sums
+    n = len(data)
+    difference = data[:, np.newaxis] - data[np.newaxis, :]
+    def Functional(order, g):
+        u = difference/g
+        phi = np.exp(-u**2/2)/np.sqrt(2*np.pi)
+        poly = u**4 - 6*u**2 + 3 if order == 4 else u**6 - 15*u**4 + 45*u**2 - 15
+        return np.sum(poly*phi)/(n*(n-1)*g**(order+1))
+    iqr = np.subtract(*np.percentile(data, [75, 25]))
+    scale = min(np.std(data, ddof=1), iqr/1.349)
+    a = 1.24*scale*n**(-1/7)
+    b = 1.23*scale*n**(-1/9)
+    c1 = 1/(2*np.sqrt(np.pi)*n)
+    alpha2 = 1.357*(Functional(4, a)/-Functional(6, b))**(1/7)
+    def Equation(h):
+        return (c1/Functional(4, alpha2*h**(5/7)))**(1/5) - h
+    lower, upper = 0.1144*scale*n**(-0.2), 1.144*scale*n**(-0.2)
+    for iteration in range(0, 60):
+        middle = (lower + upper)/2
+        if Equation(lower)*Equation(middle) <= 0:
+            upper = middle
+        else:
+            lower = middle
+    return (lower + upper)/2
+
+
+def test_density_matches_direct_sum():
+    data = np.random.default_rng(0).gamma(2.0, size=500)
+    kde = Kernel_density(data)
+    expected = Direct_density(data, kde.bandwidth, kde.support)
+    assert np.max(np.abs(kde.density - expected)) < 1e-3*np.max(expected)
+    assert np.trapezoid(kde.density, kde.support) == pytest.approx(1, abs=1e-3)
+
+
+def test_density_matches_statsmodels():
+    sm = pytest.importorskip('statsmodels.api')
+    data = np.random.default_rng(1).normal(size=2000)
+    reference = sm.nonparametric.KDEUnivariate(data)
+    reference.fit(gridsize=512)
+    kde = Kernel_density(data)
+    assert kde.bandwidth == pytest.approx(reference.bw, rel=1e-3)
+    inside = (reference.support > kde.support[0]) & (reference.support < kde.support[-1])
+    estimate = np.interp(reference.support[inside], kde.support, kde.density)
+    assert np.max(np.abs(estimate - reference.density[inside])) < 5e-3
+
+
+def test_batched_categories_match_single_fits():
+    rng = np.random.default_rng(2)
+    data = np.concatenate((rng.normal(0, 1, 300), rng.normal(5, 3, 700), rng.exponential(size=100)))
+    offsets = np.array([0, 300, 1000, 1100])
+    kdes = Kernel_densities(data, offsets)
+    for n in range(0, 3):
+        single = Kernel_density(data[offsets[n]:offsets[n+1]])
+        assert kdes[n].bandwidth == pytest.approx(single.bandwidth)
+        np.testing.assert_allclose(kdes[n].support, single.support)
+        np.testing.assert_allclose(kdes[n].density, single.density, atol=1e-9)
+
+
+@pytest.mark.parametrize('sd', [0.1, 0.01, 0.001])
+def test_narrow_far_category_keeps_grid_size(sd):
+    rng = np.random.default_rng(6)
+    data = np.concatenate((rng.normal(0, 1, 5000), rng.normal(100, sd, 5000)))
+    offsets = np.array([0, 5000, 10000])
+    kdes = Kernel_densities(data, offsets, grid_size=512)
+    for n in range(0, 2):
+        assert len(kdes[n].support) == 512
+    # Peak of a normal sample, smoothed by the kernel
+    peak = 1/np.sqrt(2*np.pi*(sd**2 + kdes[1].bandwidth**2))
+    assert np.max(kdes[1].density) == pytest.approx(peak, rel=0.05)
+    alone = Kernel_density(data[:5000], grid_size=512)
+    np.testing.assert_allclose(kdes[0].density, alone.density, atol=1e-9)
+
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+@pytest.mark.parametrize('weighted', [False, True])
+@pytest.mark.parametrize('bw_method', ['Scott', 'SheatherJones'])
+def test_non_finite_values_are_left_out(weighted, bw_method):
+    rng = np.random.default_rng(7)
+    finite = np.concatenate((rng.normal(0, 1, 200), rng.normal(3, 2, 300)))
+    data = np.insert(finite, [250, 250, 400], [np.nan, np.inf, -np.inf])
+    weights = np.ones(len(data)) if weighted else None
+    kdes = Kernel_densities(data, np.array([0, 200, 503]), weights=weights, bw_method=bw_method)
+    expected = Kernel_densities(finite, np.array([0, 200, 500]), weights=None if weights is None else np.ones(500),
+                                bw_method=bw_method)
+    for n in range(0, 2):
+        assert kdes[n].bandwidth == pytest.approx(expected[n].bandwidth)
+        np.testing.assert_allclose(kdes[n].support, expected[n].support)
+        np.testing.assert_allclose(kdes[n].density, expected[n].density, atol=1e-9)
+
+
+def test_jitter_of_a_group_with_nan_stays_finite():
+    from jitter_distribution_figure import jitter_distribution_layout
+    rng = np.random.default_rng(8)
+    data = rng.normal(size=300)
+    data[150] = np.nan
+    layout = jitter_distribution_layout(data, np.repeat(['a', 'b', 'c'], 100), Seed=0)
+    offsets = layout['offsets']
+    assert np.sum(np.isnan(layout['xJitter'][offsets[1]:offsets[2]])) == 1
+    assert np.all(np.isfinite(layout['density']))
+
+
+def test_weighted_density_matches_repeated_data():
+    rng = np.random.default_rng(3)
+    data = rng.normal(size=200)
+    weights = rng.integers(1, 4, size=200)
+    repeated = Kernel_density(np.repeat(data, weights))
+    weighted = Kernel_density(data, weights=weights)
+    estimate = np.interp(repeated.support, weighted.support, weighted.density)
+    expected = Direct_density(np.repeat(data, weights), weighted.bandwidth, repeated.support)
+    assert np.max(np.abs(estimate - expected)) < 1e-3*np.max(expected)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_sheather_jones_matches_exact_rule(seed):
+    data = np.random.default_rng(seed).gamma(2.0, size=300)
+    kde = Kernel_density(data, bw_method='SheatherJones')
+    assert kde.bandwidth == pytest.approx(Direct_sheather_jones(data), rel=2e-3)
+
+
+def test_sheather_jones_bimodal_is_narrower():
+    rng = np.random.default_rng(4)
+    data = np.concatenate((rng.normal(-3, 1, 1000), rng.normal(3, 1, 1000)))
+    scott = Kernel_density(data).bandwidth
+    plugin = Kernel_density(data, bw_method='SheatherJones').bandwidth
+    assert plugin < 0.5*scott
+
+
+def test_data_support_integrates_to_one():
+    data = np.random.default_rng(5).lognormal(size=5000)
+    kde = Kernel_density(data, grid_size=64, support='Data', grid_type='Quantile')
+    assert kde.support[0] == pytest.approx(np.min(data))
+    assert kde.support[-1] == pytest.approx(np.max(data))
+    fine = Kernel_density(data, grid_size=8192, support='Data')
+    assert np.trapezoid(fine.density, fine.support) == pytest.approx(1, abs=1e-3)
+
+
+def test_zero_weight_category_gets_nan_curve():
+    rng = np.random.default_rng(7)
+    data = rng.normal(size=300)
+    weights = rng.random(300)
+    weights[100:200] = 0
+    offsets = np.array([0, 100, 200, 300])
+    kdes = Kernel_densities(data, offsets, weights=weights)
+    assert np.isnan(kdes[1].bandwidth) and np.all(np.isnan(kdes[1].density))
+    for n in [0, 2]:
+        single = Kernel_density(data[offsets[n]:offsets[n+1]], weights=weights[offsets[n]:offsets[n+1]])
+        np.testing.assert_allclose(kdes[n].density, single.density, atol=1e-9)
+
+
+def test_empty_binned_category_gets_nan_curve():
+    centers = np.linspace(-4, 4, 256)
+    binned = np.zeros((3, 256))
+    binned[0, 100:120] = 5
+    binned[2, 140:200] = 1
+    count = np.sum(binned, axis=1)
+    kdes = Binned_kernel_densities(centers, binned, count, np.array([0.2, np.nan, 0.5]), support='Data')
+    assert np.isnan(kdes[1].bandwidth) and np.all(np.isnan(kdes[1].density))
+    for n in [0, 2]:
+        assert np.all(np.isfinite(kdes[n].density))
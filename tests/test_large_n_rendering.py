@@ -0,0 +1,57 @@
+"""
+Regression tests of the subsampling and density image helpers for very many
+data points.
+"""
+
+import numpy as np
+import pytest
+
+from large_n_rendering import Composite_density, Density_counts, Stratified_sample, Weighted_sample
+
+
+def test_stratified_sample_keeps_quantiles():
+    rng = np.random.default_rng(0)
+    data = np.concatenate((rng.normal(size=100000), rng.exponential(size=50000)))
+    offsets = np.array([0, 100000, 150000])
+    sample, sampleOffsets = Stratified_sample(data, offsets, 3000, seed=1)
+    np.testing.assert_array_equal(np.diff(sampleOffsets), [2000, 1000])
+    for n in range(0, 2):
+        part = sample[sampleOffsets[n]:sampleOffsets[n+1]]
+        expected = np.percentile(data[offsets[n]:offsets[n+1]], [10, 50, 90])
+        np.testing.assert_allclose(np.percentile(part, [10, 50, 90]), expected, atol=0.01)
+
+
+def test_weighted_sample_follows_weights():
+    weights = np.concatenate((np.tile([1.0, 3.0, 0.0], 1000), np.zeros(500)))
+    index, sampleOffsets = Weighted_sample(weights, np.array([0, 3000, 3500]), 2000, seed=0)
+    drawn = weights[index[sampleOffsets[0]:sampleOffsets[1]]]
+    assert np.mean(drawn == 3) == pytest.approx(0.75, abs=0.03)
+    assert not np.any(drawn == 0)
+    assert sampleOffsets[2] == sampleOffsets[1]
+
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+@pytest.mark.parametrize('constant', [0.0, 3.0])
+def test_density_counts_constant_axis(constant):
+    y = np.random.default_rng(2).normal(size=1000)
+    x = np.full(1000, constant)
+    counts, extent = Density_counts(x, y, np.array([0, 500, 1000]), bins=16)
+    assert extent[0] < constant < extent[1]
+    assert np.sum(counts) == 1000
+    assert np.all(counts.sum(axis=(0, 1))[np.arange(16) != 8] == 0)
+
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+def test_composite_density_of_fractional_weights():
+    counts = np.zeros((3, 2, 2))
+    counts[0] = [[0.2, 0.05], [0.0, 0.0]]
+    counts[1] = [[0.0, 0.0], [0.0, 40.0]]
+    image = Composite_density(counts, [(1, 0, 0), (0, 0, 1), (0, 1, 0)])
+    # The densest cell of every category is equally opaque, whatever the
+    # scale of its weights, and a category without weight is not drawn
+    assert image[0, 0, 3] == pytest.approx(0.6)
+    assert image[1, 1, 3] == pytest.approx(0.6)
+    assert image[0, 1, 3] == pytest.approx(0.6*np.sqrt(0.25))
+    assert image[1, 0, 3] == 0
+    np.testing.assert_allclose(image[0, 0, :3], [1, 0, 0])
+    np.testing.assert_allclose(image[1, 1, :3], [0, 0, 1])
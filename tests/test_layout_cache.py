@@ -0,0 +1,84 @@
+"""
+Tests of the on-disk layout cache: hits, misses, corrupt entries, eviction
+of the least recently used layouts and seeds that cannot be cached.
+"""
+
+import os
+
+import numpy as np
+
+from jitter_distribution_figure import jitter_distribution_layout
+from layout_cache import Evict_cached, Layout_key, Load_cached, Store_cached
+
+
+def Data():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=500), rng.integers(0, 3, 500)
+
+
+def Entries(directory):
+    return sorted(name for name in os.listdir(directory))
+
+
+def test_hit_and_miss(tmp_path):
+    data, cats = Data()
+    first = jitter_distribution_layout(data, cats, Cache=str(tmp_path), Seed=1)
+    assert len(Entries(tmp_path)) == 1
+    # A store replaces the file, a hit only marks it as recently used
+    inode = os.stat(tmp_path / Entries(tmp_path)[0]).st_ino
+
+    # Same data and statistics settings, other plot settings: a hit
+    second = jitter_distribution_layout(data, cats, Cache=str(tmp_path), Seed=1, YLabel='Y')
+    assert len(Entries(tmp_path)) == 1
+    assert os.stat(tmp_path / Entries(tmp_path)[0]).st_ino == inode
+    for key in ['xJitter', 'yJitter', 'density', 'value']:
+        np.testing.assert_array_equal(second[key], first[key])
+
+    # Other statistics settings or data: a miss that is stored
+    jitter_distribution_layout(data, cats, Cache=str(tmp_path), Seed=2)
+    jitter_distribution_layout(data + 1, cats, Cache=str(tmp_path), Seed=1)
+    assert len(Entries(tmp_path)) == 3
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    data, cats = Data()
+    first = jitter_distribution_layout(data, cats, Cache=str(tmp_path), Seed=1)
+    path = tmp_path / Entries(tmp_path)[0]
+    path.write_bytes(path.read_bytes()[:100])
+    key = path.name[:-len('.npz')]
+    assert Load_cached(str(tmp_path), key) is None
+    assert not path.exists()
+
+    # The figure call computes and stores the layout again
+    path.write_bytes(b'not a zip file')
+    again = jitter_distribution_layout(data, cats, Cache=str(tmp_path), Seed=1)
+    np.testing.assert_array_equal(again['xJitter'], first['xJitter'])
+    assert Load_cached(str(tmp_path), key) is not None
+
+
+def test_least_recently_used_layouts_are_evicted(tmp_path):
+    layout = {'values': np.zeros(1000)}
+    for n in range(0, 4):
+        Store_cached(str(tmp_path), 'key%d' % n, layout)
+        os.utime(tmp_path / ('key%d.npz' % n), ns=(n*10**9, n*10**9))
+    size = os.path.getsize(tmp_path / 'key0.npz')
+
+    # Reading a layout marks it as recently used
+    assert Load_cached(str(tmp_path), 'key0') is not None
+    Evict_cached(str(tmp_path), 2.5*size)
+    assert Entries(tmp_path) == ['key0.npz', 'key3.npz']
+
+
+def test_temporary_files_are_not_evicted(tmp_path):
+    (tmp_path / 'partial.tmp').write_bytes(b'x'*10**6)
+    Store_cached(str(tmp_path), 'key', {'values': np.zeros(10)}, max_bytes=1)
+    assert 'partial.tmp' in Entries(tmp_path)
+    assert not [name for name in Entries(tmp_path) if name.endswith('.tmp') and name != 'partial.tmp']
+
+
+def test_generator_seed_is_not_cached():
+    data, cats = Data()
+    assert Layout_key('jitter_distribution', [data, cats], {'Seed': np.random.default_rng(0)}) is None
+    assert Layout_key('jitter_distribution', [data, cats], {'Seed': 3}) == Layout_key('jitter_distribution', [data, cats], {'Seed': 3})
+    assert Layout_key('jitter_distribution', [data, cats], {'Seed': None}) is not None
+    assert Layout_key('jitter_distribution', [data, cats], {'Seed': np.int64(3)}) is not None
@@ -0,0 +1,99 @@
+"""
+Tests of the render server: a worker draws a request with the figure
+functions into its reused figure, so the image equals a new figure, and
+invalid requests get 400 without a traceback.
+"""
+
+import io
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from jitter_distribution_figure import jitter_distribution_layout, render_jitter_distribution
+from scatter_distribution_figure import scatter_distribution_layout, render_scatter_distribution
+from plot_layout import Save_layout
+from render_server import Render_request, RenderServer, Request_render
+
+
+def Image(png):
+    return plt.imread(io.BytesIO(png))
+
+
+def Request(figure, rng, size, ncats, settings):
+    cats = rng.integers(0, ncats, size).tolist()
+    if figure == 'jitter_distribution':
+        data = {'data': rng.normal(size=size).tolist(), 'cats': cats}
+    else:
+        datax = rng.normal(size=size)
+        data = {'datax': datax.tolist(), 'datay': (datax + rng.normal(size=size)).tolist(), 'cats': cats}
+    return {'figure': figure, 'data': data, 'settings': dict(settings, Seed=0), 'dpi': 50}
+
+
+@pytest.mark.parametrize('figure, settings', [
+    ('jitter_distribution', {'PlotType': 'External', 'YLabel': 'Y'}),
+    ('jitter_distribution', {'PlotType': 'Internal', 'YLim': [-2, 2], 'Capsize': 0}),
+    ('scatter_distribution', {'Trendline': True, 'Contours': 'HDR'}),
+])
+def test_server_render_equals_figure_function(figure, settings):
+    rng = np.random.default_rng(0)
+    first = Render_request(Request(figure, rng, 800, 5, {'YLim': [0, 1]} if figure == 'jitter_distribution' else {'XLim': [0, 1]}))
+    request = Request(figure, rng, 300, 3, settings)
+    result = Render_request(request)
+    assert first['error'] is None and result['error'] is None
+
+    data = request['data']
+    if figure == 'jitter_distribution':
+        layout = jitter_distribution_layout(np.asarray(data['data']), np.asarray(data['cats']), **request['settings'])
+        fig = render_jitter_distribution(layout, Show=False, **request['settings'])
+    else:
+        layout = scatter_distribution_layout(np.asarray(data['datax']), np.asarray(data['datay']), np.asarray(data['cats']),
+                                             **request['settings'])
+        fig = render_scatter_distribution(layout, Show=False, **request['settings'])
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=50)
+    plt.close(fig)
+    np.testing.assert_array_equal(Image(result['body']), Image(buffer.getvalue()))
+
+
+def test_layouts_outside_the_directory_are_rejected(tmp_path):
+    layouts = tmp_path / 'layouts'
+    layouts.mkdir()
+    (layouts / 'steps.npz').write_bytes(b'')
+    (tmp_path / 'secret.npz').write_bytes(b'')
+    (layouts / 'link.npz').symlink_to(tmp_path / 'secret.npz')
+    server = RenderServer(layouts=str(layouts))
+    assert server.layout_path('steps.npz') == str((layouts / 'steps.npz').resolve())
+    for name in ['../secret.npz', str(tmp_path / 'secret.npz'), 'link.npz', 'missing.npz', '.', 3]:
+        with pytest.raises(ValueError, match='Unknown layout'):
+            server.layout_path(name)
+    with pytest.raises(ValueError, match='no layouts directory'):
+        RenderServer().layout_path('steps.npz')
+
+
+def test_invalid_data_and_failed_renders_send_no_traceback():
+    invalid = Render_request({'figure': 'jitter_distribution', 'data': {'data': [1.0, 2.0], 'cats': [0]}})
+    assert invalid['status'] == 400
+    assert 'same length' in invalid['error'] and 'Traceback' not in invalid['error']
+    assert 'Traceback' in invalid['traceback']
+    failed = Render_request({'figure': 'jitter_distribution', 'data': {'data': [1.0, 2.0], 'cats': [0, 0]}, 'format': 'nope'})
+    assert failed['status'] == 500 and failed['error'] == 'Render failed'
+
+
+def test_server_responses(tmp_path, caplog):
+    rng = np.random.default_rng(0)
+    Save_layout(jitter_distribution_layout(rng.normal(size=100), rng.integers(0, 2, 100)), str(tmp_path / 'steps.npz'))
+    server = RenderServer(('127.0.0.1', 0), workers=1, layouts=str(tmp_path)).start()
+    try:
+        png = Request_render(server.address, {'figure': 'jitter_distribution', 'layout': 'steps.npz'})
+        assert png[:4] == b'\x89PNG'
+        with pytest.raises(Exception, match=r'\(400\): Unknown layout'):
+            Request_render(server.address, {'figure': 'jitter_distribution', 'layout': '/etc/passwd'})
+        with pytest.raises(Exception, match=r'\(400\): Invalid request') as error:
+            Request_render(server.address, {'figure': 'jitter_distribution', 'data': {'data': [1.0, 2.0], 'cats': [0]}})
+        assert 'Traceback' not in str(error.value)
+        assert 'Traceback' in caplog.text
+    finally:
+        server.stop()
@@ -0,0 +1,36 @@
+"""
+Regression tests of the chunked (Welford/Chan) accumulation of streamed data
+against numpy.
+"""
+
+import numpy as np
+import pytest
+
+from streaming_input import Stream_groups
+
+
+def test_chunked_moments_match_numpy():
+    rng = np.random.default_rng(0)
+    data = 1e6 + rng.normal(size=(10000, 2))
+    cats = rng.choice(['a', 'b', 'c'], size=10000)
+    chunks = ((data[start:start+777], cats[start:start+777]) for start in range(0, 10000, 777))
+    summary = Stream_groups(chunks, bins=256, sample_size=100, seed=1)
+    for n, name in enumerate(summary['catnames']):
+        values = data[cats == name]
+        assert summary['count'][n] == len(values)
+        np.testing.assert_allclose(summary['mean'][n], np.mean(values, axis=0), rtol=1e-12)
+        np.testing.assert_allclose(summary['std'][n], np.std(values, axis=0), rtol=1e-6)
+        assert np.sum(summary['binned'][0][n]) == len(values)
+        assert summary['offsets'][n+1] - summary['offsets'][n] == 100
+
+
+def test_chunk_order_does_not_change_moments():
+    rng = np.random.default_rng(1)
+    data = rng.exponential(size=5000)
+    cats = rng.integers(0, 4, size=5000)
+    forward = Stream_groups(iter([(data[:10], cats[:10]), (data[10:], cats[10:])]), bins=64)
+    backward = Stream_groups(iter([(data[10:], cats[10:]), (data[:10], cats[:10])]), bins=64)
+    order = [backward['catnames'].index(name) for name in forward['catnames']]
+    np.testing.assert_allclose(forward['mean'], backward['mean'][order])
+    np.testing.assert_allclose(forward['std'], backward['std'][order])
+    assert forward['count'] == pytest.approx(backward['count'][order])
@@ -0,0 +1,55 @@
+"""
+Regression tests of weighted and binned (Counts) input of the figure layouts,
+including categories without weight.
+"""
+
+import numpy as np
+import pytest
+
+from jitter_distribution_figure import jitter_distribution_layout
+from scatter_distribution_figure import scatter_distribution_layout
+from weighted_input import Binned_groups
+
+
+def test_binned_groups_moments():
+    edges = np.array([0.0, 1.0, 3.0, 4.0])
+    summary = Binned_groups(edges, np.array([[1, 2, 1], [0, 0, 0]]), bins=64, seed=0)
+    # Uniform within the bins: mean of the mid points, variance plus width^2/12
+    mids = np.array([0.5, 2.0, 3.5])
+    mean = np.average(mids, weights=[1, 2, 1])
+    variance = np.average(mids**2 + np.array([1, 4, 1])/12, weights=[1, 2, 1]) - mean**2
+    assert summary['mean'][0, 0] == pytest.approx(mean)
+    assert summary['std'][0, 0] == pytest.approx(np.sqrt(variance))
+    assert summary['offsets'][2] == summary['offsets'][1]
+
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+def test_layouts_with_zero_weight_category():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=300)
+    cats = np.repeat(['a', 'b', 'c'], 100)
+    weights = rng.random(300)
+    weights[100:200] = 0
+    layout = jitter_distribution_layout(data, cats, Weights=weights, Seed=1)
+    assert layout['offsets'][2] == layout['offsets'][1]
+    assert np.isnan(layout['yMean'][1]) and np.all(np.isfinite(layout['yMean'][[0, 2]]))
+    layout = scatter_distribution_layout(data, data + rng.normal(size=300), cats, Weights=weights, Trendline='Lowess',
+                                         Contours='HDR', Seed=1)
+    trend = layout['yTrendline'][layout['trendlineOffsets'][1]:layout['trendlineOffsets'][2]]
+    assert np.all(np.isnan(trend))
+
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+@pytest.mark.parametrize('options', [dict(), dict(Bandwidth='SheatherJones', Support='Data', GridType='Quantile')])
+def test_layouts_with_empty_histogram_row(options):
+    rng = np.random.default_rng(1)
+    edges = np.linspace(-4, 4, 17)
+    counts = np.array([np.histogram(rng.normal(size=100), edges)[0], np.zeros(16), np.histogram(rng.normal(size=50), edges)[0]])
+    layout = jitter_distribution_layout(edges, ['a', 'b', 'c'], Counts=counts, Seed=1, **options)
+    curves = layout['curveOffsets']
+    assert np.all(np.isnan(layout['density'][curves[1]:curves[2]]))
+    assert np.all(np.isfinite(layout['density'][curves[0]:curves[1]]))
+    joint = np.stack([np.diag(row) for row in counts])
+    layout = scatter_distribution_layout(edges, edges, ['a', 'b', 'c'], Counts=joint, Trendline=True, Contours='Filled',
+                                         Seed=1, **options)
+    assert layout['offsets'][2] == layout['offsets'][1]
@@ -0,0 +1,139 @@
+"""
+Function to summarize pre-aggregated data, binned counts per category (for
+example histograms returned by a data warehouse), into the same summary as
+streamed data (see Stream_groups in streaming_input), so the figures can be
+made from the bins without the individual data points. The data points of
+a bin are taken as uniformly spread over the bin. Means and standard
+deviations follow from the counts, the distributions are estimated from the
+counts resampled onto a fine grid, and the jitter and scatter points are a
+representative sample drawn from the bins. Memory and compute depend on
+the number of categories and bins, not on the number of data points.
+
+Per-observation weights (weighted samples) are passed to the figure
+functions with the option 'Weights' instead, see jitter_distribution_figure.
+
+INPUT
+Binned_groups(edges, counts, catnames, bins, sample_size, seed)
+edges:       (B+1) x 1 numpy array with the increasing bin edges, or a
+             list with the bin edges of every variable ([edgesx, edgesy]
+             for scatter plots). The bins do not need equal widths.
+counts:      K x B numpy array with the number of data points per category
+             and bin, or K x Bx x By for two variables. Counts can be
+             weighted (non-integer).
+catnames:    K x 1 list with the category names. Defaults to 0...K-1.
+bins:        number of bins of the fine grid of every variable.
+             Defaults to 4096.
+sample_size: maximum number of data points sampled per category for the
+             jitter and scatter points. Defaults to 1000.
+seed:        seed of the sample. Defaults to None.
+
+OUTPUT
+summary:     dict with the fields of Stream_groups ('catnames', 'count',
+             'mean', 'std', 'centers', 'binned', 'sample', 'offsets') and
+             'cells'       M x D numpy array with the centers of the bins
+                           holding data points, sorted by category
+             'cellWeights' M x 1 numpy array with the counts of these bins
+             'cellOffsets' (K+1) x 1 numpy array with the start of every
+                           category in 'cells'
+             'resolution'  D x 1 numpy array with the largest bin width of
+                           every variable
+
+EXAMPLE
+counts = np.array([np.histogram(data[cats == name], edges)[0] for name in catnames])
+fig = jitter_distribution_figure(edges, catnames, Counts=counts)
+
+Copyright (c) Python version:
+                2023, Carmen Ensink, Sint Maartenksliniek,
+                c.ensink@maartenskliniek.nl
+
+"""
+
+
+def Binned_groups(edges, counts, catnames=None, bins=4096, sample_size=1000, seed=None):
+
+    # Import dependencies
+    import numpy as np
+
+    # Bin edges of every variable
+    if isinstance(edges, (list, tuple)) and len(edges) > 0 and np.ndim(edges[0]) == 1:
+        edges = [np.asarray(edge, dtype=float).ravel() for edge in edges]
+    else:
+        edges = [np.asarray(edges, dtype=float).ravel()]
+    nvars = len(edges)
+    counts = np.asarray(counts, dtype=float)
+    if counts.ndim == nvars:
+        counts = counts[np.newaxis]
+
+    # Input errors
+    if counts.ndim != nvars+1 or any(counts.shape[d+1] != len(edges[d])-1 for d in range(0, nvars)):
+        raise Exception('Counts should have one row per category and one column per bin (one less than the bin edges)')
+    if any(np.any(np.diff(edge) <= 0) for edge in edges):
+        raise Exception('Bin edges should be increasing')
+    if np.any(counts < 0) or not np.all(np.isfinite(counts)):
+        raise Exception('Counts should be finite and not negative')
+    ncats = len(counts)
+    if catnames is None:
+        catnames = list(range(0, ncats))
+    catnames = list(catnames)
+    if len(catnames) != ncats:
+        raise Exception('Counts should have one row per category')
+
+    widths = [np.diff(edge) for edge in edges]
+    mids = [(edge[1:] + edge[:-1])/2 for edge in edges]
+    flat = counts.reshape(ncats, -1)
+    count = np.sum(flat, axis=1)
+
+    summary = dict()
+    summary['catnames'] = catnames
+    summary['count'] = count
+    summary['mean'] = np.zeros((ncats, nvars))
+    summary['std'] = np.zeros((ncats, nvars))
+    summary['centers'] = list()
+    summary['binned'] = list()
+    for d in range(0, nvars):
+        marginal = np.sum(counts, axis=tuple(k+1 for k in range(0, nvars) if k != d))
+
+        # Moments of data points spread uniformly over their bins
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = marginal @ mids[d]/count
+            variance = marginal @ (mids[d]**2 + widths[d]**2/12)/count - mean**2
+        summary['mean'][:, d] = mean
+        summary['std'][:, d] = np.sqrt(np.maximum(variance, 0))
+
+        # Counts resampled onto a fine grid of equal bins, from the
+        # cumulative counts at the fine edges
+        fine = np.linspace(edges[d][0], edges[d][-1], bins+1)
+        index = np.clip(np.searchsorted(edges[d], fine, side='right')-1, 0, len(widths[d])-1)
+        fraction = np.clip((fine - edges[d][index])/widths[d][index], 0, 1)
+        cumulative = np.concatenate((np.zeros((ncats, 1)), np.cumsum(marginal, axis=1)), axis=1)
+        summary['centers'].append((fine[1:] + fine[:-1])/2)
+        summary['binned'].append(np.diff(cumulative[:, index] + fraction*marginal[:, index], axis=1))
+
+    # Representative sample: systematic sampling of the cumulative counts,
+    # positions uniformly within the sampled bins
+    rng = np.random.default_rng(seed)
+    size = np.where(count > 0, np.clip(np.round(count), 1, sample_size), 0).astype(np.intp)
+    sampleOffsets = np.concatenate(([0], np.cumsum(size)))
+    sampleCodes = np.repeat(np.arange(ncats), size)
+    stratum = np.arange(sampleOffsets[-1]) - sampleOffsets[sampleCodes]
+    ncells = flat.shape[1]
+    cumulative = np.concatenate(([0], np.cumsum(flat.ravel())))
+    position = cumulative[sampleCodes*ncells] + (stratum + rng.random(len(stratum)))*count[sampleCodes]/np.maximum(size[sampleCodes], 1)
+    cell = np.clip(np.searchsorted(cumulative, position, side='right')-1, sampleCodes*ncells, (sampleCodes+1)*ncells-1)
+    cellIndex = np.unravel_index(cell - sampleCodes*ncells, counts.shape[1:])
+    sample = np.empty((len(cell), nvars))
+    for d in range(0, nvars):
+        sample[:, d] = edges[d][cellIndex[d]] + rng.random(len(cell))*widths[d][cellIndex[d]]
+    summary['sample'] = sample
+    summary['offsets'] = sampleOffsets
+
+    # Occupied bins as weighted data points, e.g. for weighted trendlines
+    occupied = np.flatnonzero(flat.ravel() > 0)
+    cellCodes = occupied//ncells
+    cellIndex = np.unravel_index(occupied - cellCodes*ncells, counts.shape[1:])
+    summary['cells'] = np.column_stack([mids[d][cellIndex[d]] for d in range(0, nvars)])
+    summary['cellWeights'] = flat.ravel()[occupied]
+    summary['cellOffsets'] = np.concatenate(([0], np.cumsum(np.bincount(cellCodes, minlength=ncats))))
+    summary['resolution'] = np.array([np.max(width) for width in widths])
+
+    return summary